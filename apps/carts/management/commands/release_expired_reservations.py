@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from apps.carts.reservations import SWEEP_BATCH_SIZE, recount_reservations, release_expired
+
+
+class Command(BaseCommand):
+    help = (
+        'Release cart holds older than CART_RESERVATION_TTL in batches. Run it every '
+        'minute or so; --recount also rebuilds every product\'s reserved_quantity.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=SWEEP_BATCH_SIZE)
+        parser.add_argument('--recount', action='store_true')
+
+    def handle(self, *args, **options):
+        released = release_expired(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Released {released} expired cart holds.'))
+        if options['recount']:
+            recount_reservations()
+            self.stdout.write(self.style.SUCCESS('Recounted reserved stock.'))
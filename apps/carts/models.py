@@ -14,7 +14,14 @@ class CartItem(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.IntegerField(default=1)
     added_at = models.DateTimeField(auto_now_add=True)
+    # Set while ``quantity`` units are held in Product.reserved_quantity;
+    # release_expired_reservations clears it once the time is up.
+    reserved_until = models.DateTimeField(null=True, blank=True, db_index=True)
     
     class Meta:
         unique_together = ['cart', 'product']
+
+    @property
+    def held_quantity(self):
+        return self.quantity if self.reserved_until is not None else 0
         
@@ -0,0 +1,132 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from rest_framework import serializers
+
+from apps.carts.models import CartItem
+from apps.products.cache import invalidate_product_details
+from apps.products.models import Product
+
+SWEEP_BATCH_SIZE = 500
+
+# A cart item with ``reserved_until`` set holds its whole quantity, counted
+# in Product.reserved_quantity until the hold is checked out, changed or
+# swept. Holds are only taken while stock_quantity - reserved_quantity
+# covers them, so at checkout a held line cannot run out. That difference
+# is what the catalog shows as available; holds come and go with every cart
+# change, so they leave updated_at alone and only move the cached product
+# versions when the product flips between available and sold out.
+
+
+def get_hold_ttl():
+    return timedelta(seconds=getattr(settings, 'CART_RESERVATION_TTL', 15 * 60))
+
+
+def flips_availability(stock_quantity, reserved_quantity, change):
+    # ``change`` is what was just added to ``reserved_quantity``.
+    available = stock_quantity - reserved_quantity
+    return (available > 0) != (available + change > 0)
+
+
+def reserve(cart_id, product_id, quantity, add=False):
+    # Sets (or with ``add``, increases) the quantity of a cart line and holds
+    # it for another CART_RESERVATION_TTL; quantity 0 removes the line.
+    # Only the difference to what the line already holds touches the
+    # product row, as one conditional UPDATE. Returns the item, or None
+    # when it was removed.
+    with transaction.atomic():
+        item = CartItem.objects.select_for_update().filter(cart_id=cart_id, product_id=product_id).first()
+        if add and item is not None:
+            quantity += item.quantity
+        held = item.quantity if item is not None and item.reserved_until is not None else 0
+
+        change = quantity - held
+        if change > 0:
+            taken = Product.objects.filter(
+                pk=product_id, stock_quantity__gte=F('reserved_quantity') + change
+            ).update(reserved_quantity=F('reserved_quantity') + change)
+        elif change < 0:
+            Product.objects.filter(pk=product_id).update(reserved_quantity=F('reserved_quantity') + change)
+        if change:
+            stock_quantity, reserved_quantity = Product.objects.values_list(
+                'stock_quantity', 'reserved_quantity'
+            ).get(pk=product_id)
+            if change > 0 and not taken:
+                available = max(stock_quantity - reserved_quantity, 0) + held
+                raise serializers.ValidationError(f"Not enough stock. Only {available} available.")
+            if flips_availability(stock_quantity, reserved_quantity, change):
+                transaction.on_commit(lambda: invalidate_product_details([product_id]))
+
+        if quantity == 0:
+            if item is not None:
+                item.delete()
+            return None
+        if item is None:
+            item = CartItem(cart_id=cart_id, product_id=product_id)
+        item.quantity = quantity
+        item.reserved_until = timezone.now() + get_hold_ttl()
+        item.save()
+        return item
+
+
+def release_expired(batch_size=SWEEP_BATCH_SIZE):
+    # Each batch is its own short transaction: the expired lines lose their
+    # hold (they stay in the cart) and every product affected gets a single
+    # grouped decrement. Rows locked by a running checkout are skipped and
+    # picked up by the next sweep.
+    released = 0
+    while True:
+        with transaction.atomic():
+            holds = list(
+                CartItem.objects.select_for_update(skip_locked=True)
+                .filter(reserved_until__lt=timezone.now())
+                .order_by('reserved_until')
+                .values_list('pk', 'product_id', 'quantity')[:batch_size]
+            )
+            if not holds:
+                return released
+            CartItem.objects.filter(pk__in=[pk for pk, _, _ in holds]).update(reserved_until=None)
+            totals = defaultdict(int)
+            for _, product_id, quantity in holds:
+                totals[product_id] += quantity
+            Product.objects.filter(pk__in=totals).update(reserved_quantity=Case(
+                *[When(pk=product_id, then=F('reserved_quantity') - quantity) for product_id, quantity in totals.items()],
+                default=F('reserved_quantity'),
+                output_field=IntegerField(),
+            ))
+            flipped = [
+                pk for pk, stock_quantity, reserved_quantity in Product.objects.filter(pk__in=totals)
+                .values_list('pk', 'stock_quantity', 'reserved_quantity')
+                if flips_availability(stock_quantity, reserved_quantity, -totals[pk])
+            ]
+            transaction.on_commit(lambda flipped=flipped: invalidate_product_details(flipped))
+        released += len(holds)
+
+
+def recount_reservations():
+    # Rebuilds every counter from the holds themselves, e.g. after cart
+    # lines were removed by a cascade that bypassed reserve().
+    # Only products whose counter was off are rewritten.
+    held = CartItem.objects.filter(
+        product=OuterRef('pk'), reserved_until__isnull=False
+    ).values('product').annotate(total=Sum('quantity')).values('total')
+    with transaction.atomic():
+        stale = list(
+            Product.objects.annotate(held=Coalesce(Subquery(held), Value(0)))
+            .exclude(reserved_quantity=F('held'))
+            .values_list('pk', 'stock_quantity', 'reserved_quantity', 'held')
+        )
+        Product.objects.filter(pk__in=[pk for pk, _, _, _ in stale]).update(
+            reserved_quantity=Coalesce(Subquery(held), Value(0))
+        )
+        flipped = [
+            pk for pk, stock_quantity, reserved_quantity, total in stale
+            if flips_availability(stock_quantity, total, total - reserved_quantity)
+        ]
+        transaction.on_commit(lambda: invalidate_product_details(flipped))
+    return len(stale)
@@ -1,6 +1,9 @@
+from functools import lru_cache
 from rest_framework import serializers
 from .models import Cart, CartItem
+from apps.products.compiled import CompiledSerializer, RowField
 from apps.products.models import Product
+from apps.products.pricing import lines_total, price_lines
 
 
 class ProductInCartSerializer(serializers.ModelSerializer):
@@ -15,24 +18,15 @@ class ProductInCartSerializer(serializers.ModelSerializer):
         
         
     def get_final_price(self, obj):
-        if obj.discount_percentage:
-            discounted = obj.price - (obj.price * obj.discount_percentage / 100)
-            return round(discounted, 2)
-        return obj.price
+        return obj.final_price
     
     
     def get_in_stock(self, obj):
-        return obj.stock_quantity > 0
+        return obj.available_quantity > 0
     
     
     def get_primary_image(self, obj):
-         
-        primary_img = obj.images.filter(is_primary=True).first()
-        if primary_img:
-            return primary_img.image_url
-         
-        first_img = obj.images.first()
-        return first_img.image_url if first_img else None
+        return obj.primary_image_url
     
 
 class CartItemSerializer(serializers.ModelSerializer):
@@ -41,14 +35,17 @@ class CartItemSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = CartItem
-        fields = ['id', 'product', 'quantity', 'subtotal', 'added_at']
+        fields = ['id', 'product', 'quantity', 'subtotal', 'added_at', 'reserved_until']
         
         
-        def get_subtotal(self, obj):
-            final_price = obj.product.price
-            if obj.product.discount_percentage:
-                final_price -= obj.product.price * obj.product.discount_percentage / 100
-            return round(final_price * obj.quantity, 2)
+    def get_subtotal(self, obj):
+        return price_lines([(obj.product.price, obj.product.discount_percentage, obj.quantity)]).subtotals[0]
+
+    def to_representation(self, instance):
+        # The line's own hold is stock its owner can still check out.
+        data = super().to_representation(instance)
+        data['product']['in_stock'] = instance.product.available_quantity + instance.held_quantity > 0
+        return data
         
 
 class CartSerializer(serializers.ModelSerializer):
@@ -76,13 +73,56 @@ class CartSerializer(serializers.ModelSerializer):
         
         
     def get_total_amount(self, obj):
-        total = 0
-        for item in obj.items.all():
-            price = item.product.price
-            if item.product.discount_percentage:
-                price -= item.product.price * item.product.discount_percentage / 100
-            total += price * item.quantity
-        return round(total, 2)
+        return lines_total(
+            (item.product.price, item.product.discount_percentage, item.quantity)
+            for item in obj.items.all()
+        )
+
+
+@lru_cache(maxsize=None)
+def get_cart_item_row_serializer():
+    return CompiledSerializer(CartItemSerializer(), {
+        'product': {
+            'final_price': RowField(['final_price'], lambda final_price: final_price),
+            'in_stock': RowField(
+                ['product__stock_quantity', 'product__reserved_quantity', 'quantity', 'reserved_until'],
+                lambda stock_quantity, reserved_quantity, quantity, reserved_until: (
+                    max(stock_quantity - reserved_quantity, 0) + (quantity if reserved_until is not None else 0) > 0
+                ),
+                root=True,
+            ),
+            'primary_image': RowField(['primary_image_url'], lambda url: url),
+        },
+        'subtotal': RowField(
+            ['product__price', 'product__discount_percentage', 'quantity'],
+            lambda price, discount_percentage, quantity: price_lines([(price, discount_percentage, quantity)]).subtotals[0],
+        ),
+    })
+
+
+@lru_cache(maxsize=None)
+def get_cart_row_serializer():
+    # ``items`` is the list of item rows read with the item serializer's columns.
+    item_serializer = get_cart_item_row_serializer()
+    return CompiledSerializer(CartSerializer(), {
+        'user': RowField(['user__username'], lambda username: username),
+        'items': RowField(['items'], item_serializer.many),
+        'items_count': RowField(['items'], lambda items: sum(item['quantity'] for item in items)),
+        'total_amount': RowField(['items'], lambda items: lines_total(
+            (item['product__price'], item['product__discount_percentage'], item['quantity']) for item in items
+        )),
+    })
+
+
+def get_cart_data(cart):
+    # Same output as CartSerializer(cart).data in two queries.
+    cart_serializer = get_cart_row_serializer()
+    item_serializer = get_cart_item_row_serializer()
+    row = Cart.objects.filter(pk=cart.pk).values(
+        *[column for column in cart_serializer.columns if column != 'items']
+    ).get()
+    row['items'] = list(cart.items.order_by('pk').values(*item_serializer.columns))
+    return cart_serializer(row)
         
  
 class CartItemCreateSerializer(serializers.ModelSerializer):
@@ -97,7 +137,7 @@ class CartItemCreateSerializer(serializers.ModelSerializer):
     def validate_product(self, value):
         if not value.is_active:
             raise serializers.ValidationError('This product is not active.')
-        if value.stock_quantity <= 0:
+        if value.available_quantity <= 0:
             raise serializers.ValidationError('This product is out of stock.')
         return value
     
@@ -131,7 +171,7 @@ class CartItemUpdateSerializer(serializers.ModelSerializer):
         quantity = attrs.get('quantity')
         product = self.instance.product
         
-        if quantity > product.stock_quality:
+        if quantity > product.stock_quantity:
             raise serializers.ValidationError(
                 f"Only {product.stock_quantity} items left in stock."
                 
@@ -1,3 +1,181 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from apps.carts.models import Cart, CartItem
+from apps.carts.reservations import recount_reservations, release_expired
+from apps.carts.serializers import CartItemSerializer, CartSerializer, get_cart_data
+from apps.products.models import Product, ProductImage
+from apps.products.tests import ProductTestMixin
+
+
+class CartSerializationTests(ProductTestMixin, TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('shopper', password='pass')
+        self.cart = Cart.objects.create(user=self.user)
+        category, brand = self.create_category(), self.create_brand()
+        phone = self.create_product('Phone', category, brand, price='19.99', discount_percentage=15)
+        tablet = self.create_product('Tablet', category, brand, price='250.00', stock_quantity=0)
+        ProductImage.objects.create(product=tablet, image_url='https://example.com/t.png')
+        CartItem.objects.create(cart=self.cart, product=phone, quantity=3)
+        CartItem.objects.create(cart=self.cart, product=tablet, quantity=1)
+
+    def test_rows_render_like_the_model_serializer(self):
+        expected = JSONRenderer().render(CartSerializer(self.cart).data)
+
+        with self.assertNumQueries(2):
+            data = get_cart_data(self.cart)
+
+        self.assertEqual(JSONRenderer().render(data), expected)
+
+    def test_empty_cart(self):
+        self.cart.items.all().delete()
+
+        expected = JSONRenderer().render(CartSerializer(self.cart).data)
+        self.assertEqual(JSONRenderer().render(get_cart_data(self.cart)), expected)
+
+    def test_endpoint_serves_rows(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        response = client.get(reverse('carts:cart-detail'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['items_count'], 4)
+        self.assertEqual(response.data['total_amount'], Decimal('300.97'))
+        self.assertEqual(JSONRenderer().render(response.data), JSONRenderer().render(CartSerializer(self.cart).data))
+
+
+class StockReservationTests(ProductTestMixin, TestCase):
+    def setUp(self):
+        self.product = self.create_product('Phone', self.create_category(), self.create_brand(), stock_quantity=3)
+        self.clients = []
+        for name in ['first', 'second']:
+            client = APIClient()
+            client.force_authenticate(User.objects.create_user(name, password='pass'))
+            self.clients.append(client)
+
+    def add(self, client, quantity):
+        return client.post(reverse('carts:cart-item-add'), {'product': self.product.pk, 'quantity': quantity})
+
+    def assertStock(self, stock_quantity, reserved_quantity):
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.stock_quantity, self.product.reserved_quantity), (stock_quantity, reserved_quantity))
+
+    def test_adding_to_the_cart_holds_stock(self):
+        first, second = self.clients
+
+        self.assertEqual(self.add(first, 2).status_code, 200)
+        response = self.add(second, 2)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, ['Not enough stock. Only 1 available.'])
+        self.assertStock(3, 2)
+        self.assertEqual(self.product.available_quantity, 1)
+        self.assertEqual(self.add(first, 1).status_code, 200)
+        self.assertStock(3, 3)
+
+    def test_catalog_shows_stock_on_hold_as_unavailable(self):
+        detail_url = reverse('products:detail', args=[self.product.pk])
+        etag = self.client.get(detail_url)['ETag']
+        updated_at = self.product.updated_at
+
+        # Holds that leave stock available keep the cached product.
+        with self.captureOnCommitCallbacks(execute=True):
+            self.add(self.clients[0], 2)
+        self.assertEqual(self.client.get(detail_url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.add(self.clients[1], 1)
+
+        detail = self.client.get(detail_url).data
+        self.assertEqual((detail['stock_quantity'], detail['available_quantity'], detail['in_stock']), (3, 0, False))
+        row = self.client.get(reverse('products:list')).data['results'][0]
+        self.assertEqual((row['available_quantity'], row['in_stock']), (0, False))
+        self.assertEqual(Product.objects.get(pk=self.product.pk).updated_at, updated_at)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(release_expired(), 0)
+            CartItem.objects.update(reserved_until=timezone.now() - timedelta(seconds=1))
+            release_expired()
+        self.assertTrue(self.client.get(detail_url).data['in_stock'])
+
+    def test_line_holding_the_last_units_is_in_stock_for_its_owner(self):
+        first, second = self.clients
+        second.post(reverse('carts:cart-item-add'), {'product': self.create_product(
+            'Tablet', self.product.category, self.product.brand, stock_quantity=1
+        ).pk, 'quantity': 1})
+
+        response = self.add(first, 3)
+
+        self.assertTrue(response.data['items'][0]['product']['in_stock'])
+        self.assertTrue(first.get(reverse('carts:cart-detail')).data['items'][0]['product']['in_stock'])
+        cart = Cart.objects.get(user__username='first')
+        self.assertEqual(JSONRenderer().render(get_cart_data(cart)), JSONRenderer().render(CartSerializer(cart).data))
+        # Another cart sees the stock as taken.
+        other = CartItem.objects.create(cart=Cart.objects.get(user__username='second'), product_id=self.product.pk)
+        self.assertFalse(CartItemSerializer(other).data['product']['in_stock'])
+
+    def test_changing_and_removing_lines_moves_the_hold(self):
+        self.add(self.clients[0], 3)
+        item = CartItem.objects.get()
+
+        self.clients[0].patch(reverse('carts:cart-item-update', args=[item.pk]), {'quantity': 1})
+        self.assertStock(3, 1)
+        self.clients[0].delete(reverse('carts:cart-item-delete', args=[item.pk]))
+        self.assertStock(3, 0)
+        self.assertFalse(CartItem.objects.exists())
+
+    def test_expired_holds_are_swept_in_batches(self):
+        other = self.create_product('Tablet', self.product.category, self.product.brand, stock_quantity=5)
+        self.add(self.clients[0], 2)
+        self.clients[1].post(reverse('carts:cart-item-add'), {'product': other.pk, 'quantity': 4})
+        self.clients[1].post(reverse('carts:cart-item-add'), {'product': self.product.pk, 'quantity': 1})
+        CartItem.objects.update(reserved_until=timezone.now() - timedelta(seconds=1))
+
+        self.assertEqual(release_expired(batch_size=2), 3)
+
+        self.assertStock(3, 0)
+        other.refresh_from_db()
+        self.assertEqual(other.reserved_quantity, 0)
+        # The lines stay in the carts, just without a hold.
+        self.assertEqual(CartItem.objects.filter(reserved_until__isnull=True).count(), 3)
+
+    def test_checkout_turns_holds_into_sales(self):
+        first, second = self.clients
+        self.add(second, 1)
+        CartItem.objects.update(reserved_until=None)
+        Product.objects.filter(pk=self.product.pk).update(reserved_quantity=0)
+        self.add(first, 3)
+        checkout = {'shipping_address': '1 Long Street, Tashkent', 'phone': '+998901234567'}
+
+        # The unheld line competes for stock that is all on hold.
+        response = second.post(reverse('orders:order-checkout'), checkout)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, ['Not enough stock for Phone. Only 0 left.'])
+
+        self.assertEqual(first.post(reverse('orders:order-checkout'), checkout).status_code, 201)
+        self.assertStock(0, 0)
+
+    def test_saving_a_product_keeps_the_reservation_counter(self):
+        product = Product.objects.get(pk=self.product.pk)
+        self.add(self.clients[0], 2)
+
+        product.name = 'Renamed'
+        product.save()
+
+        self.assertStock(3, 2)
+
+    def test_recount_rebuilds_reserved_quantity(self):
+        self.add(self.clients[0], 2)
+        Product.objects.update(reserved_quantity=7)
+
+        recount_reservations()
 
-# Create your tests here.
+        self.assertStock(3, 2)
@@ -9,8 +9,9 @@ from rest_framework.permissions import IsAuthenticated
 from .models import Cart, CartItem
 # from apps.orders.models import Order, OrderItem
 # from apps.orders.serializers import OrderCreateSerializer
-from .serializers import CartSerializer, CartItemCreateSerializer, CartItemUpdateSerializer
+from .serializers import CartSerializer, CartItemCreateSerializer, CartItemUpdateSerializer, get_cart_data
 from apps.products.models import Product
+from .reservations import reserve
 
 
 class CartRetrieveApiView(GenericAPIView, RetrieveModelMixin):
@@ -23,7 +24,7 @@ class CartRetrieveApiView(GenericAPIView, RetrieveModelMixin):
         return cart
     
     def get(self, request, *args, **kwargs):
-        return self.retrieve(request, *args, **kwargs)
+        return Response(get_cart_data(self.get_object()))
     
     
 class CartItemCreateAPIView(GenericAPIView, CreateModelMixin):
@@ -40,33 +41,15 @@ class CartItemCreateAPIView(GenericAPIView, CreateModelMixin):
         product = serializer.validated_data['product']
         quantity = serializer.validated_data['quantity']
         
-        
-        existing_item = cart.items.filter(product=product).first()
-        
-        
-        if existing_item:
-            new_quantity = existing_item.quantity + quantity
-            
-            
-            if new_quantity > product.stock_quantity:
-                raise serializers.ValidationError(f"Not enough stock. Only {product.stock_quantity} available.")
-            
-            
-            existing_item.quantity = new_quantity
-            existing_item.save()
-            
-        else:
-            if quantity > product.stock_quantity:
-                raise serializers.ValidationError(f"Not enough stock. Only {product.stock_quantity} available.")
-            
-            CartItem.objects.create(cart=cart, product=product, quantity=quantity)
+        # Adding to the cart puts the units on hold for a while, so the
+        # last items cannot be promised to several carts at once.
+        reserve(cart.pk, product.pk, quantity, add=True)
             
     def post(self, request, *args, **kwargs):
         self.create(request, *args, **kwargs)
         
         cart = request.user.cart
-        cart_serializer = CartSerializer(cart)
-        return Response(cart_serializer.data, status=status.HTTP_200_OK)
+        return Response(get_cart_data(cart), status=status.HTTP_200_OK)
         
 
 
@@ -80,10 +63,11 @@ class CartItemUpdatedAPIView(GenericAPIView, UpdateModelMixin):
     
     
     def perform_update(self, serializer):
-        instance = serializer.save()
+        instance = serializer.instance
+        instance.quantity = serializer.validated_data.get('quantity', instance.quantity)
         
-        if instance.quantity == 0:
-            instance.delete()
+        # Quantity 0 removes the line and releases its hold.
+        serializer.instance = reserve(instance.cart_id, instance.product_id, instance.quantity) or instance
             
     
     def patch(self, request, *args, **kwargs):
@@ -99,6 +83,10 @@ class CartItemDeleteAPIView(GenericAPIView, DestroyModelMixin):
         return self.request.user.cart.items.all()
     
     
+    def perform_destroy(self, instance):
+        reserve(instance.cart_id, instance.product_id, 0)
+    
+    
     def delete(self, request, *args, **kwargs):
         return self.destroy(request, *args, **kwargs)
     
@@ -0,0 +1,23 @@
+from django.contrib import admin
+from .models import StockMovement, StockSnapshot
+
+
+@admin.register(StockMovement)
+class StockMovementAdmin(admin.ModelAdmin):
+    list_display = ['product', 'kind', 'quantity', 'reference', 'created_at']
+    list_filter = ['kind']
+    # Movements are written by the code that moves stock; stock is
+    # corrected on the product, which records the adjustment.
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(StockSnapshot)
+class StockSnapshotAdmin(admin.ModelAdmin):
+    list_display = ['product', 'quantity', 'last_movement_id', 'taken_at']
@@ -0,0 +1,156 @@
+import random
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, OuterRef, Subquery, Sum, When
+from django.utils import timezone
+
+from apps.inventory.models import StockShard
+from apps.products.cache import invalidate_product_details
+from apps.products.models import Product
+
+# With STOCK_COUNTER_SHARDS > 1 checkout and cancellation move stock on one
+# of N StockShard rows per product, chosen at random per request, instead of
+# on the product row, so concurrent buyers of one product mostly lock
+# different rows. The shards then hold the stock and
+# Product.stock_quantity is their cached total, refreshed after each commit.
+# A product is split the first time it is sold; writers that set stock on
+# the product row (admin, bulk update, import) fold its shards back first.
+
+
+def get_shard_count():
+    return max(getattr(settings, 'STOCK_COUNTER_SHARDS', 1), 1)
+
+
+def split(quantity, shards):
+    base, extra = divmod(quantity, shards)
+    return [base + (1 if shard < extra else 0) for shard in range(shards)]
+
+
+def ensure_shards(product_ids, shards):
+    existing = set(StockShard.objects.filter(product_id__in=product_ids).values_list('product_id', flat=True).distinct())
+    missing = [pk for pk in product_ids if pk not in existing]
+    if missing:
+        StockShard.objects.bulk_create(
+            [
+                StockShard(product_id=pk, shard=shard, quantity=quantity)
+                for pk, stock_quantity in Product.objects.filter(pk__in=missing).values_list('pk', 'stock_quantity')
+                for shard, quantity in enumerate(split(max(stock_quantity, 0), shards))
+            ],
+            ignore_conflicts=True,
+        )
+
+
+def take_from_shards(product_id, quantity, shards):
+    # One conditional UPDATE on a random shard covers the usual case; only
+    # when that shard runs short are the others drained, largest first.
+    shard = random.randrange(shards)
+    if StockShard.objects.filter(product_id=product_id, shard=shard, quantity__gte=quantity).update(
+        quantity=F('quantity') - quantity
+    ):
+        return True
+    remaining = quantity
+    for shard, available in StockShard.objects.filter(product_id=product_id, quantity__gt=0).order_by(
+        '-quantity'
+    ).values_list('shard', 'quantity'):
+        taken = min(available, remaining)
+        if StockShard.objects.filter(product_id=product_id, shard=shard, quantity__gte=taken).update(
+            quantity=F('quantity') - taken
+        ):
+            remaining -= taken
+        if not remaining:
+            return True
+    return False
+
+
+def refresh_totals(product_ids):
+    total = StockShard.objects.filter(product=OuterRef('pk')).values('product').annotate(
+        total=Sum('quantity')
+    ).values('total')
+    product_ids = list(product_ids)
+    Product.objects.filter(pk__in=product_ids).update(stock_quantity=Subquery(total), updated_at=timezone.now())
+    transaction.on_commit(lambda: invalidate_product_details(product_ids))
+
+
+def take_sharded(quantities, held, shards):
+    # Same contract as the single-row path in apps.orders.checkout: returns
+    # False when any product cannot be filled, and the caller rolls back.
+    # Holds stay on Product.reserved_quantity; with shards the check that
+    # unheld units are not promised to other carts is a read, while shards
+    # never go below zero, so nothing is oversold either way.
+    product_ids = sorted(quantities)
+    ensure_shards(product_ids, shards)
+    unheld = [pk for pk in product_ids if quantities[pk] > held.get(pk, 0)]
+    if unheld:
+        totals = dict(
+            StockShard.objects.filter(product_id__in=unheld).values('product').annotate(
+                total=Sum('quantity')
+            ).values_list('product', 'total')
+        )
+        reserved = dict(Product.objects.filter(pk__in=unheld).values_list('pk', 'reserved_quantity'))
+        if any(totals.get(pk, 0) - reserved[pk] < quantities[pk] - held.get(pk, 0) for pk in unheld):
+            return False
+    for pk in product_ids:
+        if not take_from_shards(pk, quantities[pk], shards):
+            return False
+    release_holds(held)
+    transaction.on_commit(lambda: refresh_totals(product_ids))
+    return True
+
+
+def release_holds(held):
+    held = {pk: quantity for pk, quantity in held.items() if quantity}
+    if held:
+        Product.objects.filter(pk__in=held).update(reserved_quantity=Case(
+            *[When(pk=pk, then=F('reserved_quantity') - quantity) for pk, quantity in held.items()],
+            default=F('reserved_quantity'),
+            output_field=IntegerField(),
+        ))
+
+
+def put_back(quantities, shards=None):
+    # Returns units (a cancelled order): one grouped UPDATE for products on
+    # a single row, a random shard each for split ones.
+    shards = shards or get_shard_count()
+    quantities = {pk: quantity for pk, quantity in quantities.items() if quantity}
+    if not quantities:
+        return
+    sharded = set()
+    if shards > 1:
+        sharded = set(StockShard.objects.filter(product_id__in=quantities).values_list('product_id', flat=True).distinct())
+    if sharded:
+        for pk in sharded:
+            # Shard 0 always exists, even if the product was split while
+            # fewer shards were configured.
+            if not StockShard.objects.filter(product_id=pk, shard=random.randrange(shards)).update(
+                quantity=F('quantity') + quantities[pk]
+            ):
+                StockShard.objects.filter(product_id=pk, shard=0).update(quantity=F('quantity') + quantities[pk])
+        sharded_ids = sorted(sharded)
+        transaction.on_commit(lambda: refresh_totals(sharded_ids))
+    rest = {pk: quantity for pk, quantity in quantities.items() if pk not in sharded}
+    if rest:
+        Product.objects.filter(pk__in=rest).update(
+            stock_quantity=Case(
+                *[When(pk=pk, then=F('stock_quantity') + quantity) for pk, quantity in rest.items()],
+                default=F('stock_quantity'),
+                output_field=IntegerField(),
+            ),
+            updated_at=timezone.now(),
+        )
+        rest_ids = list(rest)
+        transaction.on_commit(lambda: invalidate_product_details(rest_ids))
+
+
+def fold_shards(product_ids=None):
+    # Moves split stock back onto the product rows and drops the shards, so
+    # code that sets stock_quantity directly starts from the exact total.
+    with transaction.atomic():
+        shards = StockShard.objects.all()
+        if product_ids is not None:
+            shards = shards.filter(product_id__in=product_ids)
+        folded = list(shards.values_list('product_id', flat=True).distinct())
+        if folded:
+            refresh_totals(folded)
+            StockShard.objects.filter(product_id__in=folded).delete()
+    return len(folded)
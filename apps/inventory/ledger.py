@@ -0,0 +1,112 @@
+from django.db import transaction
+from django.db.models import F, Max, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from apps.inventory.counters import fold_shards, get_shard_count
+from apps.inventory.models import StockMovement, StockSnapshot
+from apps.products.models import Product
+
+SNAPSHOT_BATCH_SIZE = 1000
+
+
+def record(quantities, kind, reference=''):
+    # ``quantities`` is an iterable of (product_id, signed quantity); one
+    # multi-row INSERT, never an update of an existing row.
+    record_lines(((product_id, quantity, reference) for product_id, quantity in quantities), kind)
+
+
+def record_lines(lines, kind):
+    # Same as record() with a reference per line: (product_id, quantity, reference).
+    StockMovement.objects.bulk_create([
+        StockMovement(product_id=product_id, kind=kind, quantity=quantity, reference=reference)
+        for product_id, quantity, reference in lines
+        if quantity
+    ])
+
+
+def adjust_stock(product_id, quantity, kind=StockMovement.ADJUSTMENT, reference=''):
+    # Relative change, so it composes with concurrent checkouts instead of
+    # overwriting them.
+    with transaction.atomic():
+        Product.objects.filter(pk=product_id).update(
+            stock_quantity=F('stock_quantity') + quantity, updated_at=timezone.now()
+        )
+        record([(product_id, quantity)], kind, reference)
+
+
+def set_stock(product_id, quantity, kind=StockMovement.ADJUSTMENT, reference=''):
+    # For callers that take an absolute stock level: applied as the
+    # difference to the current one, read in the same transaction.
+    with transaction.atomic():
+        if get_shard_count() > 1:
+            fold_shards([product_id])
+        current = Product.objects.values_list('stock_quantity', flat=True).get(pk=product_id)
+        adjust_stock(product_id, quantity - current, kind, reference)
+
+
+def get_tail(product_ids=None):
+    # Movements not yet folded into their product's snapshot, per product.
+    watermark = StockSnapshot.objects.filter(product=OuterRef('product')).values('last_movement_id')
+    movements = StockMovement.objects.filter(id__gt=Coalesce(Subquery(watermark), Value(0)))
+    if product_ids is not None:
+        movements = movements.filter(product_id__in=product_ids)
+    return movements.values('product').annotate(total=Sum('quantity'), last_id=Max('id')).order_by()
+
+
+def get_ledger_stock(product_ids):
+    # Snapshot plus tail: reads only the movements since the last snapshot.
+    stock = dict(StockSnapshot.objects.filter(product_id__in=product_ids).values_list('product_id', 'quantity'))
+    for row in get_tail(product_ids):
+        stock[row['product']] = stock.get(row['product'], 0) + row['total']
+    return stock
+
+
+def take_snapshots(prune=False):
+    # Folds every tail into its snapshot. With ``prune`` the folded
+    # movements are deleted, which keeps the table small at the cost of
+    # the audit trail before the snapshot.
+    with transaction.atomic():
+        tails = list(get_tail())
+        now = timezone.now()
+        snapshots = {
+            snapshot.product_id: snapshot
+            for snapshot in StockSnapshot.objects.filter(product_id__in=[row['product'] for row in tails])
+        }
+        to_create, to_update = [], []
+        for row in tails:
+            snapshot = snapshots.get(row['product'])
+            if snapshot is None:
+                to_create.append(StockSnapshot(
+                    product_id=row['product'], quantity=row['total'], last_movement_id=row['last_id'], taken_at=now
+                ))
+            else:
+                snapshot.quantity += row['total']
+                snapshot.last_movement_id = row['last_id']
+                snapshot.taken_at = now
+                to_update.append(snapshot)
+        StockSnapshot.objects.bulk_create(to_create, batch_size=SNAPSHOT_BATCH_SIZE)
+        StockSnapshot.objects.bulk_update(
+            to_update, ['quantity', 'last_movement_id', 'taken_at'], batch_size=SNAPSHOT_BATCH_SIZE
+        )
+        if prune:
+            watermark = StockSnapshot.objects.filter(product=OuterRef('product')).values('last_movement_id')
+            StockMovement.objects.filter(id__lte=Subquery(watermark)).delete()
+    return len(tails)
+
+
+def find_drift(batch_size=SNAPSHOT_BATCH_SIZE):
+    # Yields (product_id, stock_quantity, ledger_quantity) wherever the two
+    # disagree, walking the catalog in batches.
+    last_pk = 0
+    while True:
+        batch = list(
+            Product.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', 'stock_quantity')[:batch_size]
+        )
+        if not batch:
+            return
+        ledger = get_ledger_stock([pk for pk, _ in batch])
+        for pk, stock_quantity in batch:
+            if ledger.get(pk, 0) != stock_quantity:
+                yield pk, stock_quantity, ledger.get(pk, 0)
+        last_pk = batch[-1][0]
@@ -0,0 +1,75 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from apps.inventory.models import StockShard
+from apps.orders.checkout import OutOfStock, take_stock
+from apps.products.models import Brand, Category, Product
+
+PREFIX = 'benchmark-stock'
+
+
+class Command(BaseCommand):
+    help = (
+        'Hammer the stock of one product from many threads, one unit per transaction, and '
+        'compare throughput of the single-row counter with sharded counters. Rows are '
+        'committed (other threads must see them) and deleted afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--operations', type=int, default=200, help='Per thread.')
+        parser.add_argument('--shards', type=int, nargs='+', default=[4, 16])
+
+    def handle(self, *args, **options):
+        if Product.objects.filter(slug=PREFIX).exists():
+            raise CommandError(f'A product from an interrupted run is still there ({PREFIX}); delete it first.')
+        self.threads = options['threads']
+        self.operations = options['operations']
+        self.stdout.write(f'{connection.vendor}, {self.threads} threads x {self.operations} decrements')
+        category = Category.objects.create(name='Benchmark stock', slug=PREFIX, description='')
+        brand = Brand.objects.create(name=PREFIX, logo='https://example.com/logo.png', description='')
+        try:
+            baseline = self.run(category, brand, 1)
+            self.stdout.write(f'{"single row":<12} {baseline:>10,.0f} decrements/s')
+            for shards in options['shards']:
+                rate = self.run(category, brand, shards)
+                self.stdout.write(f'{f"{shards} shards":<12} {rate:>10,.0f} decrements/s   x{rate / baseline:.2f}')
+        finally:
+            Product.objects.filter(slug=PREFIX).delete()
+            brand.delete()
+            category.delete()
+
+    def run(self, category, brand, shards):
+        total = self.threads * self.operations
+        product = Product.objects.create(
+            name='Benchmark', slug=PREFIX, description='Benchmark product', category=category, brand=brand,
+            price=Decimal('1.00'), stock_quantity=total,
+        )
+
+        def decrement(_):
+            try:
+                for _ in range(self.operations):
+                    with transaction.atomic():
+                        take_stock({product.pk: 1}, {}, shards)
+            except OutOfStock:
+                raise CommandError('Ran out of stock: the counter lost units.')
+            finally:
+                connection.close()
+
+        try:
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=self.threads) as executor:
+                list(executor.map(decrement, range(self.threads)))
+            elapsed = time.perf_counter() - started
+
+            product.refresh_from_db()
+            left = sum(StockShard.objects.filter(product=product).values_list('quantity', flat=True))
+            if (left if shards > 1 else product.stock_quantity) != 0:
+                raise CommandError(f'{shards} shards: stock does not add up after {total} decrements.')
+            return total / elapsed
+        finally:
+            product.delete()
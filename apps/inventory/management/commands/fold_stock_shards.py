@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.inventory.counters import fold_shards
+
+
+class Command(BaseCommand):
+    help = 'Move all sharded stock back onto the product rows, e.g. before setting STOCK_COUNTER_SHARDS to 1.'
+
+    def handle(self, *args, **options):
+        count = fold_shards()
+        self.stdout.write(self.style.SUCCESS(f'Folded the stock shards of {count} products.'))
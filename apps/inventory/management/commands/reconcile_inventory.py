@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.inventory.ledger import find_drift, record
+from apps.inventory.models import StockMovement
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare every product\'s stock_quantity with its ledger (snapshot plus later '
+        'movements) and report the products that drifted.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix', action='store_true',
+            help='Record an adjustment that brings the ledger in line with stock_quantity.',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        drifted = list(find_drift(options['batch_size']))
+        for product_id, stock_quantity, ledger_quantity in drifted:
+            self.stdout.write(
+                f'Product {product_id}: stock_quantity {stock_quantity}, ledger {ledger_quantity} '
+                f'({stock_quantity - ledger_quantity:+d})'
+            )
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS('Stock matches the ledger.'))
+            return
+        if not options['fix']:
+            raise CommandError(f'{len(drifted)} products drifted from the ledger.')
+
+        record(
+            [(product_id, stock_quantity - ledger_quantity) for product_id, stock_quantity, ledger_quantity in drifted],
+            StockMovement.ADJUSTMENT,
+            'reconcile',
+        )
+        self.stdout.write(self.style.SUCCESS(f'Recorded adjustments for {len(drifted)} products.'))
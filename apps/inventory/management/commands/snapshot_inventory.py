@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from apps.inventory.ledger import take_snapshots
+
+
+class Command(BaseCommand):
+    help = (
+        'Fold the stock movements recorded since the last run into per-product snapshots, '
+        'so ledger reads only scan what came after. Run it periodically.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--prune', action='store_true', help='Delete the movements the snapshots now cover.'
+        )
+
+    def handle(self, *args, **options):
+        count = take_snapshots(prune=options['prune'])
+        self.stdout.write(self.style.SUCCESS(f'Snapshotted stock of {count} products.'))
@@ -0,0 +1,49 @@
+from django.db import models
+from django.utils import timezone
+from apps.products.models import Product
+
+
+class StockMovement(models.Model):
+    # Append-only record of every change to Product.stock_quantity, written
+    # in the same transaction as the change itself. ``quantity`` is signed.
+    SALE = 'sale'
+    RESTOCK = 'restock'
+    ADJUSTMENT = 'adjustment'
+    IMPORT = 'import'
+    KIND_CHOICES = [
+        (SALE, 'Sale'),
+        (RESTOCK, 'Cancellation restock'),
+        (ADJUSTMENT, 'Manual adjustment'),
+        (IMPORT, 'Import'),
+    ]
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_movements')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    quantity = models.IntegerField()
+    reference = models.CharField(max_length=50, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['product', 'id'], name='stock_movement_product_idx'),
+        ]
+
+
+class StockSnapshot(models.Model):
+    # Stock of a product after every movement up to ``last_movement_id``;
+    # the ledger stock is this plus the movements after it.
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, related_name='stock_snapshot')
+    quantity = models.IntegerField()
+    last_movement_id = models.BigIntegerField(default=0)
+    taken_at = models.DateTimeField(default=timezone.now)
+
+
+class StockShard(models.Model):
+    # One slice of a product's stock in sharded counter mode; see
+    # apps.inventory.counters.
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_shards')
+    shard = models.PositiveSmallIntegerField()
+    quantity = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ['product', 'shard']
@@ -0,0 +1,14 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from apps.inventory.ledger import record
+from apps.inventory.models import StockMovement
+from apps.products.models import Product
+
+
+@receiver(post_save, sender=Product)
+def record_initial_stock(sender, instance, created, raw=False, **kwargs):
+    # Later changes are recorded by the code that makes them (checkout,
+    # cancellation, admin, import, bulk updates).
+    if created and not raw:
+        record([(instance.pk, instance.stock_quantity)], StockMovement.ADJUSTMENT, 'created')
@@ -0,0 +1,225 @@
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db.models import Sum
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.carts.models import Cart, CartItem
+from apps.inventory.counters import fold_shards
+from apps.inventory.ledger import adjust_stock, get_ledger_stock, take_snapshots
+from apps.inventory.models import StockMovement, StockShard, StockSnapshot
+from apps.orders.models import Order
+from apps.orders import tests as order_tests
+from apps.products.bulk import apply_bulk_update
+from apps.products.cache import get_version
+from apps.products.models import Product
+from apps.products.tests import ProductTestMixin
+
+
+class InventoryLedgerTests(ProductTestMixin, TestCase):
+    def setUp(self):
+        self.product = self.create_product('Phone', self.create_category(), self.create_brand(), stock_quantity=10)
+        self.user = User.objects.create_user('shopper', password='pass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def movements(self):
+        return list(StockMovement.objects.filter(product=self.product).order_by('pk').values_list('kind', 'quantity'))
+
+    def checkout(self, quantity):
+        CartItem.objects.create(cart=Cart.objects.get_or_create(user=self.user)[0], product=self.product, quantity=quantity)
+        return self.client.post(reverse('orders:order-checkout'), {
+            'shipping_address': '1 Long Street, Tashkent', 'phone': '+998901234567',
+        })
+
+    def assertInSync(self):
+        self.product.refresh_from_db()
+        self.assertEqual(get_ledger_stock([self.product.pk]), {self.product.pk: self.product.stock_quantity})
+
+    def test_sales_and_cancellations_are_recorded(self):
+        order_id = self.checkout(3).data['id']
+        self.client.post(reverse('orders:order-cancel', args=[order_id]))
+
+        self.assertEqual(self.movements(), [('adjustment', 10), ('sale', -3), ('restock', 3)])
+        self.assertEqual(StockMovement.objects.get(kind='sale').reference, 'ORD-0000000001')
+        self.assertInSync()
+
+    def test_admin_and_bulk_changes_are_recorded(self):
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'pass')
+        self.client.force_login(admin)
+        response = self.client.post(reverse('admin:products_product_change', args=[self.product.pk]), {
+            'name': 'Phone', 'slug': 'phone', 'description': 'Phone', 'category': self.product.category_id,
+            'brand': self.product.brand_id, 'price': '100.00', 'discount_percentage': 0, 'stock_quantity': 25,
+            'is_active': 'on', 'images-TOTAL_FORMS': 0, 'images-INITIAL_FORMS': 0,
+        })
+        self.assertEqual(response.status_code, 302)
+
+        apply_bulk_update([{'id': self.product.pk, 'stock_delta': -5}])
+        apply_bulk_update([{'id': self.product.pk, 'stock_quantity': 12}])
+
+        self.assertEqual(self.movements(), [('adjustment', 10), ('adjustment', 15), ('adjustment', -5), ('adjustment', -8)])
+        self.assertEqual(StockMovement.objects.filter(quantity=15).get().reference, 'admin')
+        self.assertInSync()
+
+    def test_saves_of_a_loaded_product_keep_stock_changed_meanwhile(self):
+        product = Product.objects.get(pk=self.product.pk)
+        self.checkout(3)
+
+        product.name = 'Phone 2'
+        product.save()
+        response = self.client.patch(reverse('products:patch', args=[self.product.pk]), {'name': 'Phone 3'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['stock_quantity'], 7)
+        self.assertInSync()
+
+    def test_adjustments_mark_the_product_updated(self):
+        since = timezone.now()
+
+        adjust_stock(self.product.pk, 5)
+
+        self.product.refresh_from_db()
+        self.assertGreaterEqual(self.product.updated_at, since)
+        self.assertInSync()
+
+    def test_admin_stock_edit_is_relative_to_the_rendered_page(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pass'))
+        url = reverse('admin:products_product_change', args=[self.product.pk])
+        page = self.client.get(url)
+        self.assertContains(page, 'name="initial-stock_quantity" value="10"')
+        self.client.force_authenticate(self.user)
+        self.checkout(3)
+        form = {
+            'name': 'Phone', 'slug': self.product.slug, 'description': 'Phone', 'category': self.product.category_id,
+            'brand': self.product.brand_id, 'price': '100.00', 'discount_percentage': 0, 'is_active': 'on',
+            'images-TOTAL_FORMS': 0, 'images-INITIAL_FORMS': 0, 'initial-stock_quantity': 10,
+        }
+
+        self.client.post(url, {**form, 'stock_quantity': 10})
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 7)
+
+        self.client.post(url, {**form, 'stock_quantity': 15})
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 12)
+        self.assertInSync()
+
+    def test_stock_set_through_the_update_endpoints_is_recorded(self):
+        response = self.client.patch(reverse('products:patch', args=[self.product.pk]), {'stock_quantity': 4})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['stock_quantity'], 4)
+        self.assertEqual(self.movements(), [('adjustment', 10), ('adjustment', -6)])
+        self.assertInSync()
+
+    def test_snapshots_fold_the_tail(self):
+        self.checkout(2)
+        self.assertEqual(take_snapshots(), 1)
+        self.checkout(1)
+
+        snapshot = StockSnapshot.objects.get(product=self.product)
+        self.assertEqual(snapshot.quantity, 8)
+        with self.assertNumQueries(2):
+            self.assertEqual(get_ledger_stock([self.product.pk]), {self.product.pk: 7})
+
+        take_snapshots(prune=True)
+        self.assertFalse(StockMovement.objects.exists())
+        self.assertInSync()
+
+    def test_reconcile_reports_and_fixes_drift(self):
+        stdout = StringIO()
+        call_command('reconcile_inventory', stdout=stdout)
+        self.assertIn('Stock matches the ledger.', stdout.getvalue())
+
+        Product.objects.filter(pk=self.product.pk).update(stock_quantity=4)
+        with self.assertRaisesMessage(CommandError, '1 products drifted'):
+            call_command('reconcile_inventory', stdout=stdout)
+        self.assertIn(f'Product {self.product.pk}: stock_quantity 4, ledger 10 (-6)', stdout.getvalue())
+
+        call_command('reconcile_inventory', '--fix', stdout=stdout)
+        self.assertEqual(self.movements()[-1], ('adjustment', -6))
+        self.assertInSync()
+
+
+@override_settings(STOCK_COUNTER_SHARDS=4)
+class ShardedStockTests(ProductTestMixin, TestCase):
+    def setUp(self):
+        self.product = self.create_product('Phone', self.create_category(), self.create_brand(), stock_quantity=10)
+        self.user = User.objects.create_user('shopper', password='pass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def checkout(self, quantity):
+        CartItem.objects.create(cart=Cart.objects.get_or_create(user=self.user)[0], product=self.product, quantity=quantity)
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse('orders:order-checkout'), {
+                'shipping_address': '1 Long Street, Tashkent', 'phone': '+998901234567',
+            })
+
+    def shards(self):
+        return list(StockShard.objects.filter(product=self.product).order_by('shard').values_list('quantity', flat=True))
+
+    def test_checkout_takes_stock_from_the_shards(self):
+        since = timezone.now()
+
+        self.assertEqual(self.checkout(2).status_code, 201)
+
+        self.assertEqual(sum(self.shards()), 8)
+        self.assertEqual(len(self.shards()), 4)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 8)
+        self.assertGreaterEqual(self.product.updated_at, since)
+
+    def test_large_orders_drain_several_shards_but_never_oversell(self):
+        self.assertEqual(self.checkout(9).status_code, 201)
+        CartItem.objects.all().delete()
+
+        response = self.checkout(2)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(sorted(self.shards()), [0, 0, 0, 1])
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_cancel_puts_units_back_on_a_shard(self):
+        order_id = self.checkout(4).data['id']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('orders:order-cancel', args=[order_id]))
+
+        self.assertEqual(sum(self.shards()), 10)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 10)
+
+    def test_direct_stock_writes_fold_the_shards(self):
+        self.checkout(3)
+
+        apply_bulk_update([{'id': self.product.pk, 'stock_delta': 5}])
+
+        self.assertFalse(StockShard.objects.exists())
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 12)
+        self.assertEqual(get_ledger_stock([self.product.pk]), {self.product.pk: 12})
+
+    def test_folding_invalidates_the_cache_after_commit(self):
+        self.checkout(3)
+        version = get_version(self.product.pk)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            fold_shards([self.product.pk])
+            self.assertEqual(get_version(self.product.pk), version)
+
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(get_version(self.product.pk), version)
+
+
+@override_settings(STOCK_COUNTER_SHARDS=4)
+class ShardedCheckoutConcurrencyTests(order_tests.CheckoutConcurrencyTests):
+    def test_concurrent_checkouts_never_oversell(self):
+        super().test_concurrent_checkouts_never_oversell()
+        self.assertEqual(StockShard.objects.aggregate(total=Sum('quantity'))['total'], 0)
@@ -1,14 +1,60 @@
+from django import forms
 from django.contrib import admin
+from django.utils import timezone
 
 # Register your models here.
+from .cancellation import cancel_orders
 from .models import Order, OrderItem
+from .serializers import CANCELLABLE_STATUSES
 
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
     extra = 0
 
+class OrderAdminForm(forms.ModelForm):
+    class Meta:
+        model = Order
+        fields = '__all__'
+
+    def clean_status(self):
+        status = self.cleaned_data['status']
+        current = self.instance.status if self.instance.pk else None
+        if current == 'cancelled' and status != 'cancelled':
+            raise forms.ValidationError('A cancelled order cannot be reopened.')
+        if status == 'cancelled' and current not in (None, 'cancelled', *CANCELLABLE_STATUSES):
+            raise forms.ValidationError('Order cannot be cancelled')
+        return status
+
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
+    form = OrderAdminForm
     list_display = ['order_number', 'user', 'total_amount', 'status']
     list_editable = ['status']
-    inlines = [OrderItemInline]
\ No newline at end of file
+    inlines = [OrderItemInline]
+    actions = ['cancel_selected']
+
+    def get_changelist_form(self, request, **kwargs):
+        return super().get_changelist_form(request, form=OrderAdminForm, **kwargs)
+
+    def save_model(self, request, obj, form, change):
+        if not change:
+            return super().save_model(request, obj, form, change)
+        # Status never moves with the row save: cancelling goes through
+        # cancel_orders so stock comes back exactly once, and other moves
+        # skip orders that were cancelled meanwhile.
+        obj.save(update_fields=[
+            field.name for field in obj._meta.concrete_fields
+            if not field.primary_key and field.name != 'status'
+        ])
+        if 'status' in form.changed_data:
+            orders = Order.objects.filter(pk=obj.pk)
+            if obj.status == 'cancelled':
+                cancel_orders(orders)
+            else:
+                orders.exclude(status='cancelled').update(status=obj.status, updated_at=timezone.now())
+        obj.refresh_from_db(fields=['status'])
+
+    @admin.action(description='Cancel selected orders and restock')
+    def cancel_selected(self, request, queryset):
+        cancelled = cancel_orders(queryset)
+        self.message_user(request, f'{len(cancelled)} of {queryset.count()} orders cancelled.')
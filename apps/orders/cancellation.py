@@ -0,0 +1,38 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+
+from apps.inventory.counters import put_back
+from apps.inventory.ledger import record_lines
+from apps.inventory.models import StockMovement
+from apps.orders.models import Order, OrderItem
+from apps.orders.serializers import CANCELLABLE_STATUSES
+
+
+def cancel_orders(orders):
+    # Cancels every order in the ``orders`` queryset that can still be
+    # cancelled and returns their ids. The status moves with an UPDATE that
+    # only matches cancellable rows, and everything their lines held goes
+    # back with one grouped stock update and one ledger insert, so the cost
+    # is the same for one order or a thousand, and an order already
+    # cancelled (by a double click or a concurrent request) is left alone.
+    with transaction.atomic():
+        order_ids = list(
+            orders.select_for_update(of=('self',)).filter(status__in=CANCELLABLE_STATUSES).values_list('pk', flat=True)
+        )
+        if not order_ids:
+            return []
+        Order.objects.filter(pk__in=order_ids, status__in=CANCELLABLE_STATUSES).update(
+            status='cancelled', updated_at=timezone.now()
+        )
+
+        lines = list(OrderItem.objects.filter(order_id__in=order_ids).values_list(
+            'product_id', 'quantity', 'order__order_number'
+        ))
+        quantities = defaultdict(int)
+        for product_id, quantity, _ in lines:
+            quantities[product_id] += quantity
+        put_back(quantities)
+        record_lines(lines, StockMovement.RESTOCK)
+    return order_ids
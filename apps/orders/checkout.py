@@ -0,0 +1,132 @@
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Q, When
+from django.utils import timezone
+from rest_framework import serializers
+
+from apps.carts.models import CartItem
+from apps.inventory.counters import get_shard_count, take_sharded
+from apps.inventory.ledger import record
+from apps.inventory.models import StockMovement
+from apps.orders.idempotency import store_response
+from apps.orders.models import OrderItem
+from apps.orders.numbers import next_order_number
+from apps.products.cache import invalidate_product_details
+from apps.products.models import Product
+from apps.products.pricing import lines_total
+
+# Each condition adds a level to SQLite's expression tree (capped at 1000),
+# so very large carts are taken in chunks.
+CHUNK_SIZE = 500
+
+
+class OutOfStock(Exception):
+    def __init__(self, quantities, held):
+        super().__init__()
+        self.quantities = quantities
+        self.held = held
+
+
+def take_stock(quantities, held, shards=None):
+    # ``quantities`` maps product id to units sold, ``held`` to the units of
+    # those already on hold for this cart (see apps.carts.reservations).
+    # Every chunk is one UPDATE that only matches rows whose unreserved stock
+    # covers the unheld part, so the check and the decrement are a single
+    # atomic step in the database and held lines pass without competing
+    # with other carts; the holds are consumed in the same statement. Any
+    # row left out means the order cannot be filled and the caller's
+    # transaction is rolled back. Rows are visited in id order to keep lock
+    # order stable. In sharded counter mode the shards take the decrement
+    # instead.
+    shards = shards or get_shard_count()
+    if shards > 1:
+        if not take_sharded(quantities, held, shards):
+            raise OutOfStock(quantities, held)
+        return
+    product_ids = sorted(quantities)
+    for start in range(0, len(product_ids), CHUNK_SIZE):
+        chunk = product_ids[start:start + CHUNK_SIZE]
+        condition = Q()
+        for pk in chunk:
+            condition |= Q(pk=pk, stock_quantity__gte=F('reserved_quantity') + (quantities[pk] - held.get(pk, 0)))
+        updated = Product.objects.filter(condition).update(
+            stock_quantity=Case(
+                *[When(pk=pk, then=F('stock_quantity') - quantities[pk]) for pk in chunk],
+                default=F('stock_quantity'),
+                output_field=IntegerField(),
+            ),
+            reserved_quantity=Case(
+                *[When(pk=pk, then=F('reserved_quantity') - held[pk]) for pk in chunk if held.get(pk)],
+                default=F('reserved_quantity'),
+                output_field=IntegerField(),
+            ),
+            updated_at=timezone.now(),
+        )
+        if updated < len(chunk):
+            raise OutOfStock(quantities, held)
+
+
+def get_stock_error(quantities, held):
+    products = Product.objects.filter(pk__in=quantities).order_by('pk').values_list(
+        'pk', 'name', 'stock_quantity', 'reserved_quantity'
+    )
+    for pk, name, stock_quantity, reserved_quantity in products:
+        available = max(stock_quantity - reserved_quantity, 0) + held.get(pk, 0)
+        if quantities[pk] > available:
+            return f"Not enough stock for {name}. Only {available} left."
+    return "Stock changed while the order was being placed. Please try again."
+
+
+def place_order(user, serializer, idempotency=None):
+    # Stock, the order, its lines, the emptied cart and, with an
+    # ``idempotency`` (key, request_hash) pair, the stored response are
+    # written in one transaction: a checkout either happens completely or
+    # not at all. The number is reserved first so its block outlives a
+    # rolled back checkout.
+    order_number = next_order_number()
+    try:
+        with transaction.atomic():
+            cart_items = list(
+                CartItem.objects.select_for_update(of=('self',)).filter(cart__user=user).select_related('product').order_by('pk')
+            )
+            if not cart_items:
+                raise serializers.ValidationError("Your cart is empty.")
+
+            quantities = {item.product_id: item.quantity for item in cart_items}
+            held = {item.product_id: item.quantity for item in cart_items if item.reserved_until is not None}
+            take_stock(quantities, held)
+            record([(pk, -quantity) for pk, quantity in quantities.items()], StockMovement.SALE, order_number)
+
+            order = serializer.save(
+                user=user,
+                order_number=order_number,
+                total_amount=lines_total(
+                    (item.product.price, item.product.discount_percentage, item.quantity)
+                    for item in cart_items
+                ),
+                status='pending',
+            )
+            # List price and discount are kept on the line so its subtotal
+            # can be re-derived with the same pricing rules.
+            OrderItem.objects.bulk_create([
+                OrderItem(
+                    order=order,
+                    product=item.product,
+                    quantity=item.quantity,
+                    price=item.product.price,
+                    discount_percentage=item.product.discount_percentage,
+                )
+                for item in cart_items
+            ])
+            # Only the lines that were sold are removed; anything added to
+            # the cart meanwhile stays there.
+            CartItem.objects.filter(pk__in=[item.pk for item in cart_items]).delete()
+            if idempotency is not None:
+                key, request_hash = idempotency
+                store_response(user, key, request_hash, 201, serializer.data)
+
+            product_ids = list(quantities)
+            transaction.on_commit(lambda: invalidate_product_details(product_ids))
+    except OutOfStock as error:
+        raise serializers.ValidationError(get_stock_error(error.quantities, error.held))
+
+    return order
@@ -0,0 +1,62 @@
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from apps.orders.models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+PURGE_BATCH_SIZE = 1000
+
+
+class KeyReused(Exception):
+    pass
+
+
+def get_ttl():
+    return timedelta(seconds=getattr(settings, 'ORDER_IDEMPOTENCY_KEY_TTL', 24 * 60 * 60))
+
+
+def get_request_hash(request):
+    # A key may only be replayed for the request it was first sent with.
+    body = json.dumps(request.data, sort_keys=True, cls=DjangoJSONEncoder)
+    return hashlib.sha256(f'{request.method} {request.path}\n{body}'.encode()).hexdigest()
+
+
+def get_live_keys():
+    return IdempotencyKey.objects.filter(created_at__gte=timezone.now() - get_ttl())
+
+
+def find_stored(user, key, request_hash):
+    stored = get_live_keys().filter(user=user, key=key).first()
+    if stored is not None and stored.request_hash != request_hash:
+        raise KeyReused
+    return stored
+
+
+def store_response(user, key, request_hash, status, body):
+    # Called inside the checkout transaction; an expired row with the same
+    # key is replaced, a live one makes the unique constraint fail the
+    # transaction so a racing duplicate rolls back instead of ordering twice.
+    IdempotencyKey.objects.filter(
+        user=user, key=key, created_at__lt=timezone.now() - get_ttl()
+    ).delete()
+    IdempotencyKey.objects.create(
+        user=user, key=key, request_hash=request_hash, response_status=status, response_body=body
+    )
+
+
+def purge_expired(batch_size=PURGE_BATCH_SIZE):
+    # Small batches keep each DELETE short so checkouts are not held up.
+    cutoff = timezone.now() - get_ttl()
+    deleted = 0
+    while True:
+        pks = list(IdempotencyKey.objects.filter(created_at__lt=cutoff).values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            return deleted
+        deleted += IdempotencyKey.objects.filter(pk__in=pks).delete()[0]
@@ -0,0 +1,92 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from rest_framework import serializers
+
+from apps.carts.models import Cart, CartItem
+from apps.orders.checkout import place_order
+from apps.orders.models import Order
+from apps.orders.serializers import OrderCreateSerializer
+from apps.products.models import Brand, Category, Product
+
+PREFIX = 'benchmark-checkout'
+ADDRESS = {'shipping_address': 'Benchmark street 1', 'phone': '+998900000000'}
+
+
+class Command(BaseCommand):
+    help = (
+        'Run concurrent checkouts for more buyers than there is stock, report checkouts/sec '
+        'and verify nothing was oversold. Checkouts have to commit for other threads to see '
+        'them, so the generated rows are deleted afterwards instead of rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--buyers', type=int, default=500)
+        parser.add_argument('--stock', type=int, default=300)
+        parser.add_argument('--items', type=int, default=3, help='Products in every cart.')
+        parser.add_argument('--threads', type=int, default=8)
+
+    def handle(self, *args, **options):
+        if Product.objects.filter(slug__startswith=PREFIX).exists():
+            raise CommandError(f'Rows from an interrupted run are still there ({PREFIX}-*); delete them first.')
+        try:
+            users = self.seed(options['buyers'], options['stock'], options['items'])
+            self.run(users, options['stock'], options['threads'])
+        finally:
+            self.clean_up()
+
+    def seed(self, buyers, stock, items):
+        category = Category.objects.create(name='Benchmark checkout', slug=PREFIX, description='')
+        brand = Brand.objects.create(name=PREFIX, logo='https://example.com/logo.png', description='')
+        products = Product.objects.bulk_create([
+            Product(
+                name=f'Product {i}', slug=f'{PREFIX}-{i}', description='Benchmark product',
+                category=category, brand=brand, price=Decimal('19.99'), final_price=Decimal('19.99'),
+                stock_quantity=stock,
+            )
+            for i in range(items)
+        ])
+        users = User.objects.bulk_create([User(username=f'{PREFIX}-{i}') for i in range(buyers)])
+        carts = Cart.objects.bulk_create([Cart(user=user) for user in users])
+        CartItem.objects.bulk_create([
+            CartItem(cart=cart, product=product, quantity=1) for cart in carts for product in products
+        ])
+        return users
+
+    def checkout(self, user):
+        serializer = OrderCreateSerializer(data=ADDRESS)
+        serializer.is_valid(raise_exception=True)
+        try:
+            place_order(user, serializer)
+            return True
+        except serializers.ValidationError:
+            return False
+        finally:
+            connection.close()
+
+    def run(self, users, stock, threads):
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            results = list(executor.map(self.checkout, users))
+        elapsed = time.perf_counter() - started
+
+        placed = sum(results)
+        stock_left = list(Product.objects.filter(slug__startswith=PREFIX).values_list('stock_quantity', flat=True))
+        self.stdout.write(
+            f'{len(users)} checkouts on {threads} threads in {elapsed:.2f}s: '
+            f'{len(users) / elapsed:,.0f} checkouts/s, {placed} placed, {len(users) - placed} out of stock'
+        )
+        if placed != min(stock, len(users)) or any(quantity != stock - placed for quantity in stock_left):
+            raise CommandError(f'Stock does not add up: {placed} orders placed, {stock_left} left of {stock}.')
+        self.stdout.write(self.style.SUCCESS('No product was oversold.'))
+
+    def clean_up(self):
+        Order.objects.filter(user__username__startswith=PREFIX).delete()
+        User.objects.filter(username__startswith=PREFIX).delete()
+        Product.objects.filter(slug__startswith=PREFIX).delete()
+        Brand.objects.filter(name=PREFIX).delete()
+        Category.objects.filter(slug=PREFIX).delete()
@@ -0,0 +1,52 @@
+import threading
+
+from django.db import connection, transaction
+from django.db.models import F
+
+from apps.orders.models import Sequence
+
+ORDER_NUMBER_BLOCK_SIZE = 100
+
+
+def reserve_block(name, size):
+    # Bumping the counter by ``size`` in one UPDATE gives this caller the
+    # whole range; other processes get the next range, so no two numbers
+    # can ever collide and there is nothing to retry.
+    Sequence.objects.get_or_create(name=name)
+    with transaction.atomic():
+        Sequence.objects.filter(name=name).update(last_value=F('last_value') + size)
+        last_value = Sequence.objects.values_list('last_value', flat=True).get(name=name)
+    return last_value - size + 1, last_value
+
+
+class BlockAllocator:
+    # Hands out numbers from a block reserved in the database, so only one
+    # allocation in ``block_size`` writes to the counter row. Numbers left in
+    # a block when the process exits are skipped, never reused.
+
+    def __init__(self, name, block_size):
+        self.name = name
+        self.block_size = block_size
+        self.lock = threading.Lock()
+        self.next_value = 1
+        self.last_value = 0
+
+    def allocate(self):
+        if connection.in_atomic_block:
+            # Inside a transaction the reservation would be rolled back with
+            # it while the block stayed cached here, so take just one number
+            # that lives and dies with the caller's transaction.
+            return reserve_block(self.name, 1)[0]
+        with self.lock:
+            if self.next_value > self.last_value:
+                self.next_value, self.last_value = reserve_block(self.name, self.block_size)
+            value = self.next_value
+            self.next_value += 1
+            return value
+
+
+order_numbers = BlockAllocator('order_number', ORDER_NUMBER_BLOCK_SIZE)
+
+
+def next_order_number():
+    return f'ORD-{order_numbers.allocate():010d}'
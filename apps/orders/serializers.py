@@ -1,13 +1,20 @@
+from functools import lru_cache
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from .models import Order, OrderItem
+from apps.products.compiled import CompiledSerializer, RowField
 from apps.products.models import Product
+from apps.products.pricing import price_lines
+
+CANCELLABLE_STATUSES = ['pending', 'processing']
 
 
 class OrderItemSerializer(serializers.ModelSerializer):
     product_name = serializers.CharField(source = 'product.name', read_only = True)
 
-
+    class Meta:
+        model = OrderItem
+        fields = ['id', 'product', 'product_name', 'quantity', 'price', 'discount_percentage']
 
 
 class OrderCreateSerializer(serializers.ModelSerializer):
@@ -18,6 +25,7 @@ class OrderCreateSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'order_number', 'shipping_address', 'phone', 'notes', 'status', 'total_amount', 'created_at', 'items'
         ]
+        read_only_fields = ['order_number', 'status', 'total_amount']
         
         
     def validate_phone(self, value):
@@ -31,6 +39,8 @@ class OrderCreateSerializer(serializers.ModelSerializer):
         if not value[4:].isdigit():
             raise serializers.ValidationError('Phone number must contain only digits after +998.')
         
+        return value
+        
         
     def validate_shipping_address(self, value):
         if len(value.strip()) < 10:
@@ -52,16 +62,30 @@ class OrderListSerializer(serializers.ModelSerializer):
             'id', 'order_number', 'total_amount', 'status',
             'status_display', 'items_count', 'created_at', 'can_cancel'
         ]
-        
-        def get_items_count(self, obj):
-            return obj.items.count()
-        
-        
-        def get_can_cancel(self, obj):
-            return obj.status in ['pending', 'processing']
+    
+    def get_items_count(self, obj):
+        # Annotated by the list view; counted per order otherwise.
+        items_count = getattr(obj, 'items_count', None)
+        return obj.items.count() if items_count is None else items_count
+    
+    def get_can_cancel(self, obj):
+        return obj.status in CANCELLABLE_STATUSES
+
+
+@lru_cache(maxsize=None)
+def get_order_list_row_serializer():
+    # Rows come from a queryset annotated with ``items_count``.
+    status_labels = dict(Order.STATUS_CHOICES)
+    return CompiledSerializer(OrderListSerializer(), {
+        'status_display': RowField(['status'], lambda status: status_labels.get(status, status)),
+        'items_count': RowField(['items_count'], lambda items_count: items_count),
+        'can_cancel': RowField(['status'], lambda status: status in CANCELLABLE_STATUSES),
+    })
         
         
 class ProductSerializer(serializers.ModelSerializer):
+    primary_image = serializers.CharField(source='primary_image_url', read_only=True, allow_null=True)
+    
     class Meta:
         model = Product
         fields = ['id', 'name', 'primary_image']
@@ -76,9 +100,7 @@ class OrderItemSerializer(serializers.ModelSerializer):
         fields = ['id', 'product', 'quantity', 'price', 'discount_percentage', 'subtotal']
 
     def get_subtotal(self, obj):
-        discount = obj.discount_percentage or 0
-        discounted_price = obj.price * (1 - discount / 100)
-        return discounted_price * obj.quantity
+        return price_lines([(obj.price, obj.discount_percentage, obj.quantity)]).subtotals[0]
     
     
 
@@ -113,4 +135,7 @@ class OrderDetailSerializer(serializers.ModelSerializer):
             'updated_at'
         ]
         
-        
\ No newline at end of file
+        
+
+class OrderBulkCancelSerializer(serializers.Serializer):
+    order_ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=1000)
@@ -1,3 +1,397 @@
-from django.test import TestCase
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from apps.carts.models import Cart, CartItem
+from apps.inventory.models import StockMovement
+from apps.orders.cancellation import cancel_orders
+from apps.orders.idempotency import purge_expired
+from apps.orders.models import IdempotencyKey, Order, OrderItem, Sequence
+from apps.orders.numbers import BlockAllocator, reserve_block
+from apps.orders.serializers import OrderListSerializer
+from apps.products.cache import get_version
+from apps.products.models import Product
+from apps.products.tests import ProductTestMixin
+
+
+class OrderListTests(ProductTestMixin, TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('shopper', password='pass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        product = self.create_product('Phone', self.create_category(), self.create_brand())
+        for number, status in enumerate(['pending', 'shipped', 'cancelled']):
+            order = Order.objects.create(
+                user=self.user, order_number=f'ORD-{number}', total_amount=Decimal('100.00') * number,
+                status=status, shipping_address='1 Long Street, Tashkent', phone='+998901234567',
+            )
+            for _ in range(number):
+                OrderItem.objects.create(order=order, product=product, quantity=1, price=Decimal('100.00'))
+
+    def test_rows_render_like_the_model_serializer(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('orders:order-list'))
+
+        orders = self.user.orders.order_by('-created_at')
+        expected = JSONRenderer().render(OrderListSerializer(orders, many=True).data)
+        self.assertEqual(JSONRenderer().render(response.data['results']), expected)
+        self.assertEqual([order['items_count'] for order in response.data['results']], [2, 1, 0])
+
+    def test_query_count_does_not_grow_with_orders(self):
+        product = Product.objects.get()
+        for number in range(3, 10):
+            order = Order.objects.create(
+                user=self.user, order_number=f'ORD-{number}', total_amount=Decimal('100.00'),
+                shipping_address='1 Long Street, Tashkent', phone='+998901234567',
+            )
+            OrderItem.objects.create(order=order, product=product, quantity=1, price=Decimal('100.00'))
+
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('orders:order-list'))
+
+        self.assertEqual(response.data['count'], 10)
+
+    def test_detail_loads_lines_and_products_in_fixed_queries(self):
+        category, brand = Product.objects.get().category, Product.objects.get().brand
+        order = self.user.orders.get(order_number='ORD-2')
+        for number in range(5):
+            OrderItem.objects.create(
+                order=order, product=self.create_product(f'Case {number}', category, brand), quantity=2, price=Decimal('9.99'),
+            )
+
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('orders:order-detail', args=[order.pk]))
+
+        self.assertEqual(response.data['user']['username'], 'shopper')
+        self.assertEqual(len(response.data['items']), 7)
+        self.assertEqual(response.data['items'][-1]['product']['name'], 'Case 4')
+
+
+class CheckoutTests(ProductTestMixin, TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('shopper', password='pass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        category, brand = self.create_category(), self.create_brand()
+        self.phone = self.create_product('Phone', category, brand, price='100.00', discount_percentage=10)
+        self.case = self.create_product('Case', category, brand, price='9.99', stock_quantity=2)
+        self.cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=self.cart, product=self.phone, quantity=3)
+        CartItem.objects.create(cart=self.cart, product=self.case, quantity=2)
+
+    def checkout(self):
+        return self.client.post(reverse('orders:order-checkout'), {
+            'shipping_address': '1 Long Street, Tashkent', 'phone': '+998901234567',
+        })
+
+    def test_checkout_takes_stock_and_empties_the_cart(self):
+        response = self.checkout()
+
+        self.assertEqual(response.status_code, 201)
+        order = Order.objects.get(pk=response.data['id'])
+        self.assertEqual(order.phone, '+998901234567')
+        self.assertEqual(order.total_amount, Decimal('289.98'))
+        self.assertEqual(
+            sorted(order.items.values_list('product_id', 'quantity', 'price', 'discount_percentage')),
+            [(self.phone.pk, 3, Decimal('100.00'), 10), (self.case.pk, 2, Decimal('9.99'), 0)],
+        )
+        self.phone.refresh_from_db()
+        self.case.refresh_from_db()
+        self.assertEqual((self.phone.stock_quantity, self.case.stock_quantity), (7, 0))
+        self.assertFalse(self.cart.items.exists())
+
+    def test_checkout_marks_products_updated(self):
+        since = timezone.now()
+
+        self.checkout()
+
+        self.assertEqual(
+            set(Product.objects.filter(updated_at__gte=since).values_list('pk', flat=True)),
+            {self.phone.pk, self.case.pk},
+        )
+
+    def test_short_stock_rolls_the_whole_checkout_back(self):
+        Product.objects.filter(pk=self.case.pk).update(stock_quantity=1)
+
+        response = self.checkout()
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, ['Not enough stock for Case. Only 1 left.'])
+        self.phone.refresh_from_db()
+        self.assertEqual(self.phone.stock_quantity, 10)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(self.cart.items.count(), 2)
+
+    def test_empty_cart_is_rejected(self):
+        self.cart.items.all().delete()
+
+        response = self.checkout()
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, ['Your cart is empty.'])
+
+    def test_checkout_invalidates_cached_product_details(self):
+        version = get_version(self.phone.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.checkout()
+
+        self.assertNotEqual(get_version(self.phone.pk), version)
+
+
+class CheckoutConcurrencyTests(ProductTestMixin, TransactionTestCase):
+    buyers = 12
+    stock = 5
+
+    def setUp(self):
+        self.product = self.create_product('Console', self.create_category(), self.create_brand(), stock_quantity=self.stock)
+        self.users = []
+        for number in range(self.buyers):
+            user = User.objects.create_user(f'buyer-{number}', password='pass')
+            CartItem.objects.create(cart=Cart.objects.create(user=user), product=self.product, quantity=1)
+            self.users.append(user)
+
+    def checkout(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        try:
+            return client.post(reverse('orders:order-checkout'), {
+                'shipping_address': '1 Long Street, Tashkent', 'phone': '+998901234567',
+            }).status_code
+        finally:
+            connection.close()
+
+    def test_concurrent_checkouts_never_oversell(self):
+        barrier = threading.Barrier(self.buyers)
+
+        def run(user):
+            barrier.wait()
+            return self.checkout(user)
+
+        with ThreadPoolExecutor(max_workers=self.buyers) as executor:
+            statuses = list(executor.map(run, self.users))
+
+        self.assertEqual(sorted(statuses), [201] * self.stock + [400] * (self.buyers - self.stock))
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 0)
+        self.assertEqual(Order.objects.count(), self.stock)
+        self.assertEqual(sum(OrderItem.objects.values_list('quantity', flat=True)), self.stock)
+
+
+class CheckoutIdempotencyTests(ProductTestMixin, TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('shopper', password='pass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.product = self.create_product('Phone', self.create_category(), self.create_brand())
+        self.cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=self.cart, product=self.product, quantity=2)
+
+    def checkout(self, key, address='1 Long Street, Tashkent'):
+        return self.client.post(
+            reverse('orders:order-checkout'),
+            {'shipping_address': address, 'phone': '+998901234567'},
+            HTTP_IDEMPOTENCY_KEY=key,
+        )
+
+    def test_retry_replays_the_first_response(self):
+        first = self.checkout('retry-1')
+        # The retry arrives with the cart refilled: it must not be ordered.
+        CartItem.objects.create(cart=self.cart, product=self.product, quantity=1)
+
+        with self.assertNumQueries(1):
+            second = self.checkout('retry-1')
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second.data, json.loads(JSONRenderer().render(first.data)))
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(Order.objects.count(), 1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 8)
+
+    def test_key_reused_for_another_request_is_rejected(self):
+        self.checkout('retry-2')
+        CartItem.objects.create(cart=self.cart, product=self.product, quantity=1)
+
+        response = self.checkout('retry-2', address='2 Other Street, Samarkand')
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_failed_checkout_is_not_stored(self):
+        Product.objects.filter(pk=self.product.pk).update(stock_quantity=1)
+        self.assertEqual(self.checkout('retry-3').status_code, 400)
+
+        Product.objects.filter(pk=self.product.pk).update(stock_quantity=5)
+        self.assertEqual(self.checkout('retry-3').status_code, 201)
+
+    def test_expired_keys_are_processed_again_and_purged(self):
+        self.checkout('retry-4')
+        IdempotencyKey.objects.update(created_at=timezone.now() - timedelta(days=2))
+        CartItem.objects.create(cart=self.cart, product=self.product, quantity=1)
+
+        response = self.checkout('retry-4')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(response.has_header('Idempotent-Replayed'))
+        self.assertEqual(Order.objects.count(), 2)
+        IdempotencyKey.objects.update(created_at=timezone.now() - timedelta(days=2))
+        self.assertEqual(purge_expired(batch_size=1), 1)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    def test_order_numbers_are_sequential(self):
+        self.checkout('retry-5')
+        CartItem.objects.create(cart=self.cart, product=self.product, quantity=1)
+        self.checkout('retry-6')
+
+        numbers = list(Order.objects.order_by('pk').values_list('order_number', flat=True))
+        self.assertEqual(numbers, ['ORD-0000000001', 'ORD-0000000002'])
+
+
+class CancellationTests(ProductTestMixin, TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('shopper', password='pass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        category, brand = self.create_category(), self.create_brand()
+        self.products = [self.create_product(f'Product {i}', category, brand) for i in range(3)]
+
+    def create_order(self, number, lines, status='pending', user=None):
+        order = Order.objects.create(
+            user=user or self.user, order_number=number, total_amount=Decimal('10.00'), status=status,
+            shipping_address='1 Long Street, Tashkent', phone='+998901234567',
+        )
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=product, quantity=quantity, price=product.price)
+            for product, quantity in lines
+        ])
+        return order
+
+    def cancel(self, order):
+        return self.client.post(reverse('orders:order-cancel', args=[order.pk]))
+
+    def get_stock(self):
+        return [product.stock_quantity for product in Product.objects.filter(pk__in=[p.pk for p in self.products]).order_by('pk')]
+
+    def test_cancel_restocks_and_records_the_order(self):
+        order = self.create_order('ORD-1', [(self.products[0], 2), (self.products[1], 1), (self.products[0], 1)])
+
+        response = self.cancel(order)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['order']['status'], 'cancelled')
+        self.assertEqual(len(response.data['order']['items']), 3)
+        self.assertEqual(self.get_stock(), [13, 11, 10])
+        self.assertEqual(
+            sorted(StockMovement.objects.filter(kind=StockMovement.RESTOCK).values_list('product_id', 'quantity', 'reference')),
+            [(self.products[0].pk, 1, 'ORD-1'), (self.products[0].pk, 2, 'ORD-1'), (self.products[1].pk, 1, 'ORD-1')],
+        )
+
+    def test_cancel_costs_the_same_queries_for_any_number_of_lines(self):
+        small = self.create_order('ORD-1', [(self.products[0], 1)])
+        large = self.create_order('ORD-2', [(product, 2) for product in self.products])
+
+        with self.assertNumQueries(9):
+            self.cancel(small)
+        with self.assertNumQueries(9):
+            self.cancel(large)
+
+    def test_double_cancel_restocks_once(self):
+        order = self.create_order('ORD-1', [(self.products[0], 2)])
+
+        self.assertEqual(self.cancel(order).status_code, 200)
+        response = self.cancel(order)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, {'error': 'Order cannot be cancelled'})
+        self.assertEqual(cancel_orders(Order.objects.filter(pk=order.pk)), [])
+        self.assertEqual(self.get_stock(), [12, 10, 10])
+
+    def test_other_users_orders_are_not_found(self):
+        other = User.objects.create_user('other', password='pass')
+        order = self.create_order('ORD-1', [(self.products[0], 2)], user=other)
+
+        response = self.cancel(order)
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(Order.objects.get(pk=order.pk).status, 'pending')
+
+    def test_bulk_cancel_reports_each_order(self):
+        self.client.force_authenticate(User.objects.create_user('staff', password='pass', is_staff=True))
+        first = self.create_order('ORD-1', [(self.products[0], 2), (self.products[1], 1)])
+        second = self.create_order('ORD-2', [(self.products[0], 3)], status='processing')
+        shipped = self.create_order('ORD-3', [(self.products[2], 1)], status='shipped')
+
+        with self.assertNumQueries(8):
+            response = self.client.post(
+                reverse('orders:order-bulk-cancel'),
+                {'order_ids': [second.pk, first.pk, shipped.pk, 999]},
+                format='json',
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {
+            'cancelled': [first.pk, second.pk],
+            'not_found': [999],
+            'errors': {shipped.pk: 'Order cannot be cancelled'},
+        })
+        self.assertEqual(self.get_stock(), [15, 11, 10])
+        self.assertEqual(Order.objects.get(pk=shipped.pk).status, 'shipped')
+
+    def test_admin_status_edits_restock_once_and_never_reopen(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pass'))
+        order = self.create_order('ORD-1', [(self.products[0], 2)])
+        since = timezone.now()
+
+        def edit(status):
+            return self.client.post(reverse('admin:orders_order_changelist'), {
+                'form-TOTAL_FORMS': 1, 'form-INITIAL_FORMS': 1, 'form-0-id': order.pk,
+                'form-0-status': status, '_save': 'Save',
+            })
+
+        self.assertEqual(edit('cancelled').status_code, 302)
+        self.assertEqual(edit('pending').status_code, 200)
+        self.assertEqual(edit('cancelled').status_code, 302)
+
+        self.assertEqual(Order.objects.get(pk=order.pk).status, 'cancelled')
+        self.assertEqual(self.get_stock(), [12, 10, 10])
+        self.assertGreaterEqual(Product.objects.get(pk=self.products[0].pk).updated_at, since)
+
+    def test_bulk_cancel_is_staff_only(self):
+        order = self.create_order('ORD-1', [(self.products[0], 2)])
+
+        response = self.client.post(reverse('orders:order-bulk-cancel'), {'order_ids': [order.pk]}, format='json')
+
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(Order.objects.get(pk=order.pk).status, 'pending')
+
+
+class BlockAllocatorTests(TransactionTestCase):
+    def test_threads_never_share_a_number(self):
+        allocator = BlockAllocator('test', block_size=7)
+
+        def allocate(_):
+            try:
+                return [allocator.allocate() for _ in range(25)]
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            numbers = [number for chunk in executor.map(allocate, range(8)) for number in chunk]
+
+        self.assertEqual(sorted(numbers), list(range(1, 201)))
+        # 200 numbers took 29 reservations of 7, not 200 counter writes.
+        self.assertEqual(Sequence.objects.get(name='test').last_value, 203)
+        # Another process reserves past everything this one holds.
+        self.assertEqual(reserve_block('test', 7), (204, 210))
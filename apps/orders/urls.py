@@ -1,5 +1,5 @@
 from django.urls import path
-from .views import OrderCreateAPIView, OrderListAPIView, OrderDetailAPIView, OrderCancelAPIView
+from .views import OrderCreateAPIView, OrderListAPIView, OrderDetailAPIView, OrderCancelAPIView, OrderBulkCancelAPIView
 
 
 app_name = 'orders'
@@ -8,7 +8,8 @@ urlpatterns = [
    path('', OrderListAPIView.as_view(), name='order-list'),
    path('checkout/', OrderCreateAPIView.as_view(), name='order-checkout'),
    path('<int:pk>/',OrderDetailAPIView.as_view(), name='order-detail' ),
-   path('<int:pk>/cancel/', OrderCancelAPIView.as_view(), name='order-cancel')
+   path('<int:pk>/cancel/', OrderCancelAPIView.as_view(), name='order-cancel'),
+   path('cancel/', OrderBulkCancelAPIView.as_view(), name='order-bulk-cancel')
    
 ]
 
@@ -5,11 +5,15 @@ from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.generics import GenericAPIView
 from rest_framework.mixins import CreateModelMixin, ListModelMixin, RetrieveModelMixin
-from rest_framework.permissions import IsAuthenticated
-from apps.carts.models import Cart
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from apps.orders.models import OrderItem, Order
-from apps.orders.serializers import  OrderCreateSerializer, OrderListSerializer, OrderDetailSerializer
+from django.db.models import Count, Prefetch
+from apps.orders.serializers import  OrderBulkCancelSerializer, OrderCreateSerializer, OrderListSerializer, OrderDetailSerializer, get_order_list_row_serializer
 from .pagination import OrderPagination
+from django.db import IntegrityError
+from .cancellation import cancel_orders
+from .checkout import place_order
+from .idempotency import HEADER as IDEMPOTENCY_HEADER, MAX_KEY_LENGTH, REPLAYED_HEADER, KeyReused, find_stored, get_request_hash
 # Create your views here.
     
 class OrderCreateAPIView(GenericAPIView, CreateModelMixin):
@@ -18,61 +22,42 @@ class OrderCreateAPIView(GenericAPIView, CreateModelMixin):
     queryset = Order.objects.all()
     
     
+    idempotency = None
+    
+    
     def perform_create(self, serializer):
-        user = self.request.user
-        cart, _ = Cart.objects.get_or_create(user=user)
-        cart_items = cart.items.all()
-        
-        
-        if not cart_items.exists():
-            raise serializers.ValidationError("Your cart is empty.")
-        
-        for item in cart_items:
-            if item.quantity > item.product.stock_quantity:
-                raise serializers.ValidationError(f"Not enough stock for {item.product.name}. Only {item.product.stock_quantity} left.")
-            
-            
-        timestamp = int(timezone.now().timestamp())
-        order_number = f"ORD - {user.id}-{timestamp}"
-        
-        total_amount = 0
-        
-        for item in cart_items:
-            price = item.product.price
-            if item.product.discount_percentage:
-                price -= item.product.price * item.product.discount_percentage / 100
-            total_amount += price * item.quantity
-            
-            
-        order = serializer.save(
-            user=user, order_number=order_number,
-            total_amount=round(total_amount, 2),
-            status='pending'
-        )
-        
-        
-        for item in cart_items:
-            product = item.product
-            price = product.price
-            if product.discount_percentage:
-                price -= product.price * product.discount_percentage / 100
-            OrderItem.objects.create(
-                order=order,
-                product=product,
-                quantity=item.quantity,
-                price=price,
-                subtotal=price * item.quantity
+        return place_order(self.request.user, serializer, self.idempotency)
+    
+    def post(self, request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if key is None:
+            return self.create(request, *args, **kwargs)
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return Response(
+                {"error": f"{IDEMPOTENCY_HEADER} must be 1 to {MAX_KEY_LENGTH} characters long"},
+                status=status.HTTP_400_BAD_REQUEST
             )
-            product.stock_quantity -= item.quantity
-            product.save()
-            
         
-        cart.items.all().delete()
+        request_hash = get_request_hash(request)
+        try:
+            stored = find_stored(request.user, key, request_hash)
+            if stored is None:
+                self.idempotency = (key, request_hash)
+                try:
+                    return self.create(request, *args, **kwargs)
+                except IntegrityError:
+                    # A concurrent request with the same key committed first.
+                    stored = find_stored(request.user, key, request_hash)
+                    if stored is None:
+                        raise
+        except KeyReused:
+            return Response(
+                {"error": f"{IDEMPOTENCY_HEADER} was already used for a different request"},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY
+            )
         
-        return order
-    
-    def post(self, request, *args, **kwargs):
-        return self.create(request, *args, **kwargs)
+        # Replays return the first response as is; stock is not touched again.
+        return Response(stored.response_body, status=stored.response_status, headers={REPLAYED_HEADER: 'true'})
 
 
 class OrderListAPIView(GenericAPIView, ListModelMixin):
@@ -84,10 +69,21 @@ class OrderListAPIView(GenericAPIView, ListModelMixin):
         return self.request.user.orders.all().order_by('-created_at')
 
     def get(self, request, *args, **kwargs):
-        return self.list(request, *args, **kwargs)  
+        row_serializer = get_order_list_row_serializer()
+        orders = self.get_queryset().annotate(items_count=Count('items')).values(*row_serializer.columns)
+        page = self.paginate_queryset(orders)
+        return self.get_paginated_response(row_serializer.many(page))
     
     
 
+def get_order_details(user):
+    # Order, user, lines and their products in two queries, whatever the
+    # number of lines.
+    return user.orders.select_related('user').prefetch_related(
+        Prefetch('items', queryset=OrderItem.objects.select_related('product').order_by('pk'))
+    )
+
+
 class OrderDetailAPIView(GenericAPIView, RetrieveModelMixin):
     serializer_class = OrderDetailSerializer
     permission_classes = [IsAuthenticated]
@@ -95,7 +91,7 @@ class OrderDetailAPIView(GenericAPIView, RetrieveModelMixin):
     
     
     def get_queryset(self):
-        return self.request.user.orders.all()
+        return get_order_details(self.request.user)
     
     
     def get(self, request, *args, **kwargs):
@@ -107,39 +103,47 @@ class OrderCancelAPIView(GenericAPIView):
     serializer_class = OrderDetailSerializer
     
     
-    def get_object(self):
-        pk = self.kwargs.get('pk')
-        return self.request.user.orders.get(pk=pk)
+    def get_queryset(self):
+        return get_order_details(self.request.user)
     
     
     def post(self, request, *args, **kwargs):
-        try:
-            order = self.get_object()
-        except Order.DoesNotExist:
-            return Response({"error": "Order not found"}, status=status.HTTP_404_NOT_FOUND)
-
-        
-        if order.status not in ['pending', 'processing']:
+        orders = self.get_queryset().filter(pk=self.kwargs.get('pk'))
+        if not cancel_orders(orders):
+            if not orders.exists():
+                return Response({"error": "Order not found"}, status=status.HTTP_404_NOT_FOUND)
             return Response(
                 {"error": "Order cannot be cancelled"},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        
-        for item in order.items.all():
-            product = item.product
-            product.stock_quantity += item.quantity
-            product.save()
-
-       
-        order.status = 'cancelled'
-        order.save()
-
-        serializer = self.get_serializer(order)
+        serializer = self.get_serializer(orders.get())
         return Response(
             {
                 "message": "Order cancelled successfully",
                 "order": serializer.data
             },
             status=status.HTTP_200_OK
-        )   
\ No newline at end of file
+        )
+
+
+class OrderBulkCancelAPIView(GenericAPIView):
+    permission_classes = [IsAdminUser]
+    serializer_class = OrderBulkCancelSerializer
+    
+    
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        order_ids = sorted(set(serializer.validated_data['order_ids']))
+        
+        cancelled = set(cancel_orders(Order.objects.filter(pk__in=order_ids)))
+        found = set(Order.objects.filter(pk__in=order_ids).values_list('pk', flat=True))
+        return Response(
+            {
+                "cancelled": [pk for pk in order_ids if pk in cancelled],
+                "not_found": [pk for pk in order_ids if pk not in found],
+                "errors": {pk: "Order cannot be cancelled" for pk in order_ids if pk in found and pk not in cancelled},
+            },
+            status=status.HTTP_200_OK
+        )
@@ -2,16 +2,34 @@ from django.contrib import admin
 
 # Register your models here.
 from django.contrib import admin
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.forms.models import BaseInlineFormSet
+from apps.inventory.counters import fold_shards, get_shard_count
+from apps.inventory.ledger import adjust_stock
 from .models import Category, Brand, Product, ProductImage
 
+class ProductImageInlineFormSet(BaseInlineFormSet):
+    def clean(self):
+        super().clean()
+        primaries = [
+            form for form in self.forms
+            if form.cleaned_data.get('is_primary') and not form.cleaned_data.get('DELETE')
+        ]
+        if len(primaries) > 1:
+            raise ValidationError('Only one image can be marked as primary.')
+
 class ProductImageInline(admin.TabularInline):
     model = ProductImage
+    formset = ProductImageInlineFormSet
     extra = 1
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
-    list_display = ['name', 'slug', 'is_active']
+    list_display = ['name', 'slug', 'parent', 'depth', 'is_active']
     list_editable = ['is_active']
+    readonly_fields = ['path', 'depth']
+    ordering = ['path']
 
 @admin.register(Brand)
 class BrandAdmin(admin.ModelAdmin):
@@ -21,4 +39,34 @@ class BrandAdmin(admin.ModelAdmin):
 class ProductAdmin(admin.ModelAdmin):
     list_display = ['name', 'category', 'brand', 'price', 'stock_quantity', 'is_active']
     list_editable = ['price', 'stock_quantity', 'is_active']
-    inlines = [ProductImageInline]
\ No newline at end of file
+    # Maintained from the reviews table; see apply_rating_change.
+    readonly_fields = [
+        'reviews_count', 'rating_sum', 'average_rating',
+        'rating_1', 'rating_2', 'rating_3', 'rating_4', 'rating_5',
+    ]
+    inlines = [ProductImageInline]
+
+    def formfield_for_dbfield(self, db_field, request, **kwargs):
+        formfield = super().formfield_for_dbfield(db_field, request, **kwargs)
+        if db_field.name == 'stock_quantity':
+            # The form posts back the stock level the page was rendered
+            # with, so changes are measured against what the admin saw.
+            formfield.show_hidden_initial = True
+        return formfield
+
+    def save_model(self, request, obj, form, change):
+        # Full saves leave stock_quantity alone (see Product.COUNTER_FIELDS),
+        # so an untouched stock field never overwrites a checkout.
+        if not change or 'stock_quantity' not in form.changed_data:
+            return super().save_model(request, obj, form, change)
+        # An edited stock level is applied as the difference to the level
+        # the page showed, so checkouts committed since the page was
+        # rendered are kept and the ledger gets the admin's change.
+        bound = form['stock_quantity']
+        seen = bound.field.to_python(form.data.get(bound.html_initial_name, form.initial['stock_quantity']))
+        with transaction.atomic():
+            if get_shard_count() > 1:
+                fold_shards([obj.pk])
+            obj.save()
+            adjust_stock(obj.pk, obj.stock_quantity - seen, reference=request.user.get_username()[:50])
+        obj.refresh_from_db(fields=['stock_quantity'])
\ No newline at end of file
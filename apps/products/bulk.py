@@ -0,0 +1,134 @@
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, IntegerField, Q, Value, When
+from django.utils import timezone
+
+from apps.inventory.counters import fold_shards, get_shard_count
+from apps.inventory.ledger import record
+from apps.inventory.models import StockMovement
+from apps.products.cache import invalidate_product_details
+from apps.products.models import Product
+from apps.products.pricing import final_prices as compute_final_prices
+
+CHUNK_SIZE = 500
+
+
+def build_case(field, values, output_field):
+    # One CASE per column turns a whole chunk of per-id values into a single
+    # UPDATE; ids without a value for this column keep their current one.
+    return Case(
+        *[When(pk=pk, then=Value(value)) for pk, value in values],
+        default=F(field),
+        output_field=output_field,
+    )
+
+
+def apply_deltas(deltas, current, now):
+    # Relative adjustments are applied to the live column with F(), so they
+    # compose with concurrent checkouts instead of overwriting them, and
+    # only to rows whose stock still covers a decrement. When the UPDATE
+    # matches fewer rows than asked, a follow-up read finds the rows it
+    # left alone (they are locked since apply_chunk read them, so any other
+    # row holds exactly its read value plus the delta); returns their stock
+    # by id.
+    condition = Q()
+    for pk, delta in deltas:
+        condition |= Q(pk=pk, stock_quantity__gte=-delta)
+    matched = Product.objects.filter(condition).update(
+        stock_quantity=Case(
+            *[When(pk=pk, then=F('stock_quantity') + delta) for pk, delta in deltas],
+            default=F('stock_quantity'),
+            output_field=IntegerField(),
+        ),
+        updated_at=now,
+    )
+    if matched == len(deltas):
+        return {}
+    stock = dict(Product.objects.filter(pk__in=[pk for pk, _ in deltas]).values_list('pk', 'stock_quantity'))
+    return {pk: stock[pk] for pk, delta in deltas if stock[pk] != current[pk][2] + delta}
+
+
+def apply_chunk(items, now):
+    ids = [item['id'] for item in items]
+    if get_shard_count() > 1:
+        fold_shards(ids)
+    # Locked until the chunk commits, so the ledger deltas of absolute stock
+    # levels are exact.
+    current = {
+        pk: (price, discount, stock)
+        for pk, price, discount, stock in Product.objects.select_for_update(of=('self',)).filter(pk__in=ids).values_list(
+            'pk', 'price', 'discount_percentage', 'stock_quantity'
+        )
+    }
+
+    updated, not_found, errors = [], [], {}
+    prices, discounts, repriced, stocks, deltas = [], [], [], [], []
+    for item in items:
+        pk = item['id']
+        if pk not in current:
+            not_found.append(pk)
+            continue
+        price, discount, stock = current[pk]
+        delta = item.get('stock_delta')
+        if delta is not None and stock + delta < 0:
+            errors[pk] = f'Only {stock} items in stock'
+            continue
+        if 'price' in item:
+            prices.append((pk, item['price']))
+        if 'discount_percentage' in item:
+            discounts.append((pk, item['discount_percentage']))
+        if 'price' in item or 'discount_percentage' in item:
+            repriced.append((pk, item.get('price', price), item.get('discount_percentage', discount)))
+        if 'stock_quantity' in item:
+            stocks.append((pk, item['stock_quantity']))
+        if delta is not None:
+            deltas.append((pk, delta))
+        updated.append(pk)
+
+    if not updated:
+        return updated, not_found, errors
+
+    changes = {'updated_at': now}
+    if prices:
+        changes['price'] = build_case('price', prices, DecimalField(max_digits=10, decimal_places=2))
+    if discounts:
+        changes['discount_percentage'] = build_case('discount_percentage', discounts, IntegerField())
+    if repriced:
+        final_prices = compute_final_prices((price, discount) for _, price, discount in repriced)
+        changes['final_price'] = build_case(
+            'final_price',
+            [(pk, final_price) for (pk, _, _), final_price in zip(repriced, final_prices)],
+            DecimalField(max_digits=10, decimal_places=2),
+        )
+    if stocks:
+        changes['stock_quantity'] = build_case('stock_quantity', stocks, IntegerField())
+    if deltas:
+        rejected = apply_deltas(deltas, current, now)
+        for pk in rejected:
+            errors[pk] = f'Only {rejected[pk]} items in stock'
+        updated = [pk for pk in updated if pk not in rejected]
+        deltas = [(pk, delta) for pk, delta in deltas if pk not in rejected]
+    if updated:
+        Product.objects.filter(pk__in=updated).update(**changes)
+    record(
+        [(pk, value - current[pk][2]) for pk, value in stocks] + deltas,
+        StockMovement.ADJUSTMENT,
+        'bulk update',
+    )
+    return updated, not_found, errors
+
+
+def apply_bulk_update(items, chunk_size=CHUNK_SIZE):
+    now = timezone.now()
+    result = {'updated': [], 'not_found': [], 'errors': {}}
+
+    with transaction.atomic():
+        for start in range(0, len(items), chunk_size):
+            updated, not_found, errors = apply_chunk(items[start:start + chunk_size], now)
+            result['updated'].extend(updated)
+            result['not_found'].extend(not_found)
+            result['errors'].update(errors)
+
+        updated_ids = result['updated']
+        transaction.on_commit(lambda: invalidate_product_details(updated_ids))
+
+    return result
@@ -0,0 +1,108 @@
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+DETAIL_KEY = 'product-detail:{pk}:{version}:{variant}'
+VERSION_KEY = 'product-detail-version:{pk}'
+# Bumped together with any product version, so anything derived from the
+# catalog as a whole (list pages, facets) can be validated with one lookup.
+CATALOG_VERSION_KEY = 'product-catalog-version'
+LOCK_KEY = 'product-detail-lock:{pk}:{version}:{variant}'
+STATS_KEY = 'product-detail-stats:{name}'
+STATS = ('hits', 'misses', 'coalesced')
+# Stored for products that do not exist or are inactive, so repeated 404s
+# are served from the cache as well.
+NOT_FOUND = 'not-found'
+
+
+def get_timeout():
+    return getattr(settings, 'PRODUCT_DETAIL_CACHE_TIMEOUT', 300)
+
+
+def get_lock_timeout():
+    return getattr(settings, 'PRODUCT_DETAIL_CACHE_LOCK_TIMEOUT', 5)
+
+
+def new_version():
+    # The creation time leads the token so it doubles as a Last-Modified.
+    return f'{time.time_ns():x}-{uuid.uuid4().hex[:8]}'
+
+
+def get_version_timestamp(version):
+    return int(version.split('-', 1)[0], 16) / 1e9
+
+
+def get_or_create_version(key):
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, new_version(), None)
+        version = cache.get(key)
+    return version
+
+
+def get_version(pk):
+    return get_or_create_version(VERSION_KEY.format(pk=pk))
+
+
+def get_catalog_version():
+    return get_or_create_version(CATALOG_VERSION_KEY)
+
+
+def invalidate_product_details(pks):
+    # Moving every product to a fresh version orphans its cached payloads,
+    # which then age out on their own; one set_many covers any batch size.
+    pks = set(pks)
+    if pks:
+        version = new_version()
+        versions = {VERSION_KEY.format(pk=pk): version for pk in pks}
+        versions[CATALOG_VERSION_KEY] = version
+        cache.set_many(versions, None)
+
+
+def record(name):
+    key = STATS_KEY.format(name=name)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, None)
+        cache.incr(key)
+
+
+def get_stats():
+    values = cache.get_many([STATS_KEY.format(name=name) for name in STATS])
+    return {name: values.get(STATS_KEY.format(name=name), 0) for name in STATS}
+
+
+def get_product_detail(pk, build, variant='full'):
+    version = get_version(pk)
+    key = DETAIL_KEY.format(pk=pk, version=version, variant=variant)
+
+    data = cache.get(key)
+    if data is not None:
+        record('hits')
+        return None if data == NOT_FOUND else data
+
+    lock_key = LOCK_KEY.format(pk=pk, version=version, variant=variant)
+    lock_timeout = get_lock_timeout()
+    locked = cache.add(lock_key, 1, lock_timeout)
+    if not locked:
+        # Another worker is already rebuilding this version; wait for its
+        # result instead of piling the same queries onto the database.
+        deadline = time.monotonic() + lock_timeout
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            data = cache.get(key)
+            if data is not None:
+                record('coalesced')
+                return None if data == NOT_FOUND else data
+
+    record('misses')
+    try:
+        data = build(pk)
+        cache.set(key, NOT_FOUND if data is None else data, get_timeout())
+    finally:
+        if locked:
+            cache.delete(lock_key)
+    return data
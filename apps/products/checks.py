@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+# Backends whose entries are visible only to the process that wrote them.
+PROCESS_LOCAL_BACKENDS = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    # Product versions (apps.products.cache) must be seen by every worker,
+    # or the others keep serving stale details and answering stale
+    # validators with 304 after a write.
+    backend = settings.CACHES.get('default', {}).get('BACKEND')
+    if backend not in PROCESS_LOCAL_BACKENDS:
+        return []
+    return [Warning(
+        f'The default cache ({backend}) is local to each process.',
+        hint='Product detail caching, ETag and Last-Modified need a cache shared by all workers, '
+             'such as Redis, Memcached or DatabaseCache. Silence this only for a single-process deployment.',
+        id='products.W001',
+    )]
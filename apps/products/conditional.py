@@ -0,0 +1,48 @@
+import hashlib
+from datetime import datetime, timezone
+
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+
+from apps.products.cache import get_catalog_version, get_version, get_version_timestamp
+
+# Validators are derived from the cached version tokens alone, so a request
+# carrying a matching If-None-Match/If-Modified-Since is answered with a 304
+# before the view touches the database or a serializer. Every product write
+# path already moves these versions through invalidate_product_details.
+# They are only as consistent as the cache holding them, which must be
+# shared by all workers (see CACHES in settings).
+
+
+def make_etag(version, request):
+    # The full path carries the query string: filters, cursor and fieldsets
+    # all produce different bodies from the same version.
+    return hashlib.sha1(f'{version}|{request.get_full_path()}'.encode()).hexdigest()
+
+
+def make_last_modified(version):
+    return datetime.fromtimestamp(get_version_timestamp(version), tz=timezone.utc)
+
+
+def catalog_etag(request, *args, **kwargs):
+    return make_etag(get_catalog_version(), request)
+
+
+def catalog_last_modified(request, *args, **kwargs):
+    return make_last_modified(get_catalog_version())
+
+
+def product_etag(request, pk=None, product_id=None, **kwargs):
+    return make_etag(get_version(pk or product_id), request)
+
+
+def product_last_modified(request, pk=None, product_id=None, **kwargs):
+    return make_last_modified(get_version(pk or product_id))
+
+
+catalog_condition = method_decorator(
+    condition(etag_func=catalog_etag, last_modified_func=catalog_last_modified)
+)
+product_condition = method_decorator(
+    condition(etag_func=product_etag, last_modified_func=product_last_modified)
+)
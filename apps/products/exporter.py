@@ -0,0 +1,88 @@
+import csv
+import json
+
+from django.db.models import Prefetch
+
+from apps.products.models import Product, ProductImage
+
+FORMATS = ('ndjson', 'csv')
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+# Category and brand are written the way the importer resolves them, so an
+# export can be fed straight back through import_products.
+EXPORT_FIELDS = [
+    'id', 'slug', 'name', 'description', 'category', 'brand', 'price',
+    'discount_percentage', 'final_price', 'stock_quantity', 'is_featured',
+    'is_active', 'average_rating', 'reviews_count', 'images', 'created_at',
+    'updated_at',
+]
+
+
+def get_export_queryset(updated_since=None, include_inactive=False):
+    products = Product.objects.select_related('category', 'brand').prefetch_related(
+        Prefetch('images', queryset=ProductImage.objects.order_by('-is_primary', 'pk').only(
+            'product_id', 'image_url', 'is_primary'
+        ))
+    ).order_by('pk')
+    if updated_since is not None:
+        # Incremental feeds always carry the products deactivated since
+        # (with is_active false), so consumers can drop them.
+        products = products.filter(updated_at__gte=updated_since)
+    elif not include_inactive:
+        products = products.filter(is_active=True)
+    return products
+
+
+def iter_records(products, chunk_size=1000):
+    # iterator() keeps a single chunk of products (and the images prefetched
+    # for that chunk) in memory at a time, whatever the size of the catalog.
+    for product in products.iterator(chunk_size=chunk_size):
+        yield {
+            'id': product.pk,
+            'slug': product.slug,
+            'name': product.name,
+            'description': product.description,
+            'category': product.category.slug,
+            'brand': product.brand.name,
+            'price': str(product.price),
+            'discount_percentage': product.discount_percentage,
+            'final_price': str(product.final_price),
+            'stock_quantity': product.stock_quantity,
+            'is_featured': product.is_featured,
+            'is_active': product.is_active,
+            'average_rating': product.average_rating,
+            'reviews_count': product.reviews_count,
+            'images': [image.image_url for image in product.images.all()],
+            'created_at': product.created_at.isoformat(),
+            'updated_at': product.updated_at.isoformat(),
+        }
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def iter_ndjson(records):
+    for record in records:
+        yield json.dumps(record, ensure_ascii=False) + '\n'
+
+
+def iter_csv(records):
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for record in records:
+        record['images'] = ' '.join(record['images'])
+        yield writer.writerow([record[field] for field in EXPORT_FIELDS])
+
+
+def iter_export(file_format, updated_since=None, include_inactive=False, chunk_size=1000):
+    products = get_export_queryset(updated_since, include_inactive)
+    records = iter_records(products, chunk_size)
+    if file_format == 'ndjson':
+        return iter_ndjson(records)
+    if file_format == 'csv':
+        return iter_csv(records)
+    raise ValueError(f'Unsupported format {file_format!r}, expected one of {", ".join(FORMATS)}')
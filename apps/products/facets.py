@@ -0,0 +1,96 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+PRICE_BUCKETS = [
+    (None, 25),
+    (25, 50),
+    (50, 100),
+    (100, 250),
+    (250, 500),
+    (500, None),
+]
+# Query flags that change the response shape but not the filtered set.
+NON_FILTER_PARAMS = {'facets', 'include_related', 'fields', 'view', 'ordering'}
+
+
+def get_price_bucket_key(low, high):
+    if low is None:
+        return f'0-{high}'
+    if high is None:
+        return f'{low}+'
+    return f'{low}-{high}'
+
+
+def get_cache_key(filter_serializer):
+    params = {
+        key: str(value) for key, value in filter_serializer.validated_data.items()
+        if key not in NON_FILTER_PARAMS
+    }
+    digest = hashlib.md5(json.dumps(params, sort_keys=True).encode()).hexdigest()
+    return f'product-facets:{digest}'
+
+
+def compute_facets(filter_serializer):
+    # Every facet is one grouped or conditional aggregate over the filter set
+    # minus that facet's own filter, so selecting a category still shows the
+    # counts of its sibling categories.
+    categories = (
+        filter_serializer.filter_products(exclude={'category'})
+        .order_by()
+        .values('category_id', 'category__name')
+        .annotate(count=Count('id'))
+        .order_by('-count', 'category_id')
+    )
+    brands = (
+        filter_serializer.filter_products(exclude={'brand'})
+        .order_by()
+        .values('brand_id', 'brand__name')
+        .annotate(count=Count('id'))
+        .order_by('-count', 'brand_id')
+    )
+
+    price_conditions = {}
+    for low, high in PRICE_BUCKETS:
+        condition = Q()
+        if low is not None:
+            condition &= Q(final_price__gte=low)
+        if high is not None:
+            condition &= Q(final_price__lt=high)
+        price_conditions[get_price_bucket_key(low, high)] = Count('id', filter=condition)
+    prices = filter_serializer.filter_products(exclude={'price'}).order_by().aggregate(**price_conditions)
+
+    featured = filter_serializer.filter_products(exclude={'is_featured'}).order_by().aggregate(
+        featured=Count('id', filter=Q(is_featured=True)),
+        not_featured=Count('id', filter=Q(is_featured=False)),
+    )
+
+    return {
+        'category': [
+            {'id': row['category_id'], 'name': row['category__name'], 'count': row['count']}
+            for row in categories
+        ],
+        'brand': [
+            {'id': row['brand_id'], 'name': row['brand__name'], 'count': row['count']}
+            for row in brands
+        ],
+        'price': [
+            {'range': key, 'count': count} for key, count in prices.items()
+        ],
+        'is_featured': {
+            'true': featured['featured'],
+            'false': featured['not_featured'],
+        },
+    }
+
+
+def get_facets(filter_serializer):
+    key = get_cache_key(filter_serializer)
+    facets = cache.get(key)
+    if facets is None:
+        facets = compute_facets(filter_serializer)
+        cache.set(key, facets, getattr(settings, 'PRODUCT_FACETS_CACHE_TIMEOUT', 60))
+    return facets
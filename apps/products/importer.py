@@ -0,0 +1,218 @@
+import csv
+import json
+import time
+from itertools import islice
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.text import slugify
+
+from apps.inventory.counters import fold_shards, get_shard_count
+from apps.inventory.ledger import record
+from apps.inventory.models import StockMovement
+from apps.products.cache import invalidate_product_details
+from apps.products.models import Brand, Category, Product
+from apps.products.search import get_search_backend
+from apps.products.serializers import ProductImportRowSerializer
+
+FORMATS = ('csv', 'jsonl')
+UPDATE_FIELDS = [
+    'name', 'description', 'category', 'brand', 'price', 'discount_percentage',
+    'final_price', 'stock_quantity', 'is_featured', 'is_active', 'updated_at',
+]
+# Columns a row may leave out: updates keep the current value, new products
+# get these defaults. A missing stock_quantity is kept the same way, but
+# read inside the write transaction.
+OPTIONAL_FIELDS = {'description': '', 'discount_percentage': 0, 'is_featured': False, 'is_active': True}
+
+
+def iter_csv(lines):
+    for number, row in enumerate(csv.DictReader(lines), start=1):
+        yield number, {key: value for key, value in row.items() if value not in (None, '')}
+
+
+def iter_jsonl(lines):
+    for number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as error:
+            row = ValueError(f'Invalid JSON: {error}')
+        yield number, row
+
+
+def iter_rows(lines, file_format):
+    if file_format == 'csv':
+        return iter_csv(lines)
+    if file_format == 'jsonl':
+        return iter_jsonl(lines)
+    raise ValueError(f'Unsupported format {file_format!r}, expected one of {", ".join(FORMATS)}')
+
+
+class ProductImporter:
+    # Streams rows in batches: each batch is validated, resolved against
+    # in-memory category/brand maps, assigned unique slugs with one lookup
+    # and written with bulk_create/bulk_update in its own transaction, so a
+    # bad row is reported without aborting the rest of the feed.
+
+    def __init__(self, batch_size=1000):
+        self.batch_size = batch_size
+        self.created = 0
+        self.updated = 0
+        self.rows = 0
+        self.errors = []
+        self.categories = {}
+        self.brands = {}
+
+    def load_lookups(self):
+        for pk, slug in Category.objects.values_list('pk', 'slug'):
+            self.categories[str(pk)] = pk
+            self.categories[slug] = pk
+        for pk, name in Brand.objects.values_list('pk', 'name'):
+            self.brands[str(pk)] = pk
+            self.brands[name.lower()] = pk
+
+    def run(self, rows):
+        started = time.monotonic()
+        self.load_lookups()
+
+        rows = iter(rows)
+        while True:
+            batch = list(islice(rows, self.batch_size))
+            if not batch:
+                break
+            self.rows += len(batch)
+            self.process_batch(batch)
+
+        elapsed = time.monotonic() - started
+        return {
+            'rows': self.rows,
+            'created': self.created,
+            'updated': self.updated,
+            'errors': self.errors,
+            'seconds': round(elapsed, 3),
+            'rows_per_second': round(self.rows / elapsed, 1) if elapsed else None,
+        }
+
+    def validate(self, number, row):
+        if isinstance(row, Exception):
+            self.errors.append({'row': number, 'errors': {'non_field_errors': [str(row)]}})
+            return None
+
+        serializer = ProductImportRowSerializer(data=row)
+        if not serializer.is_valid():
+            self.errors.append({'row': number, 'errors': serializer.errors})
+            return None
+
+        data = serializer.validated_data
+        errors = {}
+        category_id = self.categories.get(data['category'])
+        if category_id is None:
+            errors['category'] = ['Category does not exist']
+        brand_id = self.brands.get(data['brand'].lower())
+        if brand_id is None:
+            errors['brand'] = ['Brand does not exist']
+        if errors:
+            self.errors.append({'row': number, 'errors': errors})
+            return None
+
+        data['category_id'] = category_id
+        data['brand_id'] = brand_id
+        return data
+
+    def process_batch(self, batch):
+        valid = [data for data in (self.validate(number, row) for number, row in batch) if data]
+        # A slug given more than once in a batch is one product: the last
+        # row wins.
+        last = {data['slug']: data for data in valid if data.get('slug')}
+        valid = [data for data in valid if not data.get('slug') or last[data['slug']] is data]
+        if not valid:
+            return
+
+        # Rows that name an existing slug update that product; everything
+        # else becomes a new product.
+        existing = {
+            slug: (pk, dict(zip(OPTIONAL_FIELDS, values)))
+            for slug, pk, *values in Product.objects.filter(slug__in=list(last)).values_list(
+                'slug', 'pk', *OPTIONAL_FIELDS
+            )
+        }
+        self.allocate_slugs([data for data in valid if data.get('slug') not in existing])
+
+        now = timezone.now()
+        to_create, to_update = [], []
+        for data in valid:
+            pk, current = existing.get(data['slug'], (None, OPTIONAL_FIELDS))
+            data = {**current, **data}
+            product = Product(
+                pk=pk,
+                name=data['name'],
+                slug=data['slug'],
+                description=data['description'],
+                category_id=data['category_id'],
+                brand_id=data['brand_id'],
+                price=data['price'],
+                discount_percentage=data['discount_percentage'],
+                final_price=Product.compute_final_price(data['price'], data['discount_percentage']),
+                stock_quantity=data.get('stock_quantity', 0 if pk is None else None),
+                is_featured=data['is_featured'],
+                is_active=data['is_active'],
+                updated_at=now,
+            )
+            if pk is not None:
+                to_update.append(product)
+            else:
+                to_create.append(product)
+
+        with transaction.atomic():
+            if get_shard_count() > 1:
+                fold_shards([product.pk for product in to_update])
+            previous = dict(Product.objects.filter(
+                pk__in=[product.pk for product in to_update]
+            ).values_list('pk', 'stock_quantity'))
+            for product in to_update:
+                if product.stock_quantity is None:
+                    product.stock_quantity = previous[product.pk]
+            created = Product.objects.bulk_create(to_create, batch_size=self.batch_size)
+            Product.objects.bulk_update(to_update, UPDATE_FIELDS, batch_size=self.batch_size)
+            record(
+                [(product.pk, product.stock_quantity) for product in created]
+                + [(product.pk, product.stock_quantity - previous[product.pk]) for product in to_update],
+                StockMovement.IMPORT,
+            )
+
+        self.created += len(created)
+        self.updated += len(to_update)
+        self.after_write([product.pk for product in created], [product.pk for product in to_update])
+
+    def allocate_slugs(self, rows):
+        # Resolve every candidate slug against the table in one query, then
+        # hand out random suffixes in memory for the ones already taken; only
+        # the suffixed slugs need a second (almost always empty) check.
+        for data in rows:
+            data['slug'] = data.get('slug') or slugify(data['name'])[:41] or Product.generate_id()
+        taken = set(Product.objects.filter(
+            slug__in={data['slug'] for data in rows}
+        ).values_list('slug', flat=True))
+
+        pending = [(data, data['slug'][:41]) for data in rows]
+        while pending:
+            suffixed = []
+            for data, base in pending:
+                if data['slug'] in taken:
+                    data['slug'] = f'{base}-{Product.generate_id()}'
+                    suffixed.append((data, base))
+                taken.add(data['slug'])
+            if not suffixed:
+                break
+            clashes = set(Product.objects.filter(
+                slug__in=[data['slug'] for data, _ in suffixed]
+            ).values_list('slug', flat=True))
+            pending = [(data, base) for data, base in suffixed if data['slug'] in clashes]
+
+    def after_write(self, created_ids, updated_ids):
+        get_search_backend().index_products(created_ids + updated_ids)
+        # Created ids may still have a cached 404 from before they existed.
+        invalidate_product_details(created_ids + updated_ids)
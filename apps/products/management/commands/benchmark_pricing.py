@@ -0,0 +1,92 @@
+import random
+import time
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.core.management.base import BaseCommand
+
+from apps.products.pricing import final_prices, lines_total, price_lines
+
+
+def legacy_cart_total(lines):
+    # The per-line Decimal arithmetic the cart serializer used before.
+    total = 0
+    for price, discount_percentage, quantity in lines:
+        unit_price = price
+        if discount_percentage:
+            unit_price -= price * discount_percentage / 100
+        total += unit_price * quantity
+    return round(total, 2)
+
+
+def legacy_breakdown(lines):
+    # Unit price and rounded subtotal per line, as the cart item serializer did.
+    unit_prices, subtotals = [], []
+    for price, discount_percentage, quantity in lines:
+        unit_price = price
+        if discount_percentage:
+            unit_price -= price * discount_percentage / 100
+        unit_prices.append(unit_price)
+        subtotals.append(round(unit_price * quantity, 2))
+    return unit_prices, subtotals, legacy_cart_total(lines)
+
+
+def legacy_final_prices(items):
+    return [
+        (price * (100 - discount_percentage) / 100).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+        for price, discount_percentage in items
+    ]
+
+
+class Command(BaseCommand):
+    help = 'Time cart totals and bulk repricing with the pricing module against per-line Decimal math.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lines', type=int, default=10000)
+        parser.add_argument('--products', type=int, default=100000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        self.repeat = options['repeat']
+
+        def random_price():
+            return Decimal(rng.randint(100, 500000)).scaleb(-2)
+
+        lines = [(random_price(), rng.choice([0, 5, 10, 15, 33]), rng.randint(1, 5)) for _ in range(options['lines'])]
+        self.report(
+            f'{len(lines)}-line total',
+            len(lines),
+            lambda: legacy_cart_total(lines),
+            lambda: lines_total(lines),
+        )
+        self.report(
+            f'{len(lines)}-line breakdown',
+            len(lines),
+            lambda: legacy_breakdown(lines),
+            lambda: price_lines(lines),
+        )
+
+        items = [(random_price(), rng.randint(0, 90)) for _ in range(options['products'])]
+        self.report(
+            f'reprice {len(items)}',
+            len(items),
+            lambda: legacy_final_prices(items),
+            lambda: final_prices(items),
+        )
+
+    def measure(self, function):
+        best = None
+        for _ in range(self.repeat):
+            started = time.perf_counter()
+            function()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best
+
+    def report(self, name, count, before, after):
+        before, after = self.measure(before), self.measure(after)
+        self.stdout.write(
+            f'{name:<22} decimal {before * 1000:>9.2f} ms ({count / before:>12,.0f}/s)   '
+            f'pricing {after * 1000:>9.2f} ms ({count / after:>12,.0f}/s)'
+        )
@@ -0,0 +1,135 @@
+import time
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Prefetch
+
+from apps.carts.models import Cart, CartItem
+from apps.carts.serializers import CartSerializer, get_cart_item_row_serializer, get_cart_row_serializer
+from apps.orders.models import Order
+from apps.orders.serializers import OrderListSerializer, get_order_list_row_serializer
+from apps.products.models import Brand, Category, Product
+from apps.products.serializers import ProductListSerializer, get_product_list_row_serializer
+from apps.reviews.models import ProductReview
+from apps.reviews.serializers import ProductReviewListSerializer, get_review_list_row_serializer
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare rows/sec of the DRF serializers and their compiled row twins on '
+        'generated data. Everything is created in a transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=2000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        self.rows = options['rows']
+        self.repeat = options['repeat']
+        try:
+            with transaction.atomic():
+                self.seed()
+                self.run()
+                raise Rollback
+        except Rollback:
+            pass
+
+    def seed(self):
+        category = Category.objects.create(name='Benchmark', slug='benchmark-category', description='')
+        brand = Brand.objects.create(name='Benchmark', logo='https://example.com/logo.png', description='')
+        Product.objects.bulk_create([
+            Product(
+                name=f'Product {i}', slug=f'benchmark-{i}', description='Benchmark product',
+                category=category, brand=brand, price=Decimal('19.99') + i, discount_percentage=i % 40,
+                final_price=Product.compute_final_price(Decimal('19.99') + i, i % 40),
+                stock_quantity=i % 7, primary_image_url=f'https://example.com/{i}.png',
+            )
+            for i in range(self.rows)
+        ])
+        self.products = Product.objects.filter(slug__startswith='benchmark-')
+
+        users = User.objects.bulk_create([User(username=f'benchmark-{i}') for i in range(self.rows)])
+        self.user = users[0]
+        self.cart = Cart.objects.create(user=self.user)
+        CartItem.objects.bulk_create([
+            CartItem(cart=self.cart, product=product, quantity=1 + product.pk % 3) for product in self.products
+        ])
+        self.orders = Order.objects.bulk_create([
+            Order(
+                user=self.user, order_number=f'BENCH-{i}', total_amount=Decimal('10.00'),
+                status='pending', shipping_address='Benchmark street 1', phone='+998900000000',
+            )
+            for i in range(self.rows)
+        ])
+        product = self.products[0]
+        ProductReview.objects.bulk_create([
+            ProductReview(product=product, user=user, rating=1 + i % 5, title='Title', comment='Benchmark comment')
+            for i, user in enumerate(users)
+        ])
+        self.review_product = product
+
+    def measure(self, function):
+        best = None
+        for _ in range(self.repeat):
+            started = time.perf_counter()
+            function()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return self.rows / best if best else float('inf')
+
+    def report(self, name, before, after):
+        self.stdout.write(
+            f'{name:<14} serializer {before:>12,.0f} rows/s   compiled {after:>12,.0f} rows/s   '
+            f'x{after / before:.1f}'
+        )
+
+    def run(self):
+        # Both sides are timed on data that is already loaded, so the numbers
+        # compare serialization cost only.
+        products = list(self.products.with_list_data())
+        product_rows = get_product_list_row_serializer()
+        rows = list(self.products.values(*product_rows.columns))
+        self.report(
+            'product list',
+            self.measure(lambda: ProductListSerializer(products, many=True).data),
+            self.measure(lambda: product_rows.many(rows)),
+        )
+
+        cart = Cart.objects.prefetch_related(
+            Prefetch('items', queryset=CartItem.objects.select_related('product'))
+        ).get(pk=self.cart.pk)
+        cart_rows = get_cart_row_serializer()
+        cart_row = Cart.objects.filter(pk=cart.pk).values('id', 'user__username', 'created_at', 'updated_at').get()
+        cart_row['items'] = list(cart.items.order_by('pk').values(*get_cart_item_row_serializer().columns))
+        self.report(
+            'cart',
+            self.measure(lambda: CartSerializer(cart).data),
+            self.measure(lambda: cart_rows(cart_row)),
+        )
+
+        orders = list(Order.objects.filter(user=self.user).prefetch_related('items'))
+        order_rows = get_order_list_row_serializer()
+        rows = list(Order.objects.filter(user=self.user).annotate(items_count=Count('items')).values(
+            *order_rows.columns
+        ))
+        self.report(
+            'order list',
+            self.measure(lambda: OrderListSerializer(orders, many=True).data),
+            self.measure(lambda: order_rows.many(rows)),
+        )
+
+        reviews = list(ProductReview.objects.filter(product=self.review_product).select_related('user'))
+        review_rows = get_review_list_row_serializer()
+        rows = list(ProductReview.objects.filter(product=self.review_product).values(*review_rows.columns))
+        self.report(
+            'review list',
+            self.measure(lambda: ProductReviewListSerializer(reviews, many=True).data),
+            self.measure(lambda: review_rows.many(rows)),
+        )
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+
+from apps.products.cache import invalidate_product_details
+from apps.products.models import Product
+from apps.products.related import refresh_queued, refresh_related_products
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the precomputed related-products table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('ids', nargs='*', type=int, help='Only rebuild these products.')
+        parser.add_argument('--top-k', type=int, default=None)
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--queued', action='store_true', help='Only rebuild around products queued by saves.'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if options['queued']:
+            refreshed = refresh_queued(batch_size)
+            invalidate_product_details(refreshed)
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt related products for {len(refreshed)} products.'))
+            return
+
+        ids = options['ids']
+        if not ids:
+            ids = Product.objects.filter(is_active=True).values_list('pk', flat=True).iterator(
+                chunk_size=batch_size
+            )
+
+        total = 0
+        batch = []
+        for pk in ids:
+            batch.append(pk)
+            if len(batch) >= batch_size:
+                total += self.refresh(batch, options['top_k'])
+                batch = []
+        if batch:
+            total += self.refresh(batch, options['top_k'])
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt related products for {total} products.'))
+
+    def refresh(self, batch, top_k):
+        refresh_related_products(batch, top_k=top_k)
+        invalidate_product_details(batch)
+        return len(batch)
@@ -0,0 +1,54 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from apps.products.exporter import FORMATS, iter_export
+
+
+class Command(BaseCommand):
+    help = 'Stream the catalog to a NDJSON or CSV file (or stdout) one chunk at a time.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', help='Defaults to stdout.')
+        parser.add_argument('--format', choices=FORMATS, help='Defaults to the file extension, or ndjson.')
+        parser.add_argument('--updated-since', help='ISO 8601 timestamp for incremental feeds.')
+        parser.add_argument(
+            '--include-inactive', action='store_true',
+            help='Also export inactive products; incremental feeds always include them.',
+        )
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format']
+        if file_format is None:
+            file_format = os.path.splitext(path)[1].lstrip('.').lower() if path else 'ndjson'
+            if file_format == 'jsonl':
+                file_format = 'ndjson'
+        if file_format not in FORMATS:
+            raise CommandError(f'Cannot tell the format of {path}; pass --format.')
+
+        updated_since = None
+        if options['updated_since']:
+            updated_since = parse_datetime(options['updated_since'])
+            if updated_since is None:
+                raise CommandError('--updated-since must be an ISO 8601 timestamp.')
+            if timezone.is_naive(updated_since):
+                updated_since = timezone.make_aware(updated_since)
+
+        chunks = iter_export(
+            file_format,
+            updated_since=updated_since,
+            include_inactive=options['include_inactive'],
+            chunk_size=options['chunk_size'],
+        )
+        if path is None:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
+            return
+
+        with open(path, 'w', encoding='utf-8', newline='') as output:
+            output.writelines(chunks)
+        self.stdout.write(self.style.SUCCESS(f'Exported the catalog to {path}.'))
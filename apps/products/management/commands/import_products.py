@@ -0,0 +1,34 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.products.importer import FORMATS, ProductImporter, iter_rows
+
+
+class Command(BaseCommand):
+    help = 'Stream products from a CSV or JSONL file into the catalog in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=FORMATS, help='Defaults to the file extension.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or os.path.splitext(path)[1].lstrip('.').lower()
+        if file_format == 'ndjson':
+            file_format = 'jsonl'
+        if file_format not in FORMATS:
+            raise CommandError(f'Cannot tell the format of {path}; pass --format.')
+
+        importer = ProductImporter(batch_size=options['batch_size'])
+        with open(path, encoding='utf-8', newline='') as lines:
+            result = importer.run(iter_rows(lines, file_format))
+
+        for error in result['errors']:
+            self.stderr.write(f"Row {error['row']}: {error['errors']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Processed {result['rows']} rows in {result['seconds']}s "
+            f"({result['rows_per_second']} rows/s): {result['created']} created, "
+            f"{result['updated']} updated, {len(result['errors'])} rejected."
+        ))
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.7 on 2026-10-18 01:20
+
+from django.db import migrations, models
+
+
+def backfill_category_paths(apps, schema_editor):
+    Category = apps.get_model('products', 'Category')
+
+    children = {}
+    for category in Category.objects.order_by('pk'):
+        children.setdefault(category.parent_id, []).append(category)
+
+    pending = [(category, '') for category in children.get(None, [])]
+    while pending:
+        category, parent_path = pending.pop()
+        category.path = f'{parent_path}{category.pk:010d}/'
+        category.depth = category.path.count('/') - 1
+        category.save(update_fields=['path', 'depth'])
+        pending.extend((child, category.path) for child in children.get(category.pk, []))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0005_related_product'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='depth',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='path',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=255),
+        ),
+        migrations.RunPython(backfill_category_paths, migrations.RunPython.noop),
+    ]
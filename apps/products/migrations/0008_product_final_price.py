@@ -0,0 +1,39 @@
+# Generated by Django 5.2.7 on 2026-10-18 01:29
+
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import migrations, models
+
+
+def backfill_final_price(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+
+    batch = []
+    for product in Product.objects.only('pk', 'price', 'discount_percentage').iterator(chunk_size=1000):
+        final_price = product.price * (100 - product.discount_percentage) / 100
+        product.final_price = final_price.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+        batch.append(product)
+        if len(batch) == 1000:
+            Product.objects.bulk_update(batch, ['final_price'])
+            batch = []
+    Product.objects.bulk_update(batch, ['final_price'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0007_product_updated_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='final_price',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=10),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['is_active', 'final_price', 'id'], name='product_active_price_idx'),
+        ),
+        migrations.RunPython(backfill_final_price, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.7 on 2026-10-18 01:32
+
+from django.db import migrations, models
+from django.db.models import Count, Exists, Min, OuterRef, Subquery
+
+
+def backfill_primary_images(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    ProductImage = apps.get_model('products', 'ProductImage')
+
+    # Keep the oldest primary where several were marked...
+    duplicates = (
+        ProductImage.objects.filter(is_primary=True).order_by().values('product_id')
+        .annotate(count=Count('id'), keep=Min('id')).filter(count__gt=1)
+    )
+    for row in duplicates:
+        ProductImage.objects.filter(product_id=row['product_id'], is_primary=True).exclude(
+            pk=row['keep']
+        ).update(is_primary=False)
+
+    # ...and promote the first image where none was.
+    missing = ProductImage.objects.exclude(
+        Exists(ProductImage.objects.filter(product_id=OuterRef('product_id'), is_primary=True))
+    ).order_by('product_id', 'order', 'pk')
+    promoted = {}
+    for pk, product_id in missing.values_list('pk', 'product_id'):
+        promoted.setdefault(product_id, pk)
+    ProductImage.objects.filter(pk__in=promoted.values()).update(is_primary=True)
+
+    primary_image = ProductImage.objects.filter(
+        product=OuterRef('pk'), is_primary=True
+    ).values('image_url')[:1]
+    Product.objects.update(primary_image_url=Subquery(primary_image))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0009_product_ordering_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='primary_image_url',
+            field=models.URLField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_primary_images, migrations.RunPython.noop),
+    ]
@@ -1,15 +1,85 @@
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.db.models import Case, F, FloatField, OuterRef, Subquery, Value, When
+from django.db.models.functions import Cast, Concat, Length, Substr
+from django.utils import timezone
 import string
 import secrets
 from django.contrib.auth.models import User
+from apps.products import pricing
+
+class CategoryQuerySet(models.QuerySet):
+    def subtree(self, category_id, include_self=True):
+        # Descendants share their ancestor's path as a prefix. Matching it as
+        # a range (the trailing '/' bumped to '0', the next byte) keeps the
+        # lookup an index range scan, and the path itself is read by a scalar
+        # subquery so the whole filter stays a single statement.
+        path = Category.objects.filter(pk=category_id).values('path')[:1]
+        upper = Concat(Substr(Subquery(path), 1, Length(Subquery(path)) - 1), Value('0'))
+        subtree = self.filter(path__gte=Subquery(path), path__lt=upper)
+        if not include_self:
+            subtree = subtree.exclude(pk=category_id)
+        return subtree
 
 class Category(models.Model):
+    PATH_SEGMENT_WIDTH = 10
+
     name = models.CharField(max_length=100)
     slug = models.SlugField(unique=True)
     description = models.TextField()
     parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='children')
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    path = models.CharField(max_length=255, db_index=True, editable=False, default='')
+    depth = models.IntegerField(default=0, editable=False)
+
+    objects = CategoryQuerySet.as_manager()
+
+    @classmethod
+    def get_path_segment(cls, pk):
+        return f'{pk:0{cls.PATH_SEGMENT_WIDTH}d}/'
+
+    @property
+    def ancestor_ids(self):
+        return [int(segment) for segment in self.path.split('/')[:-2]]
+
+    def get_ancestors(self, include_self=False):
+        ids = self.ancestor_ids + ([self.pk] if include_self else [])
+        return Category.objects.filter(pk__in=ids).order_by('depth')
+
+    def clean(self):
+        if self.pk and self.parent_id:
+            parent_path = Category.objects.filter(pk=self.parent_id).values_list('path', flat=True).first() or ''
+            if self.get_path_segment(self.pk) in parent_path:
+                raise ValidationError({'parent': 'A category cannot be moved under itself or its descendants.'})
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            old_path = ''
+            if self.pk:
+                old_path = Category.objects.filter(pk=self.pk).values_list('path', flat=True).first() or ''
+            super().save(*args, **kwargs)
+            self.update_path(old_path)
+
+    def update_path(self, old_path):
+        parent_path = ''
+        if self.parent_id:
+            parent_path = Category.objects.filter(pk=self.parent_id).values_list('path', flat=True).get()
+        path = parent_path + self.get_path_segment(self.pk)
+        depth = path.count('/') - 1
+        if path == old_path:
+            return
+
+        if old_path:
+            # Re-parenting rewrites the whole subtree in one UPDATE by swapping
+            # the old prefix for the new one.
+            Category.objects.filter(path__startswith=old_path).exclude(pk=self.pk).update(
+                path=Concat(Value(path), Substr('path', len(old_path) + 1)),
+                depth=F('depth') + (depth - old_path.count('/') + 1),
+            )
+        Category.objects.filter(pk=self.pk).update(path=path, depth=depth)
+        self.path = path
+        self.depth = depth
 
 class Brand(models.Model):
     name = models.CharField(max_length=100)
@@ -17,6 +87,88 @@ class Brand(models.Model):
     description = models.TextField()
     website = models.URLField(blank=True, null=True)
 
+class ProductQuerySet(models.QuerySet):
+    # Columns each list field reads, so a sparse fieldset can load only those.
+    LIST_FIELD_COLUMNS = {
+        'id': [],
+        'name': ['name'],
+        'slug': ['slug'],
+        'description': ['description'],
+        'category': ['category', 'category__id', 'category__name', 'category__slug'],
+        'brand': ['brand', 'brand__id', 'brand__name', 'brand__logo'],
+        'price': ['price'],
+        'discount_percentage': ['discount_percentage'],
+        'final_price': ['final_price'],
+        'stock_quantity': ['stock_quantity'],
+        'available_quantity': ['stock_quantity', 'reserved_quantity'],
+        'in_stock': ['stock_quantity', 'reserved_quantity'],
+        'is_featured': ['is_featured'],
+        'primary_image': ['primary_image_url'],
+        'reviews_count': ['reviews_count'],
+        'average_rating': ['average_rating'],
+        'created_at': ['created_at'],
+        'updated_at': ['updated_at'],
+        'related_products': [],
+    }
+
+    def active(self):
+        # filter(is_active=True) compiles to a bare `WHERE is_active`, which
+        # SQLite cannot match against the leading column of the
+        # (is_active, <sort key>, id) indexes; `IN (1)` is an equality it can
+        # seek on, so ordered pages are read straight off the index.
+        return self.filter(is_active__in=[True])
+
+    def with_list_data(self, fields=None, extra_columns=()):
+        # With ``fields`` only the joins and columns those fields read are
+        # loaded; ``extra_columns`` covers e.g. the pagination key.
+        queryset = self
+        if fields is None or 'category' in fields:
+            queryset = queryset.select_related('category')
+        if fields is None or 'brand' in fields:
+            queryset = queryset.select_related('brand')
+        if fields is not None:
+            columns = set(extra_columns)
+            for field in fields:
+                columns.update(self.LIST_FIELD_COLUMNS[field])
+            queryset = queryset.only('id', *columns)
+        return queryset
+
+    def apply_rating_change(self, product_id, added=None, removed=None):
+        # Adjusts the stored review aggregates for one review being added,
+        # removed or re-rated (both given). Every right-hand side reads the
+        # pre-update row, so the average is derived from the deltas too.
+        count_delta = (added is not None) - (removed is not None)
+        sum_delta = (added or 0) - (removed or 0)
+        new_count = F('reviews_count') + count_delta
+        new_sum = F('rating_sum') + sum_delta
+
+        updates = {
+            'reviews_count': new_count,
+            'rating_sum': new_sum,
+            'average_rating': Case(
+                When(reviews_count__gt=-count_delta, then=Cast(new_sum, FloatField()) / new_count),
+                default=Value(0.0),
+                output_field=FloatField(),
+            ),
+            'updated_at': timezone.now(),
+        }
+        for rating, delta in ((added, 1), (removed, -1)):
+            if rating is not None:
+                field = f'rating_{rating}'
+                updates[field] = updates.get(field, F(field)) + delta
+
+        return self.filter(pk=product_id).update(**updates)
+
+    def refresh_primary_image(self, product_ids):
+        # Runs after every image write, which also changes the product's
+        # exported images, so it marks the product updated.
+        primary_image = ProductImage.objects.filter(
+            product=OuterRef('pk'), is_primary=True
+        ).order_by('pk').values('image_url')[:1]
+        return self.filter(pk__in=product_ids).update(
+            primary_image_url=Subquery(primary_image), updated_at=timezone.now()
+        )
+
 class Product(models.Model):
     name = models.CharField(max_length=200)
     slug = models.SlugField(unique=True)
@@ -25,11 +177,80 @@ class Product(models.Model):
     brand = models.ForeignKey(Brand, on_delete=models.CASCADE, related_name='products')
     price = models.DecimalField(max_digits=10, decimal_places=2)
     discount_percentage = models.IntegerField(default=0)
+    # Selling price after discount, stored so filters and sorting can use an
+    # index. Kept in sync by save(); bulk writers call compute_final_price.
+    final_price = models.DecimalField(max_digits=10, decimal_places=2, default=0, editable=False)
     stock_quantity = models.IntegerField(default=0)
+    # Units held by carts (apps.carts.reservations); only ever moved with F()
+    # so that available_quantity is a single-row read.
+    reserved_quantity = models.IntegerField(default=0, editable=False)
     is_featured = models.BooleanField(default=False)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Review aggregates, moved with F() by ProductQuerySet.apply_rating_change
+    # and rebuilt by rebuild_rating_aggregates; never written by clients.
+    reviews_count = models.IntegerField(default=0, editable=False)
+    rating_sum = models.IntegerField(default=0, editable=False)
+    average_rating = models.FloatField(default=0, editable=False)
+    rating_1 = models.IntegerField(default=0, editable=False)
+    rating_2 = models.IntegerField(default=0, editable=False)
+    rating_3 = models.IntegerField(default=0, editable=False)
+    rating_4 = models.IntegerField(default=0, editable=False)
+    rating_5 = models.IntegerField(default=0, editable=False)
+    # Copy of the primary ProductImage URL, maintained by ProductImage.save()
+    # and delete(), so list responses never query images.
+    primary_image_url = models.URLField(null=True, blank=True, editable=False)
+
+    objects = ProductQuerySet.as_manager()
+
+    # Left out of full saves of a loaded product: stock moves only through
+    # apps.inventory.ledger (adjust_stock/set_stock) and checkout, the rest
+    # through their own F() updates. Pass update_fields to write them.
+    COUNTER_FIELDS = {
+        'stock_quantity', 'reserved_quantity', 'reviews_count', 'rating_sum', 'average_rating',
+        'rating_1', 'rating_2', 'rating_3', 'rating_4', 'rating_5',
+    }
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['is_active', 'created_at', 'id'], name='product_active_created_idx'),
+            models.Index(fields=['category', 'is_active', 'created_at', 'id'], name='product_category_created_idx'),
+            models.Index(fields=['brand', 'is_active', 'created_at', 'id'], name='product_brand_created_idx'),
+            models.Index(fields=['is_featured', 'is_active', 'created_at', 'id'], name='product_featured_created_idx'),
+            models.Index(fields=['is_active', 'average_rating', 'id'], name='product_active_rating_idx'),
+            models.Index(fields=['updated_at'], name='product_updated_idx'),
+            models.Index(fields=['is_active', 'final_price', 'id'], name='product_active_price_idx'),
+            models.Index(fields=['is_active', 'discount_percentage', 'id'], name='product_active_discount_idx'),
+            models.Index(fields=['is_active', 'reviews_count', 'id'], name='product_active_reviews_idx'),
+            models.Index(fields=['is_active', 'stock_quantity', 'id'], name='product_active_stock_idx'),
+        ]
+
+    @property
+    def rating_histogram(self):
+        return {str(star): getattr(self, f'rating_{star}') for star in range(1, 6)}
+
+    @property
+    def available_quantity(self):
+        return max(self.stock_quantity - self.reserved_quantity, 0)
+
+    @staticmethod
+    def compute_final_price(price, discount_percentage):
+        return pricing.final_price(price, discount_percentage)
+
+    def save(self, *args, **kwargs):
+        self.final_price = self.compute_final_price(self.price, self.discount_percentage)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'price', 'discount_percentage'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'final_price'}
+        elif update_fields is None and not self._state.adding and not kwargs.get('force_insert'):
+            # A full save of a loaded product must not write back stale
+            # copies of the counters.
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
 
     @staticmethod
     def generate_id(length=8):
@@ -40,4 +261,56 @@ class ProductImage(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='images')
     image_url = models.URLField()
     is_primary = models.BooleanField(default=False)
-    order = models.IntegerField(default=0)
\ No newline at end of file
+    order = models.IntegerField(default=0)
+
+    def save(self, *args, **kwargs):
+        # A product with images has exactly one primary: marking an image
+        # primary demotes the others, and the first image is promoted.
+        with transaction.atomic():
+            siblings = ProductImage.objects.filter(product_id=self.product_id).exclude(pk=self.pk)
+            if self.is_primary:
+                siblings.filter(is_primary=True).update(is_primary=False)
+            elif not siblings.filter(is_primary=True).exists():
+                self.is_primary = True
+            super().save(*args, **kwargs)
+            Product.objects.refresh_primary_image([self.product_id])
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            if self.is_primary:
+                successor = ProductImage.objects.filter(
+                    product_id=self.product_id
+                ).order_by('order', 'pk').first()
+                if successor is not None:
+                    successor.is_primary = True
+                    successor.save(update_fields=['is_primary'])
+            Product.objects.refresh_primary_image([self.product_id])
+        return result
+
+class RelatedProductQuerySet(models.QuerySet):
+    def for_display(self):
+        return self.filter(related__is_active=True).select_related('related').annotate(
+            primary_image_url=F('related__primary_image_url'),
+        ).order_by('rank')
+
+class RelatedProduct(models.Model):
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='related_links')
+    related = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='related_to_links')
+    rank = models.IntegerField()
+    score = models.FloatField()
+
+    objects = RelatedProductQuerySet.as_manager()
+
+    class Meta:
+        unique_together = ['product', 'related']
+        indexes = [
+            models.Index(fields=['product', 'rank'], name='related_product_rank_idx'),
+        ]
+
+class RelatedRefresh(models.Model):
+    # Products whose related block, and those around it, are due for a
+    # rebuild. Saving a product queues it; build_related_products --queued
+    # drains the queue outside the request.
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='+')
+    queued_at = models.DateTimeField(auto_now_add=True)
@@ -0,0 +1,59 @@
+from collections import namedtuple
+from decimal import Decimal
+
+# All discount math happens on integer minor units (cents): a price is
+# converted once, the discounted unit price is rounded half-up to a whole
+# cent, and subtotals and totals are exact integer sums of those units.
+
+
+def to_cents(amount):
+    # Prices come from two-place DecimalFields (model or serializer), so
+    # scaling by 100 is exact and int() never truncates a fraction.
+    return int(amount * 100)
+
+
+def from_cents(cents):
+    return Decimal(cents).scaleb(-2)
+
+
+def discounted_cents(cents, discount_percentage):
+    return (cents * (100 - (discount_percentage or 0)) + 50) // 100
+
+
+def final_price(price, discount_percentage):
+    return from_cents(discounted_cents(to_cents(price), discount_percentage))
+
+
+def final_prices(items):
+    # Bulk repricing: ``items`` is an iterable of (price, discount_percentage).
+    return [
+        from_cents(discounted_cents(to_cents(price), discount_percentage))
+        for price, discount_percentage in items
+    ]
+
+
+PricedLines = namedtuple('PricedLines', ['unit_prices', 'subtotals', 'total'])
+
+
+def price_lines(lines):
+    # ``lines`` is an iterable of (price, discount_percentage, quantity), as
+    # found on cart and order items; returns per-line unit prices and
+    # subtotals plus the total, all as two-place Decimals.
+    units, quantities = [], []
+    for price, discount_percentage, quantity in lines:
+        units.append(discounted_cents(to_cents(price), discount_percentage))
+        quantities.append(quantity)
+    subtotals = list(map(int.__mul__, units, quantities))
+    return PricedLines(
+        [from_cents(unit) for unit in units],
+        [from_cents(subtotal) for subtotal in subtotals],
+        from_cents(sum(subtotals)),
+    )
+
+
+def lines_total(lines):
+    # Same total as price_lines(lines).total without the per-line Decimals.
+    total = 0
+    for price, discount_percentage, quantity in lines:
+        total += discounted_cents(to_cents(price), discount_percentage) * quantity
+    return from_cents(total)
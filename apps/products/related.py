@@ -0,0 +1,129 @@
+import math
+
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import Abs
+
+from apps.products.models import Product, RelatedProduct, RelatedRefresh
+
+CATEGORY_WEIGHT = 3.0
+BRAND_WEIGHT = 1.5
+PRICE_WEIGHT = 1.0
+CO_PURCHASE_WEIGHT = 2.0
+# Candidates per product, nearest in price first, before scoring.
+CANDIDATE_LIMIT = 100
+QUEUE_BATCH_SIZE = 100
+
+
+def get_top_k():
+    return getattr(settings, 'RELATED_PRODUCTS_LIMIT', 4)
+
+
+def get_co_purchases(product_id):
+    OrderItem = apps.get_model('orders', 'OrderItem')
+    orders = OrderItem.objects.filter(product_id=product_id).exclude(
+        order__status='cancelled'
+    ).values('order_id')
+    rows = (
+        OrderItem.objects.filter(order_id__in=orders)
+        .exclude(product_id=product_id)
+        .values('product_id')
+        .annotate(count=Count('order_id', distinct=True))
+        .order_by('-count')[:CANDIDATE_LIMIT]
+    )
+    return {row['product_id']: row['count'] for row in rows}
+
+
+def score_candidates(product, candidates, co_purchases):
+    scored = []
+    for candidate in candidates:
+        score = 0.0
+        if candidate['category_id'] == product.category_id:
+            score += CATEGORY_WEIGHT
+        if candidate['brand_id'] == product.brand_id:
+            score += BRAND_WEIGHT
+        highest = max(candidate['price'], product.price)
+        if highest:
+            score += PRICE_WEIGHT * (1 - float(abs(candidate['price'] - product.price) / highest))
+        score += CO_PURCHASE_WEIGHT * math.log1p(co_purchases.get(candidate['id'], 0))
+        scored.append((score, candidate['id']))
+    scored.sort(key=lambda item: (-item[0], item[1]))
+    return scored
+
+
+def build_links(product, top_k):
+    co_purchases = get_co_purchases(product.pk)
+    candidates = (
+        Product.objects.filter(is_active=True)
+        .filter(
+            Q(category_id=product.category_id)
+            | Q(brand_id=product.brand_id)
+            | Q(pk__in=list(co_purchases))
+        )
+        .exclude(pk=product.pk)
+        .annotate(price_gap=Abs(F('price') - product.price))
+        .order_by('price_gap', 'pk')
+        .values('id', 'category_id', 'brand_id', 'price')[:CANDIDATE_LIMIT]
+    )
+    scored = score_candidates(product, candidates, co_purchases)[:top_k]
+    return [
+        RelatedProduct(product_id=product.pk, related_id=related_id, rank=rank, score=score)
+        for rank, (score, related_id) in enumerate(scored)
+    ]
+
+
+def refresh_related_products(product_ids, top_k=None):
+    top_k = top_k or get_top_k()
+    product_ids = list(product_ids)
+    products = Product.objects.filter(pk__in=product_ids, is_active=True).only(
+        'pk', 'category_id', 'brand_id', 'price'
+    )
+
+    links = []
+    for product in products:
+        links.extend(build_links(product, top_k))
+
+    with transaction.atomic():
+        RelatedProduct.objects.filter(product_id__in=product_ids).delete()
+        RelatedProduct.objects.bulk_create(links)
+    return links
+
+
+def refresh_product_neighbourhood(product_id):
+    # A changed product gets a fresh neighbour list, and so does every
+    # product that lists it or that it now lists, since their scores against
+    # it may have moved. Returns the ids whose related block was rebuilt.
+    linked_from = set(
+        RelatedProduct.objects.filter(related_id=product_id).values_list('product_id', flat=True)
+    )
+    links = refresh_related_products([product_id])
+    neighbours = (linked_from | {link.related_id for link in links}) - {product_id}
+    if neighbours:
+        refresh_related_products(neighbours)
+    return neighbours | {product_id}
+
+
+def queue_refresh(product_ids):
+    # One INSERT; a product already queued stays queued once.
+    RelatedRefresh.objects.bulk_create(
+        [RelatedRefresh(product_id=pk) for pk in product_ids], ignore_conflicts=True
+    )
+
+
+def refresh_queued(batch_size=QUEUE_BATCH_SIZE):
+    # Rebuilds the neighbourhood of every queued product and returns the ids
+    # whose related block changed. Entries are taken off the queue before
+    # the rebuild, so a save meanwhile queues the product again.
+    refreshed = set()
+    while True:
+        with transaction.atomic():
+            product_ids = list(
+                RelatedRefresh.objects.order_by('queued_at').values_list('product_id', flat=True)[:batch_size]
+            )
+            RelatedRefresh.objects.filter(product_id__in=product_ids).delete()
+        if not product_ids:
+            return refreshed
+        for product_id in product_ids:
+            refreshed |= refresh_product_neighbourhood(product_id)
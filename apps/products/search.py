@@ -0,0 +1,121 @@
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+class BaseSearchBackend:
+    # A backend narrows a product queryset to the matches for ``query`` and
+    # annotates ``search_rank`` (higher is more relevant). Backends that keep
+    # their own index also implement the index_* hooks.
+
+    def search(self, queryset, query):
+        raise NotImplementedError
+
+    def index_products(self, product_ids):
+        pass
+
+    def remove_products(self, product_ids):
+        pass
+
+    def rebuild(self):
+        pass
+
+
+class IcontainsSearchBackend(BaseSearchBackend):
+    def search(self, queryset, query):
+        condition = Q()
+        for token in TOKEN_RE.findall(query):
+            condition &= (
+                Q(name__icontains=token)
+                | Q(description__icontains=token)
+                | Q(brand__name__icontains=token)
+                | Q(category__name__icontains=token)
+            )
+        return queryset.filter(condition).annotate(
+            search_rank=Value(0.0, output_field=FloatField())
+        )
+
+
+class SQLiteFTS5SearchBackend(BaseSearchBackend):
+    table = 'product_search'
+    # bm25() weights for the name, description, brand and category columns.
+    weights = (10.0, 1.0, 4.0, 2.0)
+    chunk_size = 500
+
+    def build_match(self, query):
+        tokens = TOKEN_RE.findall(query)
+        if not tokens:
+            return None
+        # Quote every token so user input can never be parsed as FTS5 syntax,
+        # and prefix-match the last one for search-as-you-type.
+        terms = ['"%s"' % token.replace('"', '""') for token in tokens]
+        terms[-1] += '*'
+        return ' '.join(terms)
+
+    def search(self, queryset, query):
+        match = self.build_match(query)
+        if match is None:
+            return queryset.none()
+
+        product_table = queryset.model._meta.db_table
+        weights = ', '.join(str(weight) for weight in self.weights)
+        return queryset.filter(
+            id__in=RawSQL(f'SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s', [match])
+        ).annotate(
+            search_rank=RawSQL(
+                f'SELECT -bm25({self.table}, {weights}) FROM {self.table} '
+                f'WHERE {self.table} MATCH %s AND rowid = "{product_table}"."id"',
+                [match],
+                output_field=FloatField(),
+            )
+        )
+
+    def insert(self, cursor, where, params):
+        cursor.execute(
+            f'INSERT INTO {self.table} (rowid, name, description, brand, category) '
+            'SELECT p.id, p.name, p.description, b.name, c.name '
+            'FROM products_product p '
+            'JOIN products_brand b ON b.id = p.brand_id '
+            'JOIN products_category c ON c.id = p.category_id '
+            f'WHERE p.is_active AND {where}',
+            params,
+        )
+
+    def index_products(self, product_ids):
+        product_ids = list(product_ids)
+        self.remove_products(product_ids)
+        with connection.cursor() as cursor:
+            for start in range(0, len(product_ids), self.chunk_size):
+                chunk = product_ids[start:start + self.chunk_size]
+                self.insert(cursor, 'p.id IN (%s)' % ', '.join(['%s'] * len(chunk)), chunk)
+
+    def remove_products(self, product_ids):
+        product_ids = list(product_ids)
+        with connection.cursor() as cursor:
+            for start in range(0, len(product_ids), self.chunk_size):
+                chunk = product_ids[start:start + self.chunk_size]
+                placeholders = ', '.join(['%s'] * len(chunk))
+                cursor.execute(f'DELETE FROM {self.table} WHERE rowid IN ({placeholders})', chunk)
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+            self.insert(cursor, '1 = 1', [])
+
+
+@lru_cache(maxsize=None)
+def get_search_backend():
+    path = getattr(settings, 'PRODUCT_SEARCH_BACKEND', None)
+    if path is None:
+        if connection.vendor == 'sqlite':
+            path = 'apps.products.search.SQLiteFTS5SearchBackend'
+        else:
+            path = 'apps.products.search.IcontainsSearchBackend'
+    return import_string(path)()
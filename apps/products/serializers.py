@@ -1,9 +1,52 @@
+from functools import lru_cache
 from rest_framework import serializers
 from django.utils.text import slugify
 from decimal import Decimal
-from apps.products.models import Product, Category, Brand, ProductImage
+from apps.products.compiled import CompiledSerializer, RowField
+from apps.products.models import Product, Category, Brand, ProductImage, RelatedProduct
+from apps.products.search import get_search_backend
 from apps.reviews.models import ProductReview
 
+PRODUCT_VIEWS = {
+    'grid': ['id', 'name', 'final_price', 'primary_image', 'average_rating'],
+}
+# Public sort names; every key is backed by an (is_active, <key>, id) index.
+PRODUCT_ORDERINGS = {
+    'newest': '-created_at',
+    'oldest': 'created_at',
+    'price': 'final_price',
+    '-price': '-final_price',
+    'discount': '-discount_percentage',
+    'rating': '-average_rating',
+    'popularity': '-reviews_count',
+    'stock': '-stock_quantity',
+}
+
+class SparseFieldsMixin:
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+class SparseFieldsQuerySerializer(serializers.Serializer):
+    fields = serializers.CharField(required=False)
+    view = serializers.ChoiceField(choices=['full'] + list(PRODUCT_VIEWS), required=False)
+    available_fields = []
+    
+    def validate_fields(self, value):
+        fields = [field.strip() for field in value.split(',') if field.strip()]
+        unknown = [field for field in fields if field not in self.available_fields]
+        if unknown:
+            raise serializers.ValidationError(f"Unknown fields: {', '.join(unknown)}")
+        return fields
+    
+    def get_fields_selection(self):
+        fields = self.validated_data.get('fields')
+        if fields is None:
+            fields = PRODUCT_VIEWS.get(self.validated_data.get('view'))
+        return fields
+
 class CategoryNestedSerializer(serializers.ModelSerializer):
     class Meta:
         model = Category
@@ -31,26 +74,28 @@ class ProductReviewSerializer(serializers.ModelSerializer):
         model = ProductReview
         fields = ['id', 'user', 'rating', 'title', 'comment', 'is_verified_purchase', 'created_at']
 
-class RelatedProductSerializer(serializers.ModelSerializer):
+class RelatedProductLinkSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(source='related_id')
+    name = serializers.CharField(source='related.name')
+    price = serializers.SerializerMethodField()
     final_price = serializers.SerializerMethodField()
-    primary_image = serializers.SerializerMethodField()
+    primary_image = serializers.CharField(source='primary_image_url', allow_null=True)
     
     class Meta:
-        model = Product
+        model = RelatedProduct
         fields = ['id', 'name', 'price', 'final_price', 'primary_image']
     
-    def get_final_price(self, obj):
-        discount_decimal = Decimal(obj.discount_percentage) / Decimal(100)
-        return obj.price * (Decimal(1) - discount_decimal)
+    def get_price(self, obj):
+        return str(obj.related.price)
     
-    def get_primary_image(self, obj):
-        primary_image = obj.images.filter(is_primary=True).first()
-        return primary_image.image_url if primary_image else None
+    def get_final_price(self, obj):
+        return str(obj.related.final_price)
 
-class ProductListSerializer(serializers.ModelSerializer):
+class ProductListSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     category = CategoryNestedSerializer(read_only=True)
     brand = BrandNestedSerializer(read_only=True)
     final_price = serializers.SerializerMethodField()
+    available_quantity = serializers.SerializerMethodField()
     in_stock = serializers.SerializerMethodField()
     primary_image = serializers.SerializerMethodField()
     reviews_count = serializers.SerializerMethodField()
@@ -61,29 +106,57 @@ class ProductListSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'name', 'slug', 'description', 'category', 'brand',
             'price', 'discount_percentage', 'final_price', 'stock_quantity',
-            'in_stock', 'is_featured', 'primary_image', 'reviews_count',
+            'available_quantity', 'in_stock', 'is_featured', 'primary_image', 'reviews_count',
             'average_rating', 'created_at', 'updated_at'
         ]
     
     def get_final_price(self, obj):
-        discount_decimal = Decimal(obj.discount_percentage) / Decimal(100)
-        return obj.price * (Decimal(1) - discount_decimal)
+        return obj.final_price
+    
+    def get_available_quantity(self, obj):
+        return obj.available_quantity
     
     def get_in_stock(self, obj):
-        return obj.stock_quantity > 0
+        return obj.available_quantity > 0
     
     def get_primary_image(self, obj):
-        primary_image = obj.images.filter(is_primary=True).first()
-        return primary_image.image_url if primary_image else None
+        return obj.primary_image_url
     
     def get_reviews_count(self, obj):
-        return obj.reviews.count()
+        return obj.reviews_count
     
     def get_average_rating(self, obj):
-        reviews = obj.reviews.all()
-        if reviews:
-            return sum(review.rating for review in reviews) / len(reviews)
-        return 0
+        return obj.average_rating or 0
+
+# Row equivalents of ProductListSerializer's method fields.
+PRODUCT_LIST_ROW_FIELDS = {
+    'final_price': RowField(['final_price'], lambda final_price: final_price),
+    'available_quantity': RowField(
+        ['stock_quantity', 'reserved_quantity'],
+        lambda stock_quantity, reserved_quantity: max(stock_quantity - reserved_quantity, 0),
+    ),
+    'in_stock': RowField(
+        ['stock_quantity', 'reserved_quantity'],
+        lambda stock_quantity, reserved_quantity: stock_quantity > reserved_quantity,
+    ),
+    'primary_image': RowField(['primary_image_url'], lambda url: url),
+    'reviews_count': RowField(['reviews_count'], lambda reviews_count: reviews_count),
+    'average_rating': RowField(['average_rating'], lambda average_rating: average_rating or 0),
+}
+
+@lru_cache(maxsize=None)
+def get_product_list_row_serializer(fields=None):
+    # ``fields`` is a tuple (or None for all) so each fieldset compiles once.
+    return CompiledSerializer(
+        ProductListSerializer(fields=list(fields) if fields is not None else None),
+        PRODUCT_LIST_ROW_FIELDS,
+    )
+
+class ProductListWithRelatedSerializer(ProductListSerializer):
+    related_products = RelatedProductLinkSerializer(source='related_links', many=True, read_only=True)
+    
+    class Meta(ProductListSerializer.Meta):
+        fields = ProductListSerializer.Meta.fields + ['related_products']
 
 class ProductDetailResponseSerializer(serializers.Serializer):
     id = serializers.IntegerField()
@@ -96,13 +169,14 @@ class ProductDetailResponseSerializer(serializers.Serializer):
     discount_percentage = serializers.IntegerField()
     final_price = serializers.DecimalField(max_digits=10, decimal_places=2)
     stock_quantity = serializers.IntegerField()
+    available_quantity = serializers.IntegerField()
     in_stock = serializers.BooleanField()
     is_featured = serializers.BooleanField()
     images = ProductImageSerializer(many=True)
     reviews = ProductReviewSerializer(many=True)
     reviews_count = serializers.IntegerField()
     average_rating = serializers.FloatField()
-    related_products = RelatedProductSerializer(many=True)
+    related_products = RelatedProductLinkSerializer(many=True)
     created_at = serializers.DateTimeField()
     updated_at = serializers.DateTimeField()
 
@@ -130,6 +204,7 @@ class ProductCreateResponseSerializer(serializers.ModelSerializer):
     category = CategoryNestedSerializer(read_only=True)
     brand = BrandNestedSerializer(read_only=True)
     final_price = serializers.SerializerMethodField()
+    available_quantity = serializers.SerializerMethodField()
     in_stock = serializers.SerializerMethodField()
     
     class Meta:
@@ -137,49 +212,129 @@ class ProductCreateResponseSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'name', 'slug', 'description', 'category', 'brand',
             'price', 'discount_percentage', 'final_price', 'stock_quantity',
-            'in_stock', 'is_featured', 'created_at', 'updated_at'
+            'available_quantity', 'in_stock', 'is_featured', 'created_at', 'updated_at'
         ]
     
     def get_final_price(self, obj):
-        discount_decimal = Decimal(obj.discount_percentage) / Decimal(100)
-        return obj.price * (Decimal(1) - discount_decimal)
+        return obj.final_price
+    
+    def get_available_quantity(self, obj):
+        return obj.available_quantity
     
     def get_in_stock(self, obj):
-        return obj.stock_quantity > 0
+        return obj.available_quantity > 0
+
+class ProductImportRowSerializer(serializers.Serializer):
+    slug = serializers.SlugField(required=False, allow_blank=True, max_length=50)
+    name = serializers.CharField(max_length=200)
+    # Optional fields have no defaults: a missing one means "unchanged" for
+    # an update; the importer fills in the defaults for new products.
+    description = serializers.CharField(required=False, allow_blank=True)
+    category = serializers.CharField()
+    brand = serializers.CharField()
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal('0.01'))
+    discount_percentage = serializers.IntegerField(required=False, min_value=0, max_value=100)
+    stock_quantity = serializers.IntegerField(required=False, min_value=0)
+    is_featured = serializers.BooleanField(required=False)
+    is_active = serializers.BooleanField(required=False)
+
+class ProductBulkUpdateItemSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal('0.01'), required=False)
+    discount_percentage = serializers.IntegerField(min_value=0, max_value=100, required=False)
+    stock_quantity = serializers.IntegerField(min_value=0, required=False)
+    stock_delta = serializers.IntegerField(required=False)
+    
+    def validate(self, attrs):
+        if 'stock_quantity' in attrs and 'stock_delta' in attrs:
+            raise serializers.ValidationError("Send either stock_quantity or stock_delta, not both")
+        if len(attrs) == 1:
+            raise serializers.ValidationError("Nothing to update")
+        return attrs
+
+class ProductBulkUpdateSerializer(serializers.Serializer):
+    items = ProductBulkUpdateItemSerializer(many=True, allow_empty=False, max_length=10000)
+    
+    def validate_items(self, value):
+        ids = [item['id'] for item in value]
+        if len(ids) != len(set(ids)):
+            raise serializers.ValidationError("Each product id may appear only once")
+        return value
+
+class ProductExportQuerySerializer(serializers.Serializer):
+    # DRF reserves ``format`` for renderer selection, hence ``output``.
+    output = serializers.ChoiceField(choices=['ndjson', 'csv'], required=False, default='ndjson')
+    updated_since = serializers.DateTimeField(required=False)
+    include_inactive = serializers.BooleanField(required=False, default=False)
+    chunk_size = serializers.IntegerField(required=False, default=1000, min_value=1, max_value=10000)
+
+class ProductFilterSerializer(SparseFieldsQuerySerializer):
+    available_fields = ProductListSerializer.Meta.fields + ['related_products']
 
-class ProductFilterSerializer(serializers.Serializer):
     category = serializers.IntegerField(required=False)
     brand = serializers.IntegerField(required=False)
     min_price = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
     max_price = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
     is_featured = serializers.BooleanField(required=False)
+    min_rating = serializers.FloatField(required=False, min_value=0, max_value=5)
     search = serializers.CharField(required=False)
+    facets = serializers.BooleanField(required=False)
+    include_related = serializers.BooleanField(required=False)
+    ordering = serializers.ChoiceField(choices=list(PRODUCT_ORDERINGS), required=False)
     
-    def filter_products(self):
-        products = Product.objects.filter(is_active=True)
+    def filter_products(self, exclude=()):
+        # ``exclude`` names filters to leave out, which the facet counts use
+        # so each facet is counted against every other active filter.
+        products = Product.objects.active()
         
         category = self.validated_data.get('category')
-        if category:
-            products = products.filter(category_id=category)
+        if category and 'category' not in exclude:
+            products = products.filter(category__in=Category.objects.subtree(category))
         
         brand = self.validated_data.get('brand')
-        if brand:
+        if brand and 'brand' not in exclude:
             products = products.filter(brand_id=brand)
         
         min_price = self.validated_data.get('min_price')
-        if min_price:
-            products = products.filter(price__gte=min_price)
+        if min_price and 'price' not in exclude:
+            products = products.filter(final_price__gte=min_price)
         
         max_price = self.validated_data.get('max_price')
-        if max_price:
-            products = products.filter(price__lte=max_price)
+        if max_price and 'price' not in exclude:
+            products = products.filter(final_price__lte=max_price)
         
         is_featured = self.validated_data.get('is_featured')
-        if is_featured:
+        if is_featured and 'is_featured' not in exclude:
             products = products.filter(is_featured=True)
         
+        min_rating = self.validated_data.get('min_rating')
+        if min_rating:
+            products = products.filter(average_rating__gte=min_rating)
+        
         search = self.validated_data.get('search')
         if search:
-            products = products.filter(name__icontains=search) | products.filter(description__icontains=search)
+            products = get_search_backend().search(products, search)
         
-        return products
\ No newline at end of file
+        return products
+    
+    def get_ordering(self):
+        ordering = self.validated_data.get('ordering')
+        if ordering:
+            return PRODUCT_ORDERINGS[ordering]
+        if self.validated_data.get('search'):
+            return '-search_rank'
+        return None
+    
+    def get_fields_selection(self):
+        fields = super().get_fields_selection()
+        if fields is not None and self.validated_data.get('include_related') and 'related_products' not in fields:
+            fields = fields + ['related_products']
+        return fields
+
+class ProductDetailQuerySerializer(SparseFieldsQuerySerializer):
+    available_fields = [
+        'id', 'name', 'slug', 'description', 'category', 'brand', 'price',
+        'discount_percentage', 'final_price', 'stock_quantity', 'available_quantity',
+        'in_stock', 'is_featured', 'images', 'reviews', 'reviews_count', 'average_rating',
+        'rating_histogram', 'related_products', 'created_at', 'updated_at'
+    ]
\ No newline at end of file
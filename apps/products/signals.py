@@ -0,0 +1,126 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from apps.products.cache import invalidate_product_details
+from apps.products.models import Brand, Category, Product, ProductImage, RelatedProduct
+from apps.products.related import queue_refresh
+from apps.products.search import get_search_backend
+from apps.reviews.models import ProductReview
+
+
+def invalidate_on_commit(get_pks):
+    transaction.on_commit(lambda: invalidate_product_details(get_pks()))
+
+
+def get_dependent_pks(product_id):
+    # Product details embed their related products, so a product change also
+    # touches every product that lists it.
+    return list(
+        RelatedProduct.objects.filter(related_id=product_id).values_list('product_id', flat=True)
+    ) + [product_id]
+
+
+@receiver(post_save, sender=Product)
+def refresh_product(sender, instance, **kwargs):
+    # The related blocks around the product are rebuilt later, off the
+    # write path, by build_related_products --queued.
+    if getattr(settings, 'RELATED_PRODUCTS_QUEUE_ON_SAVE', True):
+        queue_refresh([instance.pk])
+    invalidate_on_commit(lambda: get_dependent_pks(instance.pk))
+
+
+@receiver(post_delete, sender=Product)
+def invalidate_product(sender, instance, **kwargs):
+    dependent_pks = get_dependent_pks(instance.pk)
+    invalidate_on_commit(lambda: dependent_pks)
+
+
+@receiver([post_save, post_delete], sender=ProductImage)
+def invalidate_product_image(sender, instance, **kwargs):
+    invalidate_on_commit(lambda: get_dependent_pks(instance.product_id))
+
+
+@receiver([post_save, post_delete], sender=ProductReview)
+def invalidate_product_review(sender, instance, **kwargs):
+    invalidate_on_commit(lambda: [instance.product_id])
+
+
+# Category and brand columns copied into product export rows and the
+# search index.
+COPIED_FIELDS = {Category: ('name', 'slug'), Brand: ('name',)}
+# Product columns the search index is built from.
+INDEXED_FIELDS = {'name', 'description', 'category', 'category_id', 'brand', 'brand_id', 'is_active'}
+
+
+@receiver(pre_save, sender=Category)
+@receiver(pre_save, sender=Brand)
+def remember_copied_fields(sender, instance, **kwargs):
+    fields = COPIED_FIELDS[sender]
+    instance._saved_values = sender.objects.filter(pk=instance.pk).values(*fields).first() if instance.pk else None
+
+
+def get_changed_fields(instance):
+    saved = getattr(instance, '_saved_values', None)
+    if saved is None:
+        return set()
+    return {field for field, value in saved.items() if getattr(instance, field) != value}
+
+
+@receiver(post_save, sender=Category)
+def touch_category_products(sender, instance, **kwargs):
+    # A rename changes every exported row of the category's products, so
+    # incremental feeds have to pick them up.
+    if get_changed_fields(instance):
+        Product.objects.filter(category_id=instance.pk).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Brand)
+def touch_brand_products(sender, instance, **kwargs):
+    if get_changed_fields(instance):
+        Product.objects.filter(brand_id=instance.pk).update(updated_at=timezone.now())
+
+
+def reindex_on_commit(get_pks):
+    transaction.on_commit(lambda: get_search_backend().index_products(get_pks()))
+
+
+@receiver(post_save, sender=Product)
+def reindex_product(sender, instance, update_fields=None, **kwargs):
+    # Counter writes (stock, ratings) save with update_fields and skip this.
+    if update_fields is None or INDEXED_FIELDS.intersection(update_fields):
+        reindex_on_commit(lambda: [instance.pk])
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: get_search_backend().remove_products([pk]))
+
+
+@receiver(post_save, sender=Category)
+def reindex_category(sender, instance, **kwargs):
+    # The search index stores category and brand names with each product.
+    if 'name' in get_changed_fields(instance):
+        reindex_on_commit(lambda: Product.objects.filter(category_id=instance.pk).values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Brand)
+def reindex_brand(sender, instance, **kwargs):
+    if 'name' in get_changed_fields(instance):
+        reindex_on_commit(lambda: Product.objects.filter(brand_id=instance.pk).values_list('pk', flat=True))
+
+
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_category(sender, instance, **kwargs):
+    # Every category below this one shows it in its breadcrumbs.
+    invalidate_on_commit(lambda: Product.objects.filter(
+        category__in=Category.objects.subtree(instance.pk)
+    ).values_list('pk', flat=True))
+
+
+@receiver([post_save, post_delete], sender=Brand)
+def invalidate_brand(sender, instance, **kwargs):
+    invalidate_on_commit(lambda: Product.objects.filter(brand_id=instance.pk).values_list('pk', flat=True))
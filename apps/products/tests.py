@@ -1,3 +1,1105 @@
-from django.test import TestCase
+import csv
+import json
+import os
+import tempfile
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import F
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from apps.inventory.models import StockMovement
+from apps.products import bulk, pricing
+from apps.products.cache import get_product_detail, get_stats as cache_stats, get_version
+from apps.products.checks import check_shared_cache
+from apps.orders.models import Order, OrderItem
+from apps.products.models import Brand, Category, Product, ProductImage, RelatedProduct, RelatedRefresh
+from apps.products.related import refresh_related_products
+from apps.products.search import get_search_backend
+from apps.products.serializers import (
+    ProductListSerializer, RelatedProductLinkSerializer, get_product_list_row_serializer,
+)
+from apps.reviews.models import ProductReview
+
+
+class ProductTestMixin:
+    def create_category(self, name='Electronics', parent=None):
+        return Category.objects.create(
+            name=name, slug=name.lower().replace(' ', '-'), description=name, parent=parent
+        )
+
+    def create_brand(self, name='Acme'):
+        return Brand.objects.create(name=name, logo='https://example.com/logo.png', description=name)
+
+    def create_product(self, name, category, brand, price='100.00', **kwargs):
+        kwargs.setdefault('slug', name.lower().replace(' ', '-'))
+        kwargs.setdefault('description', f'{name} description')
+        kwargs.setdefault('stock_quantity', 10)
+        return Product.objects.create(
+            name=name, category=category, brand=brand, price=Decimal(price), **kwargs
+        )
+
+
+class ProductListPaginationTests(ProductTestMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.category = self.create_category()
+        self.other_category = self.create_category('Books')
+        self.brand = self.create_brand()
+        now = timezone.now()
+        for i in range(25):
+            category = self.category if i % 2 else self.other_category
+            product = self.create_product(f'Product {i}', category, self.brand)
+            # Half of the catalog shares a created_at so ties on the sort key
+            # have to be broken by id.
+            Product.objects.filter(pk=product.pk).update(created_at=now - timedelta(minutes=i // 2))
+
+    def collect(self, url, params=None):
+        ids = []
+        response = self.client.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            ids.extend(row['id'] for row in response.data['results'])
+            if not response.data['next']:
+                return ids, response
+            response = self.client.get(response.data['next'])
+
+    def test_pages_cover_catalog_without_duplicates(self):
+        ids, _ = self.collect(reverse('products:list'), {'page_size': 4})
+
+        self.assertEqual(len(ids), 25)
+        self.assertEqual(len(set(ids)), 25)
+        expected = list(
+            Product.objects.order_by('-created_at', '-id').values_list('id', flat=True)
+        )
+        self.assertEqual(ids, expected)
+
+    def test_pages_are_stable_under_filters(self):
+        ids, _ = self.collect(
+            reverse('products:list'), {'page_size': 3, 'category': self.category.id}
+        )
+
+        expected = set(self.category.products.values_list('id', flat=True))
+        self.assertEqual(len(ids), len(expected))
+        self.assertEqual(set(ids), expected)
+
+    def test_previous_link_returns_prior_page(self):
+        url = reverse('products:list')
+        first = self.client.get(url, {'page_size': 5})
+        second = self.client.get(first.data['next'])
+        back = self.client.get(second.data['previous'])
+
+        self.assertIsNone(first.data['previous'])
+        self.assertEqual(
+            [row['id'] for row in back.data['results']],
+            [row['id'] for row in first.data['results']],
+        )
+
+    def test_invalid_cursor_returns_404(self):
+        response = self.client.get(reverse('products:list'), {'cursor': 'not-a-cursor'})
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_empty_catalog_returns_404(self):
+        response = self.client.get(reverse('products:list'), {'brand': 999})
+
+        self.assertEqual(response.status_code, 404)
+
+
+class ProductListQueryCountTests(ProductTestMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user('reviewer', password='pass')
+        self.other_user = User.objects.create_user('other', password='pass')
+        self.category = self.create_category()
+        self.brand = self.create_brand()
+
+    def create_catalog(self, size):
+        for i in range(size):
+            product = self.create_product(f'Product {i}', self.category, self.brand)
+            ProductImage.objects.create(product=product, image_url=f'https://example.com/{i}-a.png')
+            ProductImage.objects.create(
+                product=product, image_url=f'https://example.com/{i}-b.png', is_primary=True
+            )
+            ProductReview.objects.create(
+                product=product, user=self.user, rating=4, title='Great', comment='Great product'
+            )
+            ProductReview.objects.create(
+                product=product, user=self.other_user, rating=5, title='Superb', comment='Superb product'
+            )
+            Product.objects.apply_rating_change(product.pk, added=4)
+            Product.objects.apply_rating_change(product.pk, added=5)
+
+    def test_page_costs_constant_number_of_queries(self):
+        self.create_catalog(30)
+
+        with self.assertNumQueries(1):
+            small = self.client.get(reverse('products:list'), {'page_size': 5})
+        with self.assertNumQueries(1):
+            large = self.client.get(reverse('products:list'), {'page_size': 30})
+
+        self.assertEqual(len(small.data['results']), 5)
+        self.assertEqual(len(large.data['results']), 30)
+
+    def test_annotated_values_match_related_rows(self):
+        self.create_catalog(1)
+        bare = self.create_product('Bare', self.category, self.brand)
+
+        response = self.client.get(reverse('products:list'))
+        rows = {row['id']: row for row in response.data['results']}
+
+        reviewed = rows[Product.objects.exclude(pk=bare.pk).get().pk]
+        self.assertEqual(reviewed['reviews_count'], 2)
+        self.assertEqual(reviewed['average_rating'], 4.5)
+        self.assertEqual(reviewed['primary_image'], 'https://example.com/0-b.png')
+        self.assertEqual(reviewed['category']['id'], self.category.id)
+        self.assertEqual(rows[bare.pk]['reviews_count'], 0)
+        self.assertEqual(rows[bare.pk]['average_rating'], 0)
+        self.assertIsNone(rows[bare.pk]['primary_image'])
+
+
+class ProductSearchTests(ProductTestMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user('staff', password='pass')
+        self.client.force_authenticate(self.user)
+        self.category = self.create_category('Audio')
+        self.brand = self.create_brand('Sonic')
+        self.headphones = self.create_product(
+            'Wireless Headphones', self.category, self.brand, description='Over-ear, noise cancelling.'
+        )
+        self.speaker = self.create_product(
+            'Bookshelf Speaker', self.category, self.brand, description='Pairs well with wireless headphones.'
+        )
+        self.cable = self.create_product(
+            'Cable', self.create_category('Accessories'), self.create_brand('Generic'), description='Copper.'
+        )
+        get_search_backend().rebuild()
+
+    def search(self, query):
+        response = self.client.get(reverse('products:list'), {'search': query})
+        if response.status_code == 404:
+            return []
+        return [row['id'] for row in response.data['results']]
+
+    def test_results_are_ranked_by_relevance(self):
+        self.assertEqual(self.search('headphones'), [self.headphones.pk, self.speaker.pk])
+
+    def test_matches_brand_and_category_names(self):
+        self.assertEqual(set(self.search('sonic')), {self.headphones.pk, self.speaker.pk})
+        self.assertEqual(self.search('accessories'), [self.cable.pk])
+
+    def test_index_follows_category_and_brand_renames(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.brand.name = 'Acoustix'
+            self.brand.save()
+            self.category.name = 'Hi-Fi'
+            self.category.save()
+
+        self.assertEqual(self.search('sonic'), [])
+        self.assertEqual(set(self.search('acoustix')), {self.headphones.pk, self.speaker.pk})
+        self.assertEqual(set(self.search('hi fi')), {self.headphones.pk, self.speaker.pk})
+
+    def test_query_syntax_is_not_interpreted(self):
+        self.assertEqual(self.search('"cable" OR NEAR('), [])
+        self.assertEqual(self.search('cab'), [self.cable.pk])
+
+    def test_index_follows_product_writes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                reverse('products:patch', args=[self.cable.pk]), {'name': 'Optical Cable'}
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.search('optical'), [self.cable.pk])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('products:create'), {
+                'name': 'Optical Mouse', 'description': 'Two buttons.', 'price': '15.00',
+                'stock_quantity': 3, 'category': self.category.pk, 'brand': self.brand.pk,
+            }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(set(self.search('optical')), {self.cable.pk, response.data['id']})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(reverse('products:delete', args=[self.cable.pk]))
+        self.assertEqual(self.search('optical'), [response.data['id']])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.get(pk=response.data['id']).delete()
+        self.assertEqual(self.search('optical'), [])
+
+    def test_admin_reactivation_returns_the_product_to_search(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(reverse('products:delete', args=[self.cable.pk]))
+        self.assertEqual(self.search('cable'), [])
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pass'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('admin:products_product_changelist'), {
+                'form-TOTAL_FORMS': 1, 'form-INITIAL_FORMS': 1, 'form-0-id': self.cable.pk,
+                'form-0-price': '100.00', 'form-0-stock_quantity': 10, 'initial-form-0-stock_quantity': 10,
+                'form-0-is_active': 'on', '_save': 'Save',
+            })
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.search('cable'), [self.cable.pk])
+
+    def test_unrelated_writes_leave_the_index_alone(self):
+        with mock.patch.object(type(get_search_backend()), 'index_products') as index_products:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.category.description = 'Speakers and headphones.'
+                self.category.save()
+                self.brand.website = 'https://sonic.example.com'
+                self.brand.save()
+                self.headphones.stock_quantity = 4
+                self.headphones.save(update_fields=['stock_quantity'])
+
+        index_products.assert_not_called()
+
+
+class ProductFacetTests(ProductTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.phones = self.create_category('Phones')
+        self.laptops = self.create_category('Laptops')
+        self.acme = self.create_brand('Acme')
+        self.globex = self.create_brand('Globex')
+        self.create_product('Phone A', self.phones, self.acme, price='20.00', is_featured=True)
+        self.create_product('Phone B', self.phones, self.globex, price='80.00')
+        self.create_product('Laptop A', self.laptops, self.acme, price='900.00')
+
+    def test_facets_are_counted_against_other_filters(self):
+        response = self.client.get(
+            reverse('products:list'), {'facets': 'true', 'category': self.phones.id}
+        )
+        facets = response.data['facets']
+
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertEqual(facets['category'], [
+            {'id': self.phones.id, 'name': 'Phones', 'count': 2},
+            {'id': self.laptops.id, 'name': 'Laptops', 'count': 1},
+        ])
+        self.assertEqual(
+            {row['id']: row['count'] for row in facets['brand']},
+            {self.acme.id: 1, self.globex.id: 1},
+        )
+        self.assertEqual(
+            {row['range']: row['count'] for row in facets['price'] if row['count']},
+            {'0-25': 1, '50-100': 1},
+        )
+        self.assertEqual(facets['is_featured'], {'true': 1, 'false': 1})
+
+    def test_facets_are_cached_per_filter_set(self):
+        url = reverse('products:list')
+
+        with self.assertNumQueries(5):
+            self.client.get(url, {'facets': 'true', 'brand': self.acme.id})
+        with self.assertNumQueries(1):
+            self.client.get(url, {'facets': 'true', 'brand': self.acme.id})
+
+    def test_facets_are_opt_in(self):
+        response = self.client.get(reverse('products:list'))
+
+        self.assertNotIn('facets', response.data)
+
+
+class ProductDetailCacheTests(ProductTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.category = self.create_category()
+        self.brand = self.create_brand()
+        self.product = self.create_product('Phone', self.category, self.brand)
+        self.url = reverse('products:detail', args=[self.product.pk])
+
+    def test_second_request_is_served_from_cache(self):
+        first = self.client.get(self.url)
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(cache_stats(), {'hits': 1, 'misses': 1, 'coalesced': 0})
+
+    def test_missing_product_is_cached_as_404(self):
+        url = reverse('products:detail', args=[999])
+        self.assertEqual(self.client.get(url).status_code, 404)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_related_writes_invalidate_the_payload(self):
+        self.client.get(self.url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ProductImage.objects.create(product=self.product, image_url='https://example.com/a.png')
+        self.assertEqual(len(self.client.get(self.url).data['images']), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.brand.name = 'Renamed'
+            self.brand.save()
+        self.assertEqual(self.client.get(self.url).data['brand']['name'], 'Renamed')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            parent = self.create_category('Devices')
+            self.category.parent = parent
+            self.category.save()
+        self.assertEqual(self.client.get(self.url).data['category']['parent'], 'Devices')
+
+        user = User.objects.create_user('reviewer', password='pass')
+        with self.captureOnCommitCallbacks(execute=True):
+            ProductReview.objects.create(
+                product=self.product, user=user, rating=5, title='Great', comment='Great phone'
+            )
+        self.assertEqual(len(self.client.get(self.url).data['reviews']), 1)
+
+    def test_concurrent_miss_waits_for_the_rebuild(self):
+        version = get_version(self.product.pk)
+        cache.add(f'product-detail-lock:{self.product.pk}:{version}:full', 1, 5)
+        rebuild = threading.Timer(0.2, cache.set, args=(
+            f'product-detail:{self.product.pk}:{version}:full', {'id': self.product.pk}, 60
+        ))
+        rebuild.start()
+
+        built = []
+        data = get_product_detail(self.product.pk, built.append)
+        rebuild.join()
+
+        self.assertEqual(data, {'id': self.product.pk})
+        self.assertEqual(built, [])
+        self.assertEqual(cache_stats()['coalesced'], 1)
+
+    def test_stats_endpoint_requires_staff(self):
+        self.assertEqual(self.client.get(reverse('products:cache-stats')).status_code, 403)
+
+        staff = User.objects.create_user('staff', password='pass', is_staff=True)
+        self.client.force_authenticate(staff)
+        response = self.client.get(reverse('products:cache-stats'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data), {'hits', 'misses', 'coalesced'})
+
+
+class RelatedProductTests(ProductTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.phones = self.create_category('Phones')
+        self.cases = self.create_category('Cases')
+        self.acme = self.create_brand('Acme')
+        self.globex = self.create_brand('Globex')
+        self.phone = self.create_product('Phone', self.phones, self.acme, price='500.00')
+        self.near = self.create_product('Phone Mini', self.phones, self.globex, price='450.00')
+        self.far = self.create_product('Phone Max', self.phones, self.globex, price='1500.00')
+        self.case = self.create_product('Case', self.cases, self.globex, price='20.00')
+        self.unrelated = self.create_product('Charger', self.cases, self.globex, price='30.00')
+
+    def related_ids(self, product):
+        return list(
+            RelatedProduct.objects.filter(product=product).order_by('rank').values_list('related_id', flat=True)
+        )
+
+    def test_neighbours_are_ranked_by_category_price_and_co_purchases(self):
+        user = User.objects.create_user('buyer', password='pass')
+        for _ in range(5):
+            order = Order.objects.create(
+                user=user, order_number=f'ORD-{Order.objects.count()}', total_amount='520.00',
+                shipping_address='1 Main Street', phone='+998901234567',
+            )
+            OrderItem.objects.create(order=order, product=self.phone, quantity=1, price='500.00')
+            OrderItem.objects.create(order=order, product=self.case, quantity=1, price='20.00')
+
+        call_command('build_related_products', stdout=StringIO())
+
+        self.assertEqual(self.related_ids(self.phone), [self.near.pk, self.case.pk, self.far.pk])
+        self.assertNotIn(self.unrelated.pk, self.related_ids(self.phone))
+
+    def test_detail_reads_related_block_in_one_query(self):
+        refresh_related_products(Product.objects.values_list('pk', flat=True))
+        ProductImage.objects.create(product=self.near, image_url='https://example.com/mini.png', is_primary=True)
+
+        with self.assertNumQueries(1):
+            data = RelatedProductLinkSerializer(
+                RelatedProduct.objects.filter(product=self.phone).for_display(), many=True
+            ).data
+
+        response = self.client.get(reverse('products:detail', args=[self.phone.pk]))
+        self.assertEqual(response.data['related_products'], data)
+        self.assertEqual(data[0]['primary_image'], 'https://example.com/mini.png')
+
+    def test_saving_a_product_queues_its_neighbourhood(self):
+        refresh_related_products(Product.objects.values_list('pk', flat=True))
+        version = get_version(self.phone.pk)
+
+        self.far.is_active = False
+        self.far.save()
+        self.assertIn(self.far.pk, self.related_ids(self.phone))
+
+        call_command('build_related_products', '--queued', stdout=StringIO())
+
+        self.assertNotIn(self.far.pk, self.related_ids(self.phone))
+        self.assertEqual(self.related_ids(self.far), [])
+        self.assertNotEqual(get_version(self.phone.pk), version)
+        self.assertFalse(RelatedRefresh.objects.exists())
+
+    def test_list_can_include_related_with_one_extra_query(self):
+        refresh_related_products(Product.objects.values_list('pk', flat=True))
+
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('products:list'), {'include_related': 'true'})
+
+        rows = {row['id']: row for row in response.data['results']}
+        self.assertEqual(
+            [related['id'] for related in rows[self.phone.pk]['related_products']],
+            self.related_ids(self.phone),
+        )
+
+
+class CategoryTreeTests(ProductTestMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.electronics = self.create_category('Electronics')
+        self.phones = self.create_category('Phones', parent=self.electronics)
+        self.smartphones = self.create_category('Smartphones', parent=self.phones)
+        self.books = self.create_category('Books')
+        self.brand = self.create_brand()
+
+    def test_paths_follow_the_tree(self):
+        self.smartphones.refresh_from_db()
+
+        self.assertEqual(self.smartphones.depth, 2)
+        self.assertEqual(self.smartphones.ancestor_ids, [self.electronics.pk, self.phones.pk])
+        self.assertTrue(self.smartphones.path.startswith(self.phones.path))
+
+    def test_reparenting_moves_the_whole_subtree(self):
+        self.phones.parent = self.books
+        self.phones.save()
+        self.smartphones.refresh_from_db()
+
+        self.assertEqual(self.smartphones.ancestor_ids, [self.books.pk, self.phones.pk])
+        self.assertEqual(self.smartphones.depth, 2)
+        self.assertEqual(
+            set(Category.objects.subtree(self.electronics.pk).values_list('pk', flat=True)),
+            {self.electronics.pk},
+        )
+
+    def test_cannot_move_a_category_under_its_descendant(self):
+        self.electronics.parent = self.smartphones
+
+        with self.assertRaises(ValidationError):
+            self.electronics.full_clean()
+
+    def test_category_filter_includes_descendants_in_one_query(self):
+        top = self.create_product('TV', self.electronics, self.brand)
+        deep = self.create_product('Phone', self.smartphones, self.brand)
+        self.create_product('Novel', self.books, self.brand)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('products:list'), {'category': self.electronics.pk})
+
+        self.assertEqual({row['id'] for row in response.data['results']}, {top.pk, deep.pk})
+
+    def test_detail_includes_breadcrumbs(self):
+        product = self.create_product('Phone', self.smartphones, self.brand)
+        cache.clear()
+
+        response = self.client.get(reverse('products:detail', args=[product.pk]))
+
+        self.assertEqual(
+            [crumb['name'] for crumb in response.data['category']['breadcrumbs']],
+            ['Electronics', 'Phones', 'Smartphones'],
+        )
+
+
+class ProductImportTests(ProductTestMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.staff = User.objects.create_user('staff', password='pass', is_staff=True)
+        self.category = self.create_category('Phones')
+        self.brand = self.create_brand('Acme')
+        self.existing = self.create_product('Phone', self.category, self.brand, slug='phone')
+
+    def test_command_streams_csv_in_batches(self):
+        lines = ['name,description,category,brand,price,stock_quantity,discount_percentage']
+        lines += [f'Phone,Model {i},phones,acme,{100 + i}.00,{i},5' for i in range(7)]
+        lines.append('Broken,Bad row,missing-category,acme,-1,1,0')
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as feed:
+            feed.write('\n'.join(lines) + '\n')
+        self.addCleanup(os.remove, feed.name)
+
+        stdout, stderr = StringIO(), StringIO()
+        # Two lookup maps, then per batch: two slug checks, the insert and
+        # its ledger rows inside a savepoint and the search index refresh.
+        with self.assertNumQueries(2 + 3 * 8):
+            call_command('import_products', feed.name, '--batch-size', '3', stdout=stdout, stderr=stderr)
+
+        self.assertIn('7 created, 0 updated, 1 rejected', stdout.getvalue())
+        self.assertIn('Row 8', stderr.getvalue())
+        slugs = list(Product.objects.filter(description__startswith='Model').values_list('slug', flat=True))
+        self.assertEqual(len(slugs), 7)
+        self.assertEqual(len(set(slugs) | {'phone'}), 8)
+        self.assertEqual(get_search_backend().search(Product.objects.all(), 'model').count(), 7)
+
+    def test_endpoint_streams_jsonl_and_updates_by_slug(self):
+        self.client.force_authenticate(self.staff)
+        body = '\n'.join([
+            json.dumps({'slug': 'phone', 'name': 'Phone 2', 'category': str(self.category.pk),
+                        'brand': 'ACME', 'price': '199.00', 'stock_quantity': 4}),
+            json.dumps({'name': 'Tablet', 'category': 'phones', 'brand': 'acme', 'price': 300}),
+            '{not json',
+        ])
+
+        response = self.client.post(
+            reverse('products:bulk-import') + '?type=jsonl', body, content_type='application/x-ndjson'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['created'], response.data['updated']), (1, 1))
+        self.assertEqual([error['row'] for error in response.data['errors']], [3])
+        self.existing.refresh_from_db()
+        self.assertEqual((self.existing.name, self.existing.stock_quantity), ('Phone 2', 4))
+        self.assertTrue(Product.objects.filter(slug='tablet').exists())
+
+    def test_update_keeps_fields_missing_from_the_row(self):
+        Product.objects.filter(pk=self.existing.pk).update(is_active=False, is_featured=True, discount_percentage=20)
+        self.client.force_authenticate(self.staff)
+        body = '\n'.join([
+            json.dumps({'slug': 'phone', 'name': 'Phone 2', 'category': 'phones', 'brand': 'acme', 'price': 199}),
+            json.dumps({'name': 'Tablet', 'category': 'phones', 'brand': 'acme', 'price': 300}),
+        ])
+
+        response = self.client.post(
+            reverse('products:bulk-import') + '?type=jsonl', body, content_type='application/x-ndjson'
+        )
+
+        self.assertEqual((response.data['created'], response.data['updated']), (1, 1))
+        self.existing.refresh_from_db()
+        self.assertEqual((self.existing.is_active, self.existing.is_featured), (False, True))
+        self.assertEqual(
+            (self.existing.description, self.existing.discount_percentage, self.existing.stock_quantity),
+            ('Phone description', 20, 10),
+        )
+        self.assertEqual(self.existing.final_price, Decimal('159.20'))
+        self.assertFalse(StockMovement.objects.filter(kind=StockMovement.IMPORT, product=self.existing).exists())
+        tablet = Product.objects.get(slug='tablet')
+        self.assertEqual((tablet.is_active, tablet.is_featured), (True, False))
+        self.assertEqual((tablet.description, tablet.discount_percentage, tablet.stock_quantity), ('', 0, 0))
+
+    def test_last_row_for_a_slug_in_a_batch_wins(self):
+        self.client.force_authenticate(self.staff)
+        row = {'slug': 'phone', 'name': 'Phone', 'category': 'phones', 'brand': 'acme', 'price': 100}
+        body = '\n'.join([
+            json.dumps({**row, 'stock_quantity': 4}),
+            json.dumps({**row, 'stock_quantity': 7, 'name': 'Phone 2'}),
+        ])
+
+        response = self.client.post(
+            reverse('products:bulk-import') + '?type=jsonl', body, content_type='application/x-ndjson'
+        )
+
+        self.assertEqual((response.data['created'], response.data['updated']), (0, 1))
+        self.existing.refresh_from_db()
+        self.assertEqual((self.existing.name, self.existing.stock_quantity), ('Phone 2', 7))
+        self.assertEqual(
+            list(StockMovement.objects.filter(kind=StockMovement.IMPORT).values_list('quantity', flat=True)), [-3]
+        )
+
+    def test_endpoint_requires_staff(self):
+        response = self.client.post(reverse('products:bulk-import'), '', content_type='application/x-ndjson')
+
+        self.assertEqual(response.status_code, 403)
+
+
+class ProductBulkUpdateTests(ProductTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('staff', password='pass', is_staff=True))
+        category = self.create_category()
+        brand = self.create_brand()
+        self.products = [
+            self.create_product(f'Product {i}', category, brand, stock_quantity=5) for i in range(6)
+        ]
+
+    def post(self, items):
+        return self.client.post(reverse('products:bulk-update'), {'items': items}, format='json')
+
+    def test_updates_are_applied_in_constant_queries_per_chunk(self):
+        items = [
+            {'id': product.pk, 'price': '9.99', 'stock_delta': -2} for product in self.products
+        ] + [{'id': 999, 'stock_quantity': 1}]
+
+        # Savepoint pair around one stock read, the conditional stock
+        # UPDATE, one UPDATE for the other columns and one ledger insert.
+        with self.assertNumQueries(6):
+            response = self.post(items)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['updated'], [product.pk for product in self.products])
+        self.assertEqual(response.data['not_found'], [999])
+        self.assertEqual(
+            set(Product.objects.values_list('price', 'stock_quantity')), {(Decimal('9.99'), 3)}
+        )
+
+    def test_mixed_fields_and_rejected_deltas(self):
+        first, second, third = self.products[:3]
+
+        response = self.post([
+            {'id': first.pk, 'discount_percentage': 25},
+            {'id': second.pk, 'stock_quantity': 40},
+            {'id': third.pk, 'stock_delta': -6},
+        ])
+
+        self.assertEqual(response.data['updated'], [first.pk, second.pk])
+        self.assertIn(third.pk, response.data['errors'])
+        first.refresh_from_db()
+        second.refresh_from_db()
+        third.refresh_from_db()
+        self.assertEqual((first.discount_percentage, first.stock_quantity), (25, 5))
+        self.assertEqual(second.stock_quantity, 40)
+        self.assertEqual(third.stock_quantity, 5)
+
+    def test_delta_left_out_by_a_concurrent_sale_is_rejected(self):
+        first, second = self.products[:2]
+        compute = bulk.compute_final_prices
+
+        def sell_then_compute(*args):
+            # A checkout commits between the stock read and the UPDATE.
+            Product.objects.filter(pk=second.pk).update(stock_quantity=F('stock_quantity') - 4)
+            return compute(*args)
+
+        with mock.patch.object(bulk, 'compute_final_prices', sell_then_compute):
+            response = self.post([
+                {'id': first.pk, 'price': '9.99', 'stock_delta': -3},
+                {'id': second.pk, 'price': '9.99', 'stock_delta': -3},
+            ])
+
+        self.assertEqual(response.data['updated'], [first.pk])
+        self.assertEqual(response.data['errors'], {second.pk: 'Only 1 items in stock'})
+        self.assertEqual(
+            list(Product.objects.filter(pk__in=[first.pk, second.pk]).order_by('pk').values_list('price', 'stock_quantity')),
+            [(Decimal('9.99'), 2), (Decimal('100.00'), 1)],
+        )
+        self.assertEqual(
+            list(StockMovement.objects.filter(reference='bulk update').values_list('product_id', 'quantity')),
+            [(first.pk, -3)],
+        )
+
+    def test_detail_cache_is_invalidated_once_for_the_batch(self):
+        url = reverse('products:detail', args=[self.products[0].pk])
+        self.client.get(url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post([{'id': self.products[0].pk, 'price': '1.50'}])
+
+        self.assertEqual(self.client.get(url).data['price'], '1.50')
+
+    def test_invalid_payloads_are_rejected(self):
+        self.assertEqual(self.post([{'id': 1}]).status_code, 400)
+        self.assertEqual(self.post([{'id': 1, 'stock_quantity': 1, 'stock_delta': 1}]).status_code, 400)
+        self.assertEqual(self.post([{'id': 1, 'price': '1'}, {'id': 1, 'price': '2'}]).status_code, 400)
+
+
+class SparseFieldsetTests(ProductTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.product = self.create_product('Phone', self.create_category(), self.create_brand())
+        ProductImage.objects.create(product=self.product, image_url='https://example.com/p.png', is_primary=True)
+
+    def test_grid_view_prunes_output_and_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('products:list'), {'view': 'grid'})
+
+        row = response.data['results'][0]
+        self.assertEqual(list(row), ['id', 'name', 'final_price', 'primary_image', 'average_rating'])
+        self.assertEqual(row['primary_image'], 'https://example.com/p.png')
+        self.assertEqual(len(queries), 1)
+        sql = queries[0]['sql']
+        self.assertNotIn('description', sql)
+        self.assertNotIn('products_category', sql)
+
+    def test_fields_parameter_selects_list_fields(self):
+        response = self.client.get(reverse('products:list'), {'fields': 'id,brand,in_stock'})
+
+        self.assertEqual(list(response.data['results'][0]), ['id', 'brand', 'in_stock'])
+
+    def test_unknown_fields_are_rejected(self):
+        response = self.client.get(reverse('products:list'), {'fields': 'id,secret'})
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_detail_skips_unrequested_sections(self):
+        url = reverse('products:detail', args=[self.product.pk])
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url, {'fields': 'name,final_price'})
+
+        self.assertEqual(response.data, {'name': 'Phone', 'final_price': '100.00'})
+        self.assertIn('images', self.client.get(url).data)
+
+
+class ConditionalGetTests(ProductTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.product = self.create_product('Phone', self.create_category(), self.create_brand())
+        self.list_url = reverse('products:list')
+        self.detail_url = reverse('products:detail', args=[self.product.pk])
+
+    def test_list_revalidates_without_queries(self):
+        response = self.client.get(self.list_url)
+        etag = response['ETag']
+        self.assertTrue(etag.startswith('"'))
+        self.assertIn('Last-Modified', response)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        response = self.client.get(self.list_url, {'brand': self.product.brand_id}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_product_write_changes_list_and_detail_validators(self):
+        list_etag = self.client.get(self.list_url)['ETag']
+        detail_etag = self.client.get(self.detail_url)['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.stock_quantity = 0
+            self.product.save(update_fields=['stock_quantity'])
+
+        response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=list_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.data['results'][0]['in_stock'])
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=detail_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['stock_quantity'], 0)
+
+    def test_detail_honours_if_modified_since(self):
+        last_modified = self.client.get(self.detail_url)['Last-Modified']
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.detail_url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+        response = self.client.get(self.detail_url, HTTP_IF_MODIFIED_SINCE='Mon, 01 Jan 2024 00:00:00 GMT')
+        self.assertEqual(response.status_code, 200)
+
+
+class SharedCacheCheckTests(SimpleTestCase):
+    def test_process_local_cache_is_reported(self):
+        self.assertEqual([warning.id for warning in check_shared_cache(None)], ['products.W001'])
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'cache_table',
+    }})
+    def test_shared_cache_passes(self):
+        self.assertEqual(check_shared_cache(None), [])
+
+
+class ProductExportTests(ProductTestMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('staff', password='pass', is_staff=True))
+        category, brand = self.create_category('Phones'), self.create_brand('Acme')
+        self.products = [self.create_product(f'Phone {i}', category, brand) for i in range(5)]
+        for product in self.products:
+            ProductImage.objects.create(product=product, image_url=f'https://example.com/{product.pk}.png')
+        self.create_product('Hidden', category, brand, is_active=False)
+
+    def read(self, response):
+        return b''.join(response.streaming_content).decode()
+
+    def test_ndjson_streams_in_chunks_with_batched_images(self):
+        response = self.client.get(reverse('products:export'), {'chunk_size': 2})
+
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        # One product cursor plus one image prefetch per chunk of two.
+        with self.assertNumQueries(1 + 3):
+            body = self.read(response)
+
+        records = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([record['id'] for record in records], [product.pk for product in self.products])
+        self.assertEqual(records[0]['images'], [f'https://example.com/{self.products[0].pk}.png'])
+        self.assertEqual((records[0]['category'], records[0]['brand']), ('phones', 'Acme'))
+
+    def test_csv_supports_incremental_feeds(self):
+        since = timezone.now()
+        Product.objects.filter(pk=self.products[1].pk).update(updated_at=since + timedelta(minutes=1))
+        Product.objects.filter(is_active=False).update(updated_at=since + timedelta(minutes=1))
+
+        response = self.client.get(reverse('products:export'), {
+            'output': 'csv', 'updated_since': since.isoformat(), 'include_inactive': 'true',
+        })
+
+        rows = list(csv.DictReader(StringIO(self.read(response))))
+        self.assertEqual([row['name'] for row in rows], ['Phone 1', 'Hidden'])
+        self.assertEqual(rows[1]['is_active'], 'False')
+
+    def test_incremental_feeds_carry_renames_and_deactivations(self):
+        since = timezone.now()
+        category = self.products[0].category
+        category.description = 'Not exported'
+        category.save()
+        self.client.delete(reverse('products:delete', args=[self.products[3].pk]))
+
+        response = self.client.get(reverse('products:export'), {'updated_since': since.isoformat()})
+        records = [json.loads(line) for line in self.read(response).splitlines()]
+        self.assertEqual([(record['id'], record['is_active']) for record in records], [(self.products[3].pk, False)])
+
+        since = timezone.now()
+        category.slug = 'mobiles'
+        category.save()
+        brand = self.products[0].brand
+        brand.name = 'Acme Corp'
+        brand.save()
+
+        response = self.client.get(reverse('products:export'), {'updated_since': since.isoformat()})
+        records = [json.loads(line) for line in self.read(response).splitlines()]
+        self.assertEqual(len(records), 6)
+        self.assertEqual({(record['category'], record['brand']) for record in records}, {('mobiles', 'Acme Corp')})
+
+    def test_image_changes_reach_incremental_feeds(self):
+        since = timezone.now()
+        image = ProductImage.objects.create(product=self.products[2], image_url='https://example.com/new.png')
+
+        response = self.client.get(reverse('products:export'), {'updated_since': since.isoformat()})
+        records = [json.loads(line) for line in self.read(response).splitlines()]
+        self.assertEqual([record['id'] for record in records], [self.products[2].pk])
+        self.assertIn('https://example.com/new.png', records[0]['images'])
+
+        since = timezone.now()
+        image.delete()
+        response = self.client.get(reverse('products:export'), {'updated_since': since.isoformat()})
+        self.assertEqual([json.loads(line)['id'] for line in self.read(response).splitlines()], [self.products[2].pk])
+
+    def test_command_output_round_trips_through_import(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as feed:
+            pass
+        self.addCleanup(os.remove, feed.name)
+
+        call_command('export_products', feed.name, stdout=StringIO())
+        Product.objects.filter(is_active=True).update(stock_quantity=0)
+        call_command('import_products', feed.name, stdout=StringIO())
+
+        self.assertEqual(Product.objects.filter(is_active=True).count(), 5)
+        self.assertFalse(Product.objects.filter(is_active=True, stock_quantity=0).exists())
+
+    def test_endpoint_requires_staff(self):
+        response = APIClient().get(reverse('products:export'))
+
+        self.assertEqual(response.status_code, 403)
+
+
+class FinalPriceTests(ProductTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('staff', password='pass', is_staff=True))
+        self.category, self.brand = self.create_category(), self.create_brand()
+
+    def test_save_keeps_final_price_in_sync(self):
+        product = self.create_product('Phone', self.category, self.brand, price='19.99', discount_percentage=15)
+        self.assertEqual(product.final_price, Decimal('16.99'))
+
+        product.discount_percentage = 50
+        product.save(update_fields=['discount_percentage'])
+        product.refresh_from_db()
+        self.assertEqual(product.final_price, Decimal('10.00'))
+
+    def test_bulk_writers_keep_final_price_in_sync(self):
+        product = self.create_product('Phone', self.category, self.brand, price='200.00')
+
+        self.client.post(reverse('products:bulk-update'), {'items': [
+            {'id': product.pk, 'discount_percentage': 25},
+        ]}, format='json')
+        product.refresh_from_db()
+        self.assertEqual(product.final_price, Decimal('150.00'))
+
+        body = json.dumps({'slug': product.slug, 'name': 'Phone', 'category': self.category.slug,
+                           'brand': self.brand.name, 'price': '80.00', 'discount_percentage': 10})
+        self.client.post(reverse('products:bulk-import') + '?type=jsonl', body, content_type='application/x-ndjson')
+        product.refresh_from_db()
+        self.assertEqual(product.final_price, Decimal('72.00'))
+
+    def test_price_filters_and_facets_use_selling_price(self):
+        discounted = self.create_product('Discounted', self.category, self.brand, price='120.00', discount_percentage=50)
+        self.create_product('Full', self.category, self.brand, price='90.00')
+
+        response = self.client.get(reverse('products:list'), {'max_price': '80.00', 'facets': 'true'})
+
+        self.assertEqual([row['id'] for row in response.data['results']], [discounted.pk])
+        buckets = {bucket['range']: bucket['count'] for bucket in response.data['facets']['price']}
+        self.assertEqual(buckets['50-100'], 2)
+        self.assertEqual(buckets['100-250'], 0)
+
+
+class ProductOrderingTests(ProductTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        category, brand = self.create_category(), self.create_brand()
+        self.cheap = self.create_product('Cheap', category, brand, price='10.00', stock_quantity=50)
+        self.mid = self.create_product('Mid', category, brand, price='200.00', discount_percentage=80)
+        self.dear = self.create_product('Dear', category, brand, price='90.00', discount_percentage=10)
+        Product.objects.filter(pk=self.dear.pk).update(reviews_count=7, average_rating=4.5)
+
+    def get_ids(self, ordering, **params):
+        response = self.client.get(reverse('products:list'), {'ordering': ordering, **params})
+        return [row['id'] for row in response.data['results']]
+
+    def test_orderings_sort_on_their_keys(self):
+        self.assertEqual(self.get_ids('price'), [self.cheap.pk, self.mid.pk, self.dear.pk])
+        self.assertEqual(self.get_ids('-price'), [self.dear.pk, self.mid.pk, self.cheap.pk])
+        self.assertEqual(self.get_ids('discount'), [self.mid.pk, self.dear.pk, self.cheap.pk])
+        self.assertEqual(self.get_ids('popularity')[0], self.dear.pk)
+        self.assertEqual(self.get_ids('rating')[0], self.dear.pk)
+        self.assertEqual(self.get_ids('stock')[0], self.cheap.pk)
+
+    def test_cursor_pages_follow_the_ordering(self):
+        first = self.client.get(reverse('products:list'), {'ordering': 'price', 'page_size': 2})
+        second = self.client.get(first.data['next'])
+
+        self.assertEqual([row['id'] for row in second.data['results']], [self.dear.pk])
+        self.assertEqual(self.client.get(reverse('products:list'), {'ordering': 'cheapest'}).status_code, 400)
+
+    def test_no_supported_ordering_sorts_with_a_temp_btree(self):
+        for ordering in ['newest', 'oldest', 'price', '-price', 'discount', 'rating', 'popularity', 'stock']:
+            with self.subTest(ordering=ordering):
+                with CaptureQueriesContext(connection) as queries:
+                    self.client.get(reverse('products:list'), {'ordering': ordering})
+                with connection.cursor() as cursor:
+                    cursor.execute('EXPLAIN QUERY PLAN ' + queries[0]['sql'])
+                    plan = ' | '.join(row[-1] for row in cursor.fetchall())
+                self.assertNotIn('TEMP B-TREE', plan)
+                self.assertIn('USING INDEX product_active_', plan)
+
+
+class PrimaryImageTests(ProductTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.product = self.create_product('Phone', self.create_category(), self.create_brand())
+
+    def add_image(self, name, **kwargs):
+        return ProductImage.objects.create(product=self.product, image_url=f'https://example.com/{name}.png', **kwargs)
+
+    def assertPrimary(self, image):
+        self.product.refresh_from_db()
+        self.assertEqual(list(self.product.images.filter(is_primary=True)), [image])
+        self.assertEqual(self.product.primary_image_url, image.image_url)
+
+    def test_exactly_one_primary_is_kept(self):
+        first = self.add_image('first')
+        self.assertPrimary(first)
+
+        second = self.add_image('second', is_primary=True)
+        self.assertPrimary(second)
+
+        second.delete()
+        self.assertPrimary(first)
+
+        first.delete()
+        self.product.refresh_from_db()
+        self.assertIsNone(self.product.primary_image_url)
+
+    def test_list_and_related_read_the_stored_url(self):
+        self.add_image('front', is_primary=True)
+        other = self.create_product('Tablet', self.product.category, self.product.brand)
+        refresh_related_products([other.pk])
+
+        # The page plus the related prefetch; neither reads the image table.
+        with self.assertNumQueries(2):
+            response = APIClient().get(reverse('products:list'), {'include_related': 'true', 'fields': 'id,primary_image'})
+
+        rows = {row['id']: row for row in response.data['results']}
+        self.assertEqual(rows[self.product.pk]['primary_image'], 'https://example.com/front.png')
+        self.assertEqual(rows[other.pk]['related_products'][0]['primary_image'], 'https://example.com/front.png')
+
+    def test_admin_inline_rejects_two_primaries(self):
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'pass')
+        self.client.force_login(admin)
+        url = reverse('admin:products_product_change', args=[self.product.pk])
+        data = {
+            'name': 'Phone', 'slug': 'phone', 'description': 'Phone', 'category': self.product.category_id,
+            'brand': self.product.brand_id, 'price': '100.00', 'discount_percentage': 0, 'stock_quantity': 10,
+            'is_active': 'on',
+            'images-TOTAL_FORMS': 2, 'images-INITIAL_FORMS': 0,
+            'images-0-image_url': 'https://example.com/a.png', 'images-0-is_primary': 'on', 'images-0-order': 0,
+            'images-1-image_url': 'https://example.com/b.png', 'images-1-is_primary': 'on', 'images-1-order': 1,
+        }
+
+        response = self.client.post(url, data)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Only one image can be marked as primary.')
+        self.assertFalse(self.product.images.exists())
+
+        data['images-1-is_primary'] = ''
+        response = self.client.post(url, data)
+        self.assertEqual(response.status_code, 302)
+        self.assertPrimary(self.product.images.get(image_url='https://example.com/a.png'))
+
+
+class CompiledProductListTests(ProductTestMixin, TestCase):
+    def setUp(self):
+        category, brand = self.create_category(), self.create_brand()
+        self.create_product('Phone', category, brand, price='19.99', discount_percentage=15, stock_quantity=0)
+        tablet = self.create_product('Tablet', category, brand, is_featured=True)
+        ProductImage.objects.create(product=tablet, image_url='https://example.com/t.png')
+        Product.objects.apply_rating_change(tablet.pk, added=4)
+
+    def assertSameBytes(self, fields):
+        products = Product.objects.with_list_data(fields).order_by('pk')
+        expected = JSONRenderer().render(ProductListSerializer(products, many=True, fields=fields).data)
+
+        row_serializer = get_product_list_row_serializer(tuple(fields) if fields is not None else None)
+        rows = Product.objects.order_by('pk').values(*row_serializer.columns)
+        self.assertEqual(JSONRenderer().render(row_serializer.many(rows)), expected)
+
+    def test_rows_render_like_the_model_serializer(self):
+        self.assertSameBytes(None)
+        self.assertSameBytes(['id', 'name', 'final_price', 'primary_image', 'average_rating'])
+        self.assertSameBytes(['brand', 'in_stock', 'created_at'])
+
+    def test_list_endpoint_serves_rows(self):
+        with self.assertNumQueries(1):
+            response = APIClient().get(reverse('products:list'), {'ordering': 'oldest'})
+
+        products = Product.objects.with_list_data().order_by('created_at', 'id')
+        expected = JSONRenderer().render(ProductListSerializer(products, many=True).data)
+        self.assertEqual(JSONRenderer().render(response.data['results']), expected)
+
+
+class PricingTests(SimpleTestCase):
+    def test_final_price_rounds_half_up_to_the_cent(self):
+        self.assertEqual(pricing.final_price(Decimal('19.99'), 15), Decimal('16.99'))
+        self.assertEqual(pricing.final_price(Decimal('0.10'), 50), Decimal('0.05'))
+        self.assertEqual(pricing.final_price(Decimal('0.05'), 50), Decimal('0.03'))
+        self.assertEqual(pricing.final_price(Decimal('100.00'), None), Decimal('100.00'))
+        self.assertEqual(
+            pricing.final_prices([(Decimal('19.99'), 15), (Decimal('10.00'), 0)]),
+            [Decimal('16.99'), Decimal('10.00')],
+        )
+
+    def test_lines_are_priced_from_rounded_unit_prices(self):
+        lines = [(Decimal('19.99'), 15, 3), (Decimal('0.05'), 50, 10), (Decimal('7.00'), 0, 1)]
+
+        priced = pricing.price_lines(lines)
+
+        self.assertEqual(priced.unit_prices, [Decimal('16.99'), Decimal('0.03'), Decimal('7.00')])
+        self.assertEqual(priced.subtotals, [Decimal('50.97'), Decimal('0.30'), Decimal('7.00')])
+        self.assertEqual(priced.total, Decimal('58.27'))
+        self.assertEqual(pricing.lines_total(lines), priced.total)
+        self.assertEqual(pricing.price_lines([]).total, Decimal('0.00'))
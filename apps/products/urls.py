@@ -5,7 +5,11 @@ from apps.products.views import (
     ProductDetailAPIView,
     ProductUpdateAPIView,
     ProductPartialUpdateAPIView,
-    ProductDeleteAPIView
+    ProductDeleteAPIView,
+    ProductDetailCacheStatsAPIView,
+    ProductBulkImportAPIView,
+    ProductBulkUpdateAPIView,
+    ProductExportAPIView
 )
 
 app_name = 'products'
@@ -17,4 +21,8 @@ urlpatterns = [
     path('<int:pk>/update/', ProductUpdateAPIView.as_view(), name='update'),
     path('<int:pk>/patch/', ProductPartialUpdateAPIView.as_view(), name='patch'),
     path('<int:pk>/delete/', ProductDeleteAPIView.as_view(), name='delete'),
+    path('bulk-import/', ProductBulkImportAPIView.as_view(), name='bulk-import'),
+    path('bulk-update/', ProductBulkUpdateAPIView.as_view(), name='bulk-update'),
+    path('export/', ProductExportAPIView.as_view(), name='export'),
+    path('cache-stats/', ProductDetailCacheStatsAPIView.as_view(), name='cache-stats'),
 ]
\ No newline at end of file
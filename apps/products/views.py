@@ -1,8 +1,13 @@
+import codecs
+from django.http import StreamingHttpResponse
 from django.shortcuts import render
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework import status
-from apps.products.models import Product, Category, Brand, ProductImage
+from rest_framework.permissions import IsAdminUser
+from django.db import transaction
+from django.db.models import Prefetch
+from apps.products.models import Product, Category, Brand, ProductImage, RelatedProduct
 from apps.reviews.models import ProductReview
 from apps.products.serializers import (
     ProductListSerializer, 
@@ -10,23 +15,65 @@ from apps.products.serializers import (
     ProductFilterSerializer,
     ProductCreateResponseSerializer,
     ProductDetailResponseSerializer,
-    RelatedProductSerializer
+    ProductListWithRelatedSerializer,
+    ProductBulkUpdateSerializer,
+    ProductDetailQuerySerializer,
+    ProductExportQuerySerializer,
+    RelatedProductLinkSerializer,
+    get_product_list_row_serializer
 )
+from apps.inventory.ledger import set_stock
+from apps.products.bulk import apply_bulk_update
+from apps.products.cache import get_product_detail, get_stats
+from apps.products.conditional import catalog_condition, product_condition
+from apps.products.exporter import CONTENT_TYPES, iter_export
+from apps.products.facets import get_facets
+from apps.products.importer import FORMATS, ProductImporter, iter_rows
+from apps.products.pagination import ProductCursorPagination
 
 class ProductListAPIView(APIView):
+    pagination_class = ProductCursorPagination
+
+    @catalog_condition
     def get(self, request):
         filter_serializer = ProductFilterSerializer(data=request.GET)
         
         if not filter_serializer.is_valid():
             return Response(filter_serializer.errors, status=400)
         
-        products = filter_serializer.filter_products()
+        paginator = self.pagination_class()
+        ordering = filter_serializer.get_ordering() or paginator.ordering
+        fields = filter_serializer.get_fields_selection()
+        
+        include_related = filter_serializer.validated_data.get('include_related')
+        
+        if include_related:
+            extra_columns = [] if ordering == '-search_rank' else [ordering.lstrip('-')]
+            products = filter_serializer.filter_products().with_list_data(fields, extra_columns).prefetch_related(
+                Prefetch('related_links', queryset=RelatedProduct.objects.for_display())
+            )
+        else:
+            # Plain pages are read as values() rows and rendered by the
+            # compiled serializer, skipping model instances and DRF fields.
+            row_serializer = get_product_list_row_serializer(tuple(fields) if fields is not None else None)
+            columns = dict.fromkeys(['id', ordering.lstrip('-'), *row_serializer.columns])
+            products = filter_serializer.filter_products().values(*columns)
         
-        if not products.exists():
+        page = paginator.paginate_queryset(products, request, view=self, ordering=ordering)
+        
+        if not page and not paginator.cursor:
             return Response({"detail": "Products not found"}, status=404)
         
-        serializer = ProductListSerializer(products, many=True)
-        return Response(serializer.data, status=200)
+        if include_related:
+            data = ProductListWithRelatedSerializer(page, many=True, fields=fields).data
+        else:
+            data = row_serializer.many(page)
+        response = paginator.get_paginated_response(data)
+        
+        if filter_serializer.validated_data.get('facets'):
+            response.data['facets'] = get_facets(filter_serializer)
+        
+        return response
 
 class ProductCreateAPIView(APIView):
     serializer_class = ProductModelSerializer
@@ -83,97 +130,107 @@ class ProductCreateAPIView(APIView):
         return Response(response_serializer.data, status=201)
 
 class ProductDetailAPIView(APIView):
+    @product_condition
     def get(self, request, pk):
-        try:
-            product = Product.objects.get(pk=pk, is_active=True)
-        except Product.DoesNotExist:
+        query_serializer = ProductDetailQuerySerializer(data=request.GET)
+        
+        if not query_serializer.is_valid():
+            return Response(query_serializer.errors, status=400)
+        
+        fields = query_serializer.get_fields_selection()
+        variant = ','.join(sorted(fields)) if fields is not None else 'full'
+        product_data = get_product_detail(
+            pk, lambda pk: self.build_product_data(pk, fields), variant=variant
+        )
+        
+        if product_data is None:
             return Response({"detail": "Product not found"}, status=404)
-
-        from decimal import Decimal
         
-        final_price = product.price * (100 - product.discount_percentage) / 100
+        return Response(product_data, status=200)
+    
+    def build_product_data(self, pk, fields=None):
+        # Sections that are not requested are never queried.
+        def wants(name):
+            return fields is None or name in fields
         
-        category_data = {
-            'id': product.category.id,
-            'name': product.category.name,
-            'slug': product.category.slug,
-            'parent': product.category.parent.name if product.category.parent else None
-        }
+        products = Product.objects.all()
+        if wants('category'):
+            products = products.select_related('category__parent')
+        if wants('brand'):
+            products = products.select_related('brand')
+        if not wants('description'):
+            products = products.defer('description')
         
-        brand_data = {
-            'id': product.brand.id,
-            'name': product.brand.name,
-            'logo': product.brand.logo,
-            'website': product.brand.website
+        try:
+            product = products.get(pk=pk, is_active=True)
+        except Product.DoesNotExist:
+            return None
+
+        sections = {
+            'id': lambda: product.id,
+            'name': lambda: product.name,
+            'slug': lambda: product.slug,
+            'description': lambda: product.description,
+            'category': lambda: {
+                'id': product.category.id,
+                'name': product.category.name,
+                'slug': product.category.slug,
+                'parent': product.category.parent.name if product.category.parent else None,
+                'breadcrumbs': [
+                    {'id': ancestor.id, 'name': ancestor.name, 'slug': ancestor.slug}
+                    for ancestor in product.category.get_ancestors(include_self=True)
+                ]
+            },
+            'brand': lambda: {
+                'id': product.brand.id,
+                'name': product.brand.name,
+                'logo': product.brand.logo,
+                'website': product.brand.website
+            },
+            'price': lambda: str(product.price),
+            'discount_percentage': lambda: product.discount_percentage,
+            'final_price': lambda: str(product.final_price),
+            'stock_quantity': lambda: product.stock_quantity,
+            'available_quantity': lambda: product.available_quantity,
+            'in_stock': lambda: product.available_quantity > 0,
+            'is_featured': lambda: product.is_featured,
+            'images': lambda: [
+                {
+                    'id': image.id,
+                    'image_url': image.image_url,
+                    'is_primary': image.is_primary,
+                    'order': image.order
+                }
+                for image in product.images.all()
+            ],
+            'reviews': lambda: [
+                {
+                    'id': review.id,
+                    'user': {
+                        'id': review.user.id,
+                        'username': review.user.username
+                    },
+                    'rating': review.rating,
+                    'title': review.title,
+                    'comment': review.comment,
+                    'is_verified_purchase': review.is_verified_purchase,
+                    'created_at': review.created_at
+                }
+                for review in product.reviews.select_related('user').order_by('-created_at')
+            ],
+            'reviews_count': lambda: product.reviews_count,
+            'average_rating': lambda: round(product.average_rating, 1),
+            'rating_histogram': lambda: product.rating_histogram,
+            'related_products': lambda: RelatedProductLinkSerializer(
+                RelatedProduct.objects.filter(product=product).for_display(), many=True
+            ).data,
+            'created_at': lambda: product.created_at,
+            'updated_at': lambda: product.updated_at
         }
         
-        images_data = []
-        for image in product.images.all():
-            images_data.append({
-                'id': image.id,
-                'image_url': image.image_url,
-                'is_primary': image.is_primary,
-                'order': image.order
-            })
-        
-        reviews_data = []
-        for review in product.reviews.all().order_by('-created_at'):
-            reviews_data.append({
-                'id': review.id,
-                'user': {
-                    'id': review.user.id,
-                    'username': review.user.username
-                },
-                'rating': review.rating,
-                'title': review.title,
-                'comment': review.comment,
-                'is_verified_purchase': review.is_verified_purchase,
-                'created_at': review.created_at
-            })
-        
-        reviews_count = product.reviews.count()
-        average_rating = sum(review.rating for review in product.reviews.all()) / reviews_count if reviews_count > 0 else 0
-        
-        related_products_data = []
-        related_products = Product.objects.filter(
-            category=product.category, 
-            is_active=True
-        ).exclude(id=product.id)[:4]
-        
-        for related in related_products:
-            primary_image = related.images.filter(is_primary=True).first()
-            related_final_price = related.price * (100 - related.discount_percentage) / 100
-            related_products_data.append({
-                'id': related.id,
-                'name': related.name,
-                'price': str(related.price),
-                'final_price': str(related_final_price),
-                'primary_image': primary_image.image_url if primary_image else None
-            })
-        
-        product_data = {
-            'id': product.id,
-            'name': product.name,
-            'slug': product.slug,
-            'description': product.description,
-            'category': category_data,
-            'brand': brand_data,
-            'price': str(product.price),
-            'discount_percentage': product.discount_percentage,
-            'final_price': str(final_price),
-            'stock_quantity': product.stock_quantity,
-            'in_stock': product.stock_quantity > 0,
-            'is_featured': product.is_featured,
-            'images': images_data,
-            'reviews': reviews_data,
-            'reviews_count': reviews_count,
-            'average_rating': round(average_rating, 1),
-            'related_products': related_products_data,
-            'created_at': product.created_at,
-            'updated_at': product.updated_at
-        }
+        product_data = {name: build() for name, build in sections.items() if wants(name)}
         
-        return Response(product_data, status=200)
+        return product_data
 
 class ProductUpdateAPIView(APIView):
     serializer_class = ProductModelSerializer
@@ -198,7 +255,13 @@ class ProductUpdateAPIView(APIView):
             product.slug = new_slug
             product.save()
         
-        serializer.save()
+        # Stock goes through the inventory ledger rather than the row save.
+        stock_quantity = serializer.validated_data.pop('stock_quantity', None)
+        with transaction.atomic():
+            serializer.save()
+            if stock_quantity is not None:
+                set_stock(product.pk, stock_quantity)
+                serializer.instance.refresh_from_db(fields=['stock_quantity'])
 
         response_serializer = ProductCreateResponseSerializer(serializer.instance)
         return Response(response_serializer.data, status=200)
@@ -226,7 +289,13 @@ class ProductPartialUpdateAPIView(APIView):
             product.slug = new_slug
             product.save()
         
-        serializer.save()
+        # Stock goes through the inventory ledger rather than the row save.
+        stock_quantity = serializer.validated_data.pop('stock_quantity', None)
+        with transaction.atomic():
+            serializer.save()
+            if stock_quantity is not None:
+                set_stock(product.pk, stock_quantity)
+                serializer.instance.refresh_from_db(fields=['stock_quantity'])
 
         response_serializer = ProductCreateResponseSerializer(serializer.instance)
         return Response(response_serializer.data, status=200)
@@ -241,4 +310,72 @@ class ProductDeleteAPIView(APIView):
         product.is_active = False
         product.save()
         
-        return Response({"message": "Product deleted successfully"}, status=204)
\ No newline at end of file
+        return Response({"message": "Product deleted successfully"}, status=204)
+
+class ProductDetailCacheStatsAPIView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(get_stats(), status=200)
+
+class ProductBulkImportAPIView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def post(self, request):
+        file_format = request.query_params.get('type', 'jsonl')
+        if file_format not in FORMATS:
+            return Response({"detail": f"type must be one of: {', '.join(FORMATS)}"}, status=400)
+        
+        try:
+            batch_size = int(request.query_params.get('batch_size', 1000))
+        except ValueError:
+            return Response({"detail": "batch_size must be an integer"}, status=400)
+        
+        # Multipart uploads are read from the uploaded file; any other body
+        # is streamed straight off the request without being buffered.
+        if request.content_type.startswith('multipart/'):
+            upload = request.FILES.get('file')
+            if upload is None:
+                return Response({"detail": "Upload the feed as 'file'"}, status=400)
+            lines = upload
+        else:
+            lines = request._request
+        
+        importer = ProductImporter(batch_size=max(batch_size, 1))
+        result = importer.run(iter_rows(codecs.iterdecode(lines, 'utf-8'), file_format))
+        return Response(result, status=200)
+
+class ProductBulkUpdateAPIView(APIView):
+    permission_classes = [IsAdminUser]
+    serializer_class = ProductBulkUpdateSerializer
+
+    def post(self, request):
+        serializer = self.serializer_class(data=request.data)
+        
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=400)
+        
+        result = apply_bulk_update(serializer.validated_data['items'])
+        return Response(result, status=200)
+
+class ProductExportAPIView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        serializer = ProductExportQuerySerializer(data=request.query_params)
+        
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=400)
+        
+        file_format = serializer.validated_data['output']
+        response = StreamingHttpResponse(
+            iter_export(
+                file_format,
+                updated_since=serializer.validated_data.get('updated_since'),
+                include_inactive=serializer.validated_data['include_inactive'],
+                chunk_size=serializer.validated_data['chunk_size'],
+            ),
+            content_type=CONTENT_TYPES[file_format],
+        )
+        response['Content-Disposition'] = f'attachment; filename="products.{file_format}"'
+        return response
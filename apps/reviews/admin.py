@@ -1,7 +1,38 @@
 # Register your models here.
 from django.contrib import admin
+from django.db import transaction
+
+from apps.products.cache import invalidate_product_details
+from apps.products.models import Product
 from .models import ProductReview
 
 @admin.register(ProductReview)
 class ProductReviewAdmin(admin.ModelAdmin):
-    list_display = ['product', 'user', 'rating', 'created_at']
\ No newline at end of file
+    list_display = ['product', 'user', 'rating', 'created_at']
+
+    # Every write moves the product's rating aggregates the same way the
+    # review endpoints do.
+    def save_model(self, request, obj, form, change):
+        with transaction.atomic():
+            saved = ProductReview.objects.filter(pk=obj.pk).values_list('product_id', 'rating').first() if change else None
+            super().save_model(request, obj, form, change)
+            if saved is None:
+                Product.objects.apply_rating_change(obj.product_id, added=obj.rating)
+            elif saved[0] != obj.product_id:
+                Product.objects.apply_rating_change(saved[0], removed=saved[1])
+                transaction.on_commit(lambda: invalidate_product_details([saved[0]]))
+                Product.objects.apply_rating_change(obj.product_id, added=obj.rating)
+            elif saved[1] != obj.rating:
+                Product.objects.apply_rating_change(obj.product_id, added=obj.rating, removed=saved[1])
+
+    def delete_model(self, request, obj):
+        with transaction.atomic():
+            super().delete_model(request, obj)
+            Product.objects.apply_rating_change(obj.product_id, removed=obj.rating)
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            reviews = list(queryset.values_list('product_id', 'rating'))
+            super().delete_queryset(request, queryset)
+            for product_id, rating in reviews:
+                Product.objects.apply_rating_change(product_id, removed=rating)
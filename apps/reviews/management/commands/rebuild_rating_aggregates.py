@@ -0,0 +1,76 @@
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from apps.products.cache import invalidate_product_details
+from apps.products.models import Product
+from apps.reviews.models import ProductReview
+
+AGGREGATE_FIELDS = [
+    'reviews_count', 'rating_sum', 'average_rating',
+    'rating_1', 'rating_2', 'rating_3', 'rating_4', 'rating_5',
+]
+
+
+def rebuild_rating_aggregates(batch_size=1000):
+    # Only products whose stored aggregates were off are rewritten; those
+    # are marked updated and dropped from the caches. Returns their ids.
+    rows = ProductReview.objects.order_by('product_id').values('product_id').annotate(
+        count=Count('id'),
+        total=Sum('rating'),
+        **{f'stars_{star}': Count('id', filter=Q(rating=star)) for star in range(1, 6)},
+    )
+    now = timezone.now()
+
+    with transaction.atomic():
+        # Products left without reviews.
+        rebuilt = list(Product.objects.exclude(
+            pk__in=ProductReview.objects.values('product_id')
+        ).exclude(**{field: 0 for field in AGGREGATE_FIELDS}).values_list('pk', flat=True))
+        Product.objects.filter(pk__in=rebuilt).update(updated_at=now, **{field: 0 for field in AGGREGATE_FIELDS})
+
+        rows = rows.iterator(chunk_size=batch_size)
+        while True:
+            batch = []
+            for row in islice(rows, batch_size):
+                product = Product(
+                    pk=row['product_id'],
+                    reviews_count=row['count'],
+                    rating_sum=row['total'],
+                    average_rating=row['total'] / row['count'],
+                    updated_at=now,
+                )
+                for star in range(1, 6):
+                    setattr(product, f'rating_{star}', row[f'stars_{star}'])
+                batch.append(product)
+            if not batch:
+                break
+            stored = {
+                pk: tuple(values) for pk, *values in Product.objects.filter(
+                    pk__in=[product.pk for product in batch]
+                ).values_list('pk', *AGGREGATE_FIELDS)
+            }
+            stale = [
+                product for product in batch
+                if stored.get(product.pk) != tuple(getattr(product, field) for field in AGGREGATE_FIELDS)
+            ]
+            Product.objects.bulk_update(stale, AGGREGATE_FIELDS + ['updated_at'])
+            rebuilt += [product.pk for product in stale]
+
+        transaction.on_commit(lambda: invalidate_product_details(rebuilt))
+
+    return rebuilt
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the stored review count, rating sum, average and histogram of every product.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        rebuilt = rebuild_rating_aggregates(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt rating aggregates for {len(rebuilt)} products.'))
@@ -1,7 +1,13 @@
+from functools import lru_cache
 from rest_framework import serializers
+from apps.products.compiled import CompiledSerializer, RowField
 from apps.reviews.models import ProductReview
 from django.contrib.auth.models import User
 
+
+def get_full_name(first_name, last_name, username):
+    return f"{first_name} {last_name}".strip() or username
+
 class UserSerializer(serializers.ModelSerializer):
     full_name = serializers.SerializerMethodField()
     
@@ -10,7 +16,7 @@ class UserSerializer(serializers.ModelSerializer):
         fields = ['id', 'username', 'full_name']
     
     def get_full_name(self, obj):
-        return f"{obj.first_name} {obj.last_name}".strip() or obj.username
+        return get_full_name(obj.first_name, obj.last_name, obj.username)
 
 class ProductReviewSerializer(serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
@@ -47,4 +53,11 @@ class ProductReviewListSerializer(serializers.ModelSerializer):
         ]
     
     def get_helpful_count(self, obj):
-        return 0
\ No newline at end of file
+        return 0
+
+@lru_cache(maxsize=None)
+def get_review_list_row_serializer():
+    return CompiledSerializer(ProductReviewListSerializer(), {
+        'user': {'full_name': RowField(['first_name', 'last_name', 'username'], get_full_name)},
+        'helpful_count': RowField([], lambda: 0),
+    })
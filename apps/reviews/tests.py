@@ -1,3 +1,174 @@
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from apps.products.cache import get_version
+from apps.products.models import Product
+from apps.products.tests import ProductTestMixin
+from apps.reviews.models import ProductReview
+from apps.reviews.serializers import ProductReviewListSerializer
+
+
+class RatingAggregateTests(ProductTestMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user('reviewer', password='pass')
+        self.client.force_authenticate(self.user)
+        self.product = self.create_product('Phone', self.create_category(), self.create_brand())
+
+    def post_review(self, rating, user=None):
+        client = APIClient()
+        client.force_authenticate(user or self.user)
+        return client.post(
+            reverse('reviews:create', args=[self.product.pk]),
+            {'rating': rating, 'title': 'Solid phone', 'comment': 'Works as described.'},
+        )
+
+    def assertAggregates(self, count, total, histogram):
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.reviews_count, count)
+        self.assertEqual(self.product.rating_sum, total)
+        self.assertEqual(self.product.average_rating, total / count if count else 0)
+        self.assertEqual(self.product.rating_histogram, histogram)
+
+    def test_create_update_delete_keep_aggregates_in_sync(self):
+        other = User.objects.create_user('other', password='pass')
+        self.assertEqual(self.post_review(5).status_code, 201)
+        self.assertEqual(self.post_review(2, user=other).status_code, 201)
+        self.assertAggregates(2, 7, {'1': 0, '2': 1, '3': 0, '4': 0, '5': 1})
+
+        review = ProductReview.objects.get(user=self.user)
+        response = self.client.put(
+            reverse('reviews:update', args=[review.pk]),
+            {'rating': 3, 'title': 'Solid phone', 'comment': 'Works as described.'},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertAggregates(2, 5, {'1': 0, '2': 1, '3': 1, '4': 0, '5': 0})
+
+        response = self.client.delete(reverse('reviews:delete', args=[review.pk]))
+        self.assertEqual(response.status_code, 204)
+        self.assertAggregates(1, 2, {'1': 0, '2': 1, '3': 0, '4': 0, '5': 0})
+
+        other_review = ProductReview.objects.get(user=other)
+        other_client = APIClient()
+        other_client.force_authenticate(other)
+        other_client.delete(reverse('reviews:delete', args=[other_review.pk]))
+        self.assertAggregates(0, 0, {'1': 0, '2': 0, '3': 0, '4': 0, '5': 0})
+
+    def test_rebuild_command_recomputes_from_reviews(self):
+        other = User.objects.create_user('other', password='pass')
+        ProductReview.objects.create(product=self.product, user=self.user, rating=4, title='Nice', comment='Nice phone')
+        ProductReview.objects.create(product=self.product, user=other, rating=1, title='Bad', comment='Bad phone')
+        Product.objects.filter(pk=self.product.pk).update(reviews_count=99, rating_5=99)
+        emptied = self.create_product('Tablet', self.product.category, self.product.brand)
+        Product.objects.filter(pk=emptied.pk).update(reviews_count=1, rating_sum=3, average_rating=3, rating_3=1)
+        untouched = self.create_product('Watch', self.product.category, self.product.brand)
+        versions = {pk: get_version(pk) for pk in (self.product.pk, emptied.pk, untouched.pk)}
+        since = timezone.now()
+
+        stdout = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('rebuild_rating_aggregates', '--batch-size', '1', stdout=stdout)
+
+        self.assertIn('for 2 products', stdout.getvalue())
+        self.assertAggregates(2, 5, {'1': 1, '2': 0, '3': 0, '4': 1, '5': 0})
+        self.assertEqual(Product.objects.get(pk=emptied.pk).rating_histogram, {str(star): 0 for star in range(1, 6)})
+        self.assertEqual(
+            set(Product.objects.filter(updated_at__gte=since).values_list('pk', flat=True)), {self.product.pk, emptied.pk}
+        )
+        self.assertEqual(
+            {pk for pk, version in versions.items() if get_version(pk) != version}, {self.product.pk, emptied.pk}
+        )
+
+    def test_admin_review_writes_keep_aggregates_in_sync(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pass'))
+        other = self.create_product('Tablet', self.product.category, self.product.brand)
+        form = {'product': self.product.pk, 'user': self.user.pk, 'title': 'Nice', 'comment': 'Nice phone'}
+
+        self.client.post(reverse('admin:reviews_productreview_add'), {**form, 'rating': 4})
+        self.assertAggregates(1, 4, {'1': 0, '2': 0, '3': 0, '4': 1, '5': 0})
+        review = ProductReview.objects.get()
+        change_url = reverse('admin:reviews_productreview_change', args=[review.pk])
+        self.client.post(change_url, {**form, 'rating': 2})
+        self.assertAggregates(1, 2, {'1': 0, '2': 1, '3': 0, '4': 0, '5': 0})
+        self.client.post(change_url, {**form, 'product': other.pk, 'rating': 2})
+        self.assertAggregates(0, 0, {'1': 0, '2': 0, '3': 0, '4': 0, '5': 0})
+        self.product = other
+        self.assertAggregates(1, 2, {'1': 0, '2': 1, '3': 0, '4': 0, '5': 0})
+
+        self.client.post(reverse('admin:reviews_productreview_changelist'), {
+            'action': 'delete_selected', '_selected_action': [review.pk], 'post': 'yes',
+        })
+        self.assertFalse(ProductReview.objects.exists())
+        self.assertAggregates(0, 0, {'1': 0, '2': 0, '3': 0, '4': 0, '5': 0})
+
+    def test_product_writes_leave_aggregates_alone(self):
+        product = Product.objects.get(pk=self.product.pk)
+        self.post_review(5)
+        staff = APIClient()
+        staff.force_authenticate(User.objects.create_user('staff', password='pass', is_staff=True))
+
+        response = staff.patch(
+            reverse('products:patch', args=[self.product.pk]), {'reviews_count': 99, 'rating_1': 99}
+        )
+        product.name = 'Renamed phone'
+        product.save()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertAggregates(1, 5, {'1': 0, '2': 0, '3': 0, '4': 0, '5': 1})
+
+    def test_min_rating_filter_uses_stored_average(self):
+        self.post_review(4)
+        low = self.create_product('Low', self.product.category, self.product.brand)
+
+        response = self.client.get(reverse('products:list'), {'min_rating': 3.5})
+
+        ids = [row['id'] for row in response.data['results']]
+        self.assertEqual(ids, [self.product.pk])
+        self.assertNotIn(low.pk, ids)
+
+
+class ReviewListConditionalGetTests(ProductTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('reviewer', password='pass')
+        self.product = self.create_product('Phone', self.create_category(), self.create_brand())
+        self.url = reverse('reviews:list', args=[self.product.pk])
+
+    def test_new_review_changes_the_etag(self):
+        client = APIClient()
+        etag = client.get(self.url)['ETag']
+
+        with self.assertNumQueries(0):
+            self.assertEqual(client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ProductReview.objects.create(
+                product=self.product, user=self.user, rating=4, title='Nice', comment='Nice phone'
+            )
+        response = client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 1)
+
+
+class ReviewListSerializationTests(ProductTestMixin, TestCase):
+    def test_rows_render_like_the_model_serializer(self):
+        product = self.create_product('Phone', self.create_category(), self.create_brand())
+        named = User.objects.create_user('named', password='pass', first_name='Ada', last_name='Lovelace')
+        plain = User.objects.create_user('plain', password='pass')
+        ProductReview.objects.create(product=product, user=named, rating=5, title='Great', comment='Great phone')
+        ProductReview.objects.create(product=product, user=plain, rating=2, title='Meh', comment='Meh phone', is_verified_purchase=True)
+
+        response = APIClient().get(reverse('reviews:list', args=[product.pk]), {'ordering': 'rating'})
 
-# Create your tests here.
+        reviews = ProductReview.objects.filter(product=product).order_by('rating')
+        expected = JSONRenderer().render(ProductReviewListSerializer(reviews, many=True).data)
+        self.assertEqual(JSONRenderer().render(response.data['results']), expected)
+        self.assertEqual([review['user']['full_name'] for review in response.data['results']], ['plain', 'Ada Lovelace'])
@@ -1,4 +1,5 @@
 from django.shortcuts import render
+from django.db import transaction
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework import status
@@ -6,7 +7,8 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.pagination import PageNumberPagination
 from apps.reviews.models import ProductReview
 from apps.products.models import Product
-from apps.reviews.serializers import ProductReviewSerializer, ProductReviewListSerializer
+from apps.products.conditional import product_condition
+from apps.reviews.serializers import ProductReviewSerializer, ProductReviewListSerializer, get_review_list_row_serializer
 
 class ProductReviewCreateView(APIView):
     permission_classes = [IsAuthenticated]
@@ -31,17 +33,20 @@ class ProductReviewCreateView(APIView):
         
         is_verified_purchase = False
         
-        review = serializer.save(
-            user=request.user,
-            product=product,
-            is_verified_purchase=is_verified_purchase
-        )
+        with transaction.atomic():
+            review = serializer.save(
+                user=request.user,
+                product=product,
+                is_verified_purchase=is_verified_purchase
+            )
+            Product.objects.apply_rating_change(product.pk, added=review.rating)
         
         return Response(serializer.data, status=201)
 
 class ProductReviewListView(APIView):
     serializer_class = ProductReviewListSerializer
 
+    @product_condition
     def get(self, request, product_id):
         reviews = ProductReview.objects.filter(product_id=product_id).order_by('-created_at')
         
@@ -53,17 +58,17 @@ class ProductReviewListView(APIView):
         if ordering in ['-created_at', 'created_at', '-rating', 'rating']:
             reviews = reviews.order_by(ordering)
         
+        row_serializer = get_review_list_row_serializer()
+        rows = reviews.values(*row_serializer.columns)
         paginator = PageNumberPagination()
-        page = paginator.paginate_queryset(reviews, request)
+        page = paginator.paginate_queryset(rows, request)
         
         if page is not None:
-            serializer = self.serializer_class(page, many=True)
-            return paginator.get_paginated_response(serializer.data)
+            return paginator.get_paginated_response(row_serializer.many(page))
         
-        serializer = self.serializer_class(reviews, many=True)
         return Response({
             "count": reviews.count(),
-            "results": serializer.data
+            "results": row_serializer.many(rows)
         }, status=200)
 
 class ProductReviewUpdateView(APIView):
@@ -81,7 +86,13 @@ class ProductReviewUpdateView(APIView):
         if not serializer.is_valid():
             return Response(serializer.errors, status=400)
         
-        serializer.save()
+        old_rating = review.rating
+        
+        with transaction.atomic():
+            review = serializer.save()
+            if review.rating != old_rating:
+                Product.objects.apply_rating_change(review.product_id, added=review.rating, removed=old_rating)
+        
         return Response(serializer.data, status=200)
 
 class ProductReviewDeleteView(APIView):
@@ -93,5 +104,8 @@ class ProductReviewDeleteView(APIView):
         except ProductReview.DoesNotExist:
             return Response({"detail": "Review not found"}, status=404)
         
-        review.delete()
+        with transaction.atomic():
+            review.delete()
+            Product.objects.apply_rating_change(review.product_id, removed=review.rating)
+        
         return Response(status=204)
\ No newline at end of file
@@ -6,6 +6,7 @@ from apps.products.models import Product
 class WishlistProductSerializer(serializers.ModelSerializer):
     final_price = serializers.SerializerMethodField()
     in_stock = serializers.SerializerMethodField()
+    primary_image = serializers.CharField(source='primary_image_url', read_only=True, allow_null=True)
     average_rating = serializers.FloatField(read_only=True)
     added_to_wishlist_at = serializers.DateTimeField(source='created_at', read_only=True)
 
@@ -18,12 +19,10 @@ class WishlistProductSerializer(serializers.ModelSerializer):
         ]
 
     def get_final_price(self, obj):
-        if obj.discount_percentage:
-            return obj.price - (obj.price * obj.discount_percentage / 100)
-        return obj.price
+        return obj.final_price
 
     def get_in_stock(self, obj):
-        return obj.stock_quantity > 0
+        return obj.available_quantity > 0
 
 
 class WishlistSerializer(serializers.ModelSerializer):
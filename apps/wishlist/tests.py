@@ -1,3 +1,43 @@
+from django.contrib.auth.models import User
 from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from apps.products.models import ProductImage
+from apps.products.tests import ProductTestMixin
+from apps.wishlist.models import Wishlist
+
+
+class WishlistTests(ProductTestMixin, TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('shopper', password='pass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_products_carry_their_primary_image(self):
+        category, brand = self.create_category(), self.create_brand()
+        wishlist = Wishlist.objects.create(user=self.user)
+        for name in ('Phone', 'Tablet'):
+            product = self.create_product(name, category, brand)
+            ProductImage.objects.create(product=product, image_url=f'https://example.com/{product.slug}.png')
+            wishlist.products.add(product)
+
+        response = self.client.get(reverse('wishlist:wishlist'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            sorted(product['primary_image'] for product in response.data['products']),
+            ['https://example.com/phone.png', 'https://example.com/tablet.png'],
+        )
+
+    def test_move_to_cart_holds_one_unit(self):
+        product = self.create_product('Phone', self.create_category(), self.create_brand(), stock_quantity=1)
+        Wishlist.objects.create(user=self.user).products.add(product)
+
+        response = self.client.post(reverse('wishlist:wishlist-move-to-cart', args=[product.pk]))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['cart_items_count'], 1)
+        product.refresh_from_db()
+        self.assertEqual(product.reserved_quantity, 1)
+        self.assertFalse(self.user.wishlist.products.exists())
@@ -7,6 +7,7 @@ from apps.products.models import Product
 from .models import Wishlist
 from .serializers import WishlistSerializer
 from apps.carts.models import Cart, CartItem
+from apps.carts.reservations import reserve
 
 
 class WishlistRetrieveView(RetrieveAPIView):
@@ -82,18 +83,14 @@ class WishlistMoveToCartView(GenericAPIView):
         if product not in wishlist.products.all():
             return Response({"error": "Product not in wishlist."}, status=status.HTTP_400_BAD_REQUEST)
         
-        if product.stock_quanitity <= 0:
+        if product.available_quantity <= 0:
             return Response({"error": "Product is out of stock."}, status=status.HTTP_400_BAD_REQUEST)
         
         
-        wishlist.products.remove(product)
-        
         cart, created = Cart.objects.get_or_create(user=request.user)
-        cart_item, created = CartItem.objects.get_or_create(cart=cart, product=product)
+        reserve(cart.pk, product.pk, 1, add=True)
         
-        if not created:
-            cart_item.quantity += 1
-            cart_item.save()
+        wishlist.products.remove(product)
             
         return Response({
             'message': 'Product moved to cart successfully.',
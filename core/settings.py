@@ -45,6 +45,7 @@ INSTALLED_APPS = [
     'apps.reviews',
     'apps.carts',
     'apps.wishlist',
+    'apps.inventory',
 ]
 
 MIDDLEWARE = [
@@ -84,10 +85,71 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Write transactions (checkout, stock updates) take SQLite's write
+        # lock when they begin instead of upgrading a read lock halfway
+        # through, which would fail at once with "database is locked";
+        # waiting writers queue for up to ``timeout`` seconds.
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
+        # A file rather than the default shared-cache memory database, so
+        # tests that check out from several threads see the same locking as
+        # production.
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
+    }
+}
+
+
+# Cache
+# Product detail versions, and the ETag and Last-Modified validators built
+# from them, live in this cache, so every worker process must share it:
+# use Redis, Memcached or DatabaseCache (after createcachetable) whenever
+# more than one process serves requests. LocMemCache is per process and
+# only fits a single runserver; `manage.py check --deploy` warns about it
+# (products.W001).
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
 
 
+# Product search
+# Any subclass of apps.products.search.BaseSearchBackend can be plugged in here.
+
+PRODUCT_SEARCH_BACKEND = 'apps.products.search.SQLiteFTS5SearchBackend'
+
+# Seconds that facet counts for one filter combination stay cached.
+PRODUCT_FACETS_CACHE_TIMEOUT = 60
+
+# Seconds a product detail payload stays cached; signals invalidate it early.
+PRODUCT_DETAIL_CACHE_TIMEOUT = 300
+PRODUCT_DETAIL_CACHE_LOCK_TIMEOUT = 5
+
+# Size of each product's precomputed related block, and whether saving a
+# product queues the blocks around it for `build_related_products --queued`
+# (run it every few minutes; without --queued it rebuilds everything).
+RELATED_PRODUCTS_LIMIT = 4
+RELATED_PRODUCTS_QUEUE_ON_SAVE = True
+
+# Seconds adding to the cart holds stock for; release_expired_reservations
+# returns expired holds to sale.
+CART_RESERVATION_TTL = 15 * 60
+
+# Number of StockShard rows checkout and cancellation spread each product's
+# stock over (apps.inventory.counters); 1 keeps stock on the product row.
+# Run fold_stock_shards after lowering it back to 1.
+STOCK_COUNTER_SHARDS = 1
+
+# Seconds a checkout Idempotency-Key is replayed for; purge_idempotency_keys
+# deletes older ones.
+ORDER_IDEMPOTENCY_KEY_TTL = 24 * 60 * 60
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 